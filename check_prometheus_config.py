@@ -4,150 +4,424 @@
 检查Prometheus配置和系统指标可用性
 """
 
-import requests
-import subprocess
+import argparse
 import json
+import os
+import re
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import requests
+import yaml
+from requests.adapters import HTTPAdapter
+
+# 共享的基数分析位于 hygon-sysfs-exporter/ 目录
+sys.path.insert(0, str(Path(__file__).resolve().parent / "hygon-sysfs-exporter"))
+from cardinality import CardinalityAnalyzer
+
+DEFAULT_PROMETHEUS_URL = os.environ.get('PROMETHEUS_URL', 'http://192.7.111.66:9090')
+DEFAULT_CHECKS_FILE = Path(__file__).resolve().parent / "prometheus" / "health-checks.yml"
+
+# 参与抓取成本分析的job（正则，不区分大小写）
+DEFAULT_COST_JOBS = 'dcgm|hygon'
+
+# 抓取耗时达到scrape_timeout的该比例时告警
+NEAR_TIMEOUT_RATIO = 0.8
+
+# 分组标题
+GROUP_TITLES = {
+    'system': "系统指标检查",
+    'hygon': "海光DCU指标检查",
+}
+
+_DURATION_RE = re.compile(r'(\d+(?:\.\d+)?)(ms|[smhdwy])')
+_DURATION_UNITS = {'ms': 0.001, 's': 1, 'm': 60, 'h': 3600, 'd': 86400, 'w': 604800, 'y': 31536000}
+
+def parse_duration(value):
+    """解析 15s / 5m / 1m30s 形式的时长（不带单位时按秒），返回秒数"""
+    if isinstance(value, (int, float)):
+        return float(value)
+    value = str(value).strip()
+    if re.fullmatch(r'(?:\d+(?:\.\d+)?(?:ms|[smhdwy]))+', value):
+        return sum(float(number) * _DURATION_UNITS[unit] for number, unit in _DURATION_RE.findall(value))
+    return float(value)
+
+class PrometheusClient:
+    """Prometheus HTTP API客户端，所有请求共用一个连接池"""
+
+    def __init__(self, base_url, timeout=10, pool_size=16):
+        self.base_url = base_url.rstrip('/')
+        self.timeout = timeout
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+
+    def _get(self, path, params=None):
+        response = self.session.get(f"{self.base_url}{path}", params=params, timeout=self.timeout)
+        response.raise_for_status()
+        data = response.json()
+        if data.get('status') != 'success':
+            raise RuntimeError(data.get('error', '未知错误'))
+        return data.get('data', {})
+
+    def query(self, expr, at=None):
+        params = {'query': expr}
+        if at is not None:
+            params['time'] = at
+        return self._get('/api/v1/query', params).get('result', [])
+
+    def query_range(self, expr, start, end, step):
+        params = {'query': expr, 'start': start, 'end': end, 'step': step}
+        return self._get('/api/v1/query_range', params).get('result', [])
+
+    def targets(self):
+        return self._get('/api/v1/targets').get('activeTargets', [])
+
+class HealthCheckEngine:
+    """并发执行健康检查"""
 
-def check_prometheus_targets():
-    """检查Prometheus targets状态"""
-    try:
-        response = requests.get('http://192.7.111.66:9090/api/v1/targets', timeout=10)
-        if response.status_code == 200:
-            data = response.json()
-            targets = data.get('data', {}).get('activeTargets', [])
-            
-            print("=== Prometheus Targets 状态 ===")
-            for target in targets:
-                job = target.get('labels', {}).get('job', 'unknown')
-                instance = target.get('labels', {}).get('instance', 'unknown')
-                health = target.get('health', 'unknown')
-                last_error = target.get('lastError', '')
-                
-                status_icon = "✅" if health == "up" else "❌"
-                print(f"{status_icon} {job} ({instance}) - {health}")
-                if last_error:
-                    print(f"   错误: {last_error}")
-            
-            return True
+    def __init__(self, client, checks, workers=8):
+        self.client = client
+        self.checks = checks
+        self.workers = max(1, workers)
+
+    @staticmethod
+    def load_checks(path):
+        """从YAML文件加载检查定义"""
+        with open(path, 'r', encoding='utf-8') as f:
+            config = yaml.safe_load(f) or {}
+        checks = config.get('checks', [])
+        for check in checks:
+            if 'name' not in check or 'query' not in check:
+                raise ValueError(f"检查定义缺少name或query: {check}")
+        return checks
+
+    def run(self):
+        """并发执行所有检查，结果保持定义顺序"""
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            return list(executor.map(self.run_check, self.checks))
+
+    def run_check(self, check):
+        result = {
+            'name': check['name'],
+            'group': check.get('group', 'default'),
+            'type': check.get('type', 'instant'),
+            'query': check['query'],
+            'status': 'error',
+            'results': 0,
+            'detail': '',
+            'duration': 0.0,
+        }
+        start = time.perf_counter()
+        try:
+            if result['type'] == 'staleness':
+                self._run_staleness(check, result)
+            else:
+                self._run_instant(check, result)
+        except Exception as e:
+            result['status'] = 'error'
+            result['detail'] = str(e)
+        result['duration'] = round(time.perf_counter() - start, 4)
+        return result
+
+    def _run_instant(self, check, result):
+        series = self.client.query(check['query'])
+        result['results'] = len(series)
+        min_results = check.get('min_results', 1)
+        result['status'] = 'ok' if len(series) >= min_results else 'warn'
+        if series:
+            sample = series[0]
+            labels = sample.get('metric', {})
+            result['sample'] = {
+                'labels': labels,
+                'value': sample.get('value', [None, 'N/A'])[1],
+            }
+
+    def _run_staleness(self, check, result):
+        """区间查询 timestamp(expr)，每个序列最后一个点的值即最后一次采样时间"""
+        end = time.time()
+        window = parse_duration(check.get('range', '10m'))
+        step = parse_duration(check.get('step', '15s'))
+        max_age = parse_duration(check.get('max_age', '60s'))
+        by = check.get('by', ['gpu'])
+        by = [by] if isinstance(by, str) else by
+
+        series = self.client.query_range(f"timestamp({check['query']})", end - window, end, step)
+        stale = []
+        ages = {}
+        for item in series:
+            values = item.get('values', [])
+            if not values:
+                continue
+            labels = item.get('metric', {})
+            key = ','.join(f"{label}={labels.get(label, '')}" for label in by)
+            age = end - float(values[-1][1])
+            ages[key] = round(age, 1)
+            if age > max_age:
+                stale.append(key)
+
+        result['results'] = len(ages)
+        result['ages'] = ages
+        result['stale'] = stale
+        if not ages:
+            result['status'] = 'warn'
+            result['detail'] = f"最近{check.get('range', '10m')}内无数据"
+        elif stale:
+            result['status'] = 'fail'
+            result['detail'] = f"{len(stale)} 个序列超过 {check.get('max_age', '60s')} 未更新"
         else:
-            print(f"❌ 无法访问Prometheus API: HTTP {response.status_code}")
-            return False
-    except Exception as e:
-        print(f"❌ 检查Prometheus targets失败: {e}")
-        return False
+            result['status'] = 'ok'
+            result['detail'] = f"最大样本年龄 {max(ages.values()):.0f}s"
+
+def check_prometheus_targets(client, quiet=False, targets=None):
+    """检查Prometheus targets状态；传入targets时不再请求targets API"""
+    if targets is None:
+        try:
+            targets = client.targets()
+        except Exception as e:
+            if not quiet:
+                print(f"❌ 检查Prometheus targets失败: {e}")
+            return None
+
+    results = []
+    if not quiet:
+        print("=== Prometheus Targets 状态 ===")
+    for target in targets:
+        item = {
+            'job': target.get('labels', {}).get('job', 'unknown'),
+            'instance': target.get('labels', {}).get('instance', 'unknown'),
+            'health': target.get('health', 'unknown'),
+            'last_error': target.get('lastError', ''),
+        }
+        results.append(item)
+        if quiet:
+            continue
+        status_icon = "✅" if item['health'] == "up" else "❌"
+        print(f"{status_icon} {item['job']} ({item['instance']}) - {item['health']}")
+        if item['last_error']:
+            print(f"   错误: {item['last_error']}")
+
+    return results
 
-def check_local_exporters():
+def analyze_scrape_cost(client, job_pattern=DEFAULT_COST_JOBS, near_ratio=NEAR_TIMEOUT_RATIO,
+                        default_timeout='10s', targets=None):
+    """
+    汇总exporter target的抓取成本：耗时、样本数、新增序列数
+    targets API提供耗时与间隔/超时，样本与序列数来自scrape_*自动指标，两次查询并发执行
+    """
+    job_re = re.compile(job_pattern, re.IGNORECASE)
+    if targets is None:
+        targets = client.targets()
+    selector = f'{{job=~"(?i).*({job_pattern}).*"}}'
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        samples_future = executor.submit(client.query, f"scrape_samples_scraped{selector}")
+        added_future = executor.submit(client.query, f"scrape_series_added{selector}")
+        samples_by_target = _values_by_target(samples_future.result())
+        added_by_target = _values_by_target(added_future.result())
+
+    rows = []
+    for target in targets:
+        labels = target.get('labels', {})
+        job = labels.get('job', 'unknown')
+        if not job_re.search(job):
+            continue
+        instance = labels.get('instance', 'unknown')
+        key = (job, instance)
+        interval = parse_duration(target.get('scrapeInterval') or '15s')
+        timeout = parse_duration(target.get('scrapeTimeout') or default_timeout)
+        duration = float(target.get('lastScrapeDuration') or 0.0)
+        samples = samples_by_target.get(key, 0.0)
+        rows.append({
+            'job': job,
+            'instance': instance,
+            'health': target.get('health', 'unknown'),
+            'duration': duration,
+            'timeout': timeout,
+            'interval': interval,
+            'timeout_ratio': duration / timeout if timeout else 0.0,
+            'samples': samples,
+            'series_added': added_by_target.get(key, 0.0),
+            'samples_per_second': samples / interval if interval else 0.0,
+        })
+
+    # 成本以耗时占超时的比例为主，样本数为辅
+    rows.sort(key=lambda row: (row['timeout_ratio'], row['samples']), reverse=True)
+    return {
+        'targets': rows,
+        'near_timeout': [row['instance'] for row in rows if row['timeout_ratio'] >= near_ratio],
+        'total_samples': sum(row['samples'] for row in rows),
+        'ingestion_rate': sum(row['samples_per_second'] for row in rows),
+        'series_added': sum(row['series_added'] for row in rows),
+    }
+
+def _values_by_target(series):
+    return {
+        (item.get('metric', {}).get('job', ''), item.get('metric', {}).get('instance', '')):
+            float(item.get('value', [0, 0])[1])
+        for item in series
+    }
+
+def print_scrape_cost(cost, near_ratio=NEAR_TIMEOUT_RATIO, limit=20):
+    """输出抓取成本排名"""
+    print("\n=== Exporter抓取成本 ===")
+    rows = cost['targets']
+    if not rows:
+        print("⚠️  未找到dcgm/hygon exporter target")
+        return
+    print(f"{'实例':<24}{'耗时(s)':>9}{'超时(s)':>9}{'占比':>7}{'样本数':>10}{'新增序列':>10}{'样本/秒':>10}")
+    for row in rows[:limit]:
+        flag = " ⚠️" if row['timeout_ratio'] >= near_ratio else ""
+        print(f"{row['instance']:<24}{row['duration']:>9.3f}{row['timeout']:>9g}{row['timeout_ratio']:>7.0%}"
+              f"{row['samples']:>10.0f}{row['series_added']:>10.0f}{row['samples_per_second']:>10.1f}{flag}")
+    if len(rows) > limit:
+        print(f"... 其余 {len(rows) - limit} 个target")
+
+    print(f"\n集群摄入速率: {cost['ingestion_rate']:.1f} 样本/秒 "
+          f"({cost['total_samples']:.0f} 样本/轮, {len(rows)} 个target)")
+    if cost['series_added']:
+        print(f"最近一次抓取新增序列: {cost['series_added']:.0f}")
+    if cost['near_timeout']:
+        print(f"❌ {len(cost['near_timeout'])} 个target抓取耗时接近超时(≥{near_ratio:.0%}): "
+              f"{', '.join(cost['near_timeout'][:10])}")
+
+def check_local_exporters(quiet=False):
     """检查本地exporter服务"""
     exporters = [
         ("海光DCU Exporter", "http://localhost:9400/metrics"),
         ("Node Exporter", "http://localhost:9100/metrics"),
     ]
-    
-    print("\n=== 本地Exporter状态 ===")
+
+    results = []
+    if not quiet:
+        print("\n=== 本地Exporter状态 ===")
     for name, url in exporters:
+        item = {'name': name, 'url': url, 'up': False, 'metrics': 0, 'families': 0, 'error': ''}
         try:
-            response = requests.get(url, timeout=5)
-            if response.status_code == 200:
-                lines = response.text.split('\n')
-                metric_lines = [line for line in lines if line and not line.startswith('#')]
-                print(f"✅ {name} - 正常运行 ({len(metric_lines)} 个指标)")
-            else:
-                print(f"❌ {name} - HTTP {response.status_code}")
+            analyzer = CardinalityAnalyzer()
+            analyzer.add_url(url, timeout=5)
+            item['metrics'] = analyzer.series
+            item['families'] = len(analyzer.family_series)
+            item['cardinality'] = analyzer.report()
+            item['up'] = True
+        except requests.exceptions.HTTPError as e:
+            item['error'] = f"HTTP {e.response.status_code}"
         except requests.exceptions.ConnectionError:
-            print(f"❌ {name} - 连接失败")
+            item['error'] = "连接失败"
         except Exception as e:
-            print(f"❌ {name} - 错误: {e}")
-
-def check_system_metrics():
-    """检查系统指标可用性"""
-    print("\n=== 系统指标检查 ===")
-    
-    # 检查关键系统指标
-    metrics_to_check = [
-        ("CPU使用率", "100 - (avg(irate(node_cpu_seconds_total{mode=\"idle\"}[5m])) * 100)"),
-        ("内存使用率", "(1 - (node_memory_MemAvailable_bytes / node_memory_MemTotal_bytes)) * 100"),
-        ("系统负载", "node_load1"),
-        ("磁盘IO", "irate(node_disk_read_bytes_total[5m])"),
-        ("网络IO", "irate(node_network_receive_bytes_total{device!=\"lo\"}[5m])"),
-    ]
-    
-    for metric_name, query in metrics_to_check:
-        try:
-            # 查询Prometheus
-            params = {
-                'query': query
-            }
-            response = requests.get('http://192.7.111.66:9090/api/v1/query', 
-                                  params=params, timeout=10)
-            
-            if response.status_code == 200:
-                data = response.json()
-                result = data.get('data', {}).get('result', [])
-                if result:
-                    print(f"✅ {metric_name} - 有数据 ({len(result)} 个数据点)")
-                else:
-                    print(f"⚠️  {metric_name} - 无数据")
-            else:
-                print(f"❌ {metric_name} - 查询失败 HTTP {response.status_code}")
-        except Exception as e:
-            print(f"❌ {metric_name} - 错误: {e}")
-
-def check_hygon_metrics():
-    """检查海光DCU指标"""
-    print("\n=== 海光DCU指标检查 ===")
-    
-    hygon_metrics = [
-        ("DCU使用率", "hygon_dcu_utilization_percent"),
-        ("DCU温度", "hygon_temperature_celsius"),
-        ("DCU功耗", "hygon_power_watts"),
-        ("显存使用", "hygon_vram_usage_bytes"),
-    ]
-    
-    for metric_name, query in hygon_metrics:
-        try:
-            params = {
-                'query': query
-            }
-            response = requests.get('http://192.7.111.66:9090/api/v1/query', 
-                                  params=params, timeout=10)
-            
-            if response.status_code == 200:
-                data = response.json()
-                result = data.get('data', {}).get('result', [])
-                if result:
-                    print(f"✅ {metric_name} - 有数据 ({len(result)} 个DCU)")
-                    # 显示第一个DCU的示例数据
-                    if result:
-                        sample = result[0]
-                        labels = sample.get('metric', {})
-                        value = sample.get('value', [None, 'N/A'])[1]
-                        gpu = labels.get('gpu', 'unknown')
-                        print(f"   示例: DCU {gpu} = {value}")
-                else:
-                    print(f"⚠️  {metric_name} - 无数据")
+            item['error'] = f"错误: {e}"
+        results.append(item)
+
+        if quiet:
+            continue
+        if item['up']:
+            print(f"✅ {name} - 正常运行 ({item['metrics']} 个序列, {item['families']} 个指标族)")
+            top = list(item['cardinality']['families'].items())[:3]
+            if top:
+                print("   序列最多: " + ", ".join(f"{family}({info['series']})" for family, info in top))
+            for suggestion in item['cardinality']['suggestions']:
+                print(f"   💡 标签 {suggestion['label']}: {suggestion['reason']}")
+        else:
+            print(f"❌ {name} - {item['error']}")
+
+    return results
+
+def print_check_results(results):
+    """按分组输出健康检查结果"""
+    groups = {}
+    for result in results:
+        groups.setdefault(result['group'], []).append(result)
+
+    for group, items in groups.items():
+        print(f"\n=== {GROUP_TITLES.get(group, group)} ===")
+        for item in items:
+            name = item['name']
+            if item['status'] == 'error':
+                print(f"❌ {name} - 错误: {item['detail']}")
+            elif item['type'] == 'staleness':
+                icon = {'ok': "✅", 'warn': "⚠️ ", 'fail': "❌"}[item['status']]
+                print(f"{icon} {name} - {item['detail']}")
+                for key in item.get('stale', [])[:10]:
+                    print(f"   过期: {key} ({item['ages'][key]:.0f}s)")
+            elif item['status'] == 'ok':
+                print(f"✅ {name} - 有数据 ({item['results']} 个数据点)")
+                sample = item.get('sample')
+                if group == 'hygon' and sample:
+                    gpu = sample['labels'].get('gpu', 'unknown')
+                    print(f"   示例: DCU {gpu} = {sample['value']}")
             else:
-                print(f"❌ {metric_name} - 查询失败 HTTP {response.status_code}")
-        except Exception as e:
-            print(f"❌ {metric_name} - 错误: {e}")
+                print(f"⚠️  {name} - 无数据")
 
 def main():
     """主函数"""
-    print("=" * 60)
-    print("Prometheus配置和系统指标检查工具")
-    print("=" * 60)
-    
+    parser = argparse.ArgumentParser(description="Prometheus配置和系统指标检查工具")
+    parser.add_argument("--prometheus-url", default=DEFAULT_PROMETHEUS_URL,
+                        help=f"Prometheus地址 (默认: $PROMETHEUS_URL 或 {DEFAULT_PROMETHEUS_URL})")
+    parser.add_argument("--checks", default=str(DEFAULT_CHECKS_FILE), help="健康检查定义YAML文件")
+    parser.add_argument("--workers", type=int, default=8, help="并发查询数")
+    parser.add_argument("--timeout", type=float, default=10, help="单次查询超时(秒)")
+    parser.add_argument("--json", action="store_true", help="以JSON格式输出结果")
+    parser.add_argument("--skip-targets", action="store_true", help="跳过targets检查")
+    parser.add_argument("--skip-local", action="store_true", help="跳过本地exporter检查")
+    parser.add_argument("--cost-jobs", default=DEFAULT_COST_JOBS, help="抓取成本分析的job正则")
+    parser.add_argument("--near-timeout", type=float, default=NEAR_TIMEOUT_RATIO,
+                        help="抓取耗时达到scrape_timeout该比例时告警")
+
+    args = parser.parse_args()
+    quiet = args.json
+
+    client = PrometheusClient(args.prometheus_url, timeout=args.timeout, pool_size=args.workers)
+    checks = HealthCheckEngine.load_checks(args.checks)
+    report = {'prometheus': args.prometheus_url, 'checked_at': time.time()}
+
+    if not quiet:
+        print("=" * 60)
+        print("Prometheus配置和系统指标检查工具")
+        print("=" * 60)
+
     # 检查Prometheus targets
-    check_prometheus_targets()
-    
+    # targets API只请求一次，状态检查和抓取成本分析共用
+    if not args.skip_targets:
+        try:
+            targets = client.targets()
+        except Exception as e:
+            targets = None
+            report['targets'] = None
+            report['scrape_cost'] = {'error': str(e)}
+            if not quiet:
+                print(f"❌ 检查Prometheus targets失败: {e}")
+        if targets is not None:
+            report['targets'] = check_prometheus_targets(client, quiet, targets=targets)
+            try:
+                cost = analyze_scrape_cost(client, args.cost_jobs, args.near_timeout, targets=targets)
+                report['scrape_cost'] = cost
+                if not quiet:
+                    print_scrape_cost(cost, args.near_timeout)
+            except Exception as e:
+                report['scrape_cost'] = {'error': str(e)}
+                if not quiet:
+                    print(f"❌ 抓取成本分析失败: {e}")
+
     # 检查本地exporters
-    check_local_exporters()
-    
-    # 检查系统指标
-    check_system_metrics()
-    
-    # 检查海光DCU指标
-    check_hygon_metrics()
-    
+    if not args.skip_local:
+        report['local_exporters'] = check_local_exporters(quiet)
+
+    # 并发执行指标检查
+    results = HealthCheckEngine(client, checks, args.workers).run()
+    report['checks'] = results
+    healthy = all(result['status'] == 'ok' for result in results)
+    healthy = healthy and not report.get('scrape_cost', {}).get('near_timeout')
+    report['healthy'] = healthy
+
+    if quiet:
+        json.dump(report, sys.stdout, indent=2, ensure_ascii=False)
+        print()
+        sys.exit(0 if healthy else 1)
+
+    print_check_results(results)
+
     print("\n" + "=" * 60)
     print("检查完成！")
     print("\n如果发现问题，请检查:")
@@ -155,6 +429,8 @@ def main():
     print("2. Node exporter是否正常运行")
     print("3. 海光DCU exporter是否正常运行")
     print("4. 防火墙设置是否正确")
+    print("5. 抓取耗时接近超时的exporter是否需要调大scrape_timeout或减少导出序列")
+    sys.exit(0 if healthy else 1)
 
 if __name__ == "__main__":
     main()
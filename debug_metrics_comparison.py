@@ -5,103 +5,247 @@
 比较hy-smi输出与exporter指标的差异
 """
 
+import argparse
+import os
 import subprocess
+import sys
+import threading
+import time
 import requests
 import re
 import json
-from typing import Dict, List, Any
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Dict, List, Any, NamedTuple, Optional
 
-def run_hy_smi() -> Dict[str, Any]:
-    """运行hy-smi并解析输出"""
-    try:
-        result = subprocess.run(['/usr/local/hyhal/bin/hy-smi'], 
-                              capture_output=True, text=True, check=True)
-        
-        lines = result.stdout.strip().split('\n')
-        devices = {}
-        
-        # 查找数据行（跳过标题行）
-        data_started = False
-        for line in lines:
-            if 'DCU' in line and 'Temp' in line:
-                data_started = True
-                continue
-            
-            if data_started and line.strip() and not line.startswith('='):
-                parts = line.split()
-                if len(parts) >= 8:
-                    dcu_id = parts[0]
-                    temp = float(parts[1].replace('C', ''))
-                    power = float(parts[2].replace('W', ''))
-                    perf = parts[3]
-                    power_cap = float(parts[4].replace('W', ''))
-                    vram_percent = float(parts[5].replace('%', ''))
-                    dcu_percent = float(parts[6].replace('%', ''))
-                    mode = parts[7]
-                    
-                    devices[dcu_id] = {
-                        'temperature': temp,
-                        'power': power,
-                        'performance': perf,
-                        'power_cap': power_cap,
-                        'vram_utilization': vram_percent,
-                        'dcu_utilization': dcu_percent,
-                        'mode': mode
-                    }
+# 共享的Prometheus文本解析器位于 hygon-sysfs-exporter/ 目录
+sys.path.insert(0, str(Path(__file__).resolve().parent / "hygon-sysfs-exporter"))
+from metrics_parser import MetricSnapshot
+from remote_exec import RemoteCommandError, load_hosts, make_transport
+
+DEFAULT_HY_SMI = '/usr/local/hyhal/bin/hy-smi'
+DEFAULT_EXPORTER_URL = 'http://localhost:9400/metrics'
+DEFAULT_FLEET_URL_TEMPLATE = 'http://{host}:9400/metrics'
+
+# 默认表格之外的逐设备详细查询：(名称, hy-smi参数)
+DETAIL_QUERIES = [
+    ('vram', ['--showmeminfo', 'vram']),
+    ('use', ['--showuse']),
+    ('power', ['--showpower']),
+    ('temp', ['--showtemp']),
+]
+
+# 默认表格的数据行，例如:
+# "0       58.0C    259.0W     auto     400.0W     97%        34.2%     Normal"
+_NUM = r'(N/A|\d+(?:\.\d+)?)'
+_TABLE_ROW_RE = re.compile(
+    rf'^\s*(\d+)\s+{_NUM}C?\s+{_NUM}W?\s+(\S+)\s+{_NUM}W?\s+{_NUM}%?\s+{_NUM}%?\s+(\S+)'
+)
+
+# 详细查询的输出行，例如: "DCU[0]          : Current Socket Graphics Package Power (W): 259.0"
+_DETAIL_ROW_RE = re.compile(r'^\s*(?:DCU|GPU|HCU)\[(\d+)\]\s*:\s*(.+?)\s*:\s*(\S.*?)\s*$')
+
+class HySmiDevice(NamedTuple):
+    """hy-smi报告的单个DCU"""
+    dcu_id: str
+    temperature: Optional[float]
+    power: Optional[float]
+    performance: str
+    power_cap: Optional[float]
+    vram_utilization: Optional[float]
+    dcu_utilization: Optional[float]
+    mode: str
+    details: Dict[str, Dict[str, str]]  # {详细查询名: {字段: 值}}
+
+class HySmiSample(NamedTuple):
+    """一次hy-smi采样的结果"""
+    timestamp: float
+    devices: Dict[str, HySmiDevice]
+    errors: List[str]
+
+def _to_float(text):
+    return None if text == 'N/A' else float(text)
+
+def parse_hy_smi_table(output, errors=None):
+    """解析hy-smi默认表格，无法识别的数据行记入errors并跳过"""
+    devices = {}
+    data_started = False
+    for line in output.splitlines():
+        if 'DCU' in line and 'Temp' in line:
+            data_started = True
+            continue
+        if not data_started or not line.strip() or line.lstrip().startswith('='):
+            continue
+        if 'End of SMI Log' in line:
+            break
         
-        return devices
-    except Exception as e:
-        print(f"运行hy-smi失败: {e}")
-        return {}
+        match = _TABLE_ROW_RE.match(line)
+        if not match:
+            if errors is not None:
+                errors.append(f"无法解析的hy-smi行: {line.strip()}")
+            continue
+        dcu_id, temp, power, perf, power_cap, vram, dcu, mode = match.groups()
+        devices[dcu_id] = HySmiDevice(
+            dcu_id=dcu_id,
+            temperature=_to_float(temp),
+            power=_to_float(power),
+            performance=perf,
+            power_cap=_to_float(power_cap),
+            vram_utilization=_to_float(vram),
+            dcu_utilization=_to_float(dcu),
+            mode=mode,
+            details={}
+        )
+    return devices
 
-def get_exporter_metrics() -> Dict[str, Any]:
-    """获取exporter指标"""
-    try:
-        response = requests.get('http://localhost:9400/metrics', timeout=10)
-        response.raise_for_status()
+def parse_hy_smi_details(output):
+    """解析 "DCU[N] : 字段 : 值" 格式的详细输出，返回 {dcu_id: {字段: 值}}"""
+    details = {}
+    for line in output.splitlines():
+        match = _DETAIL_ROW_RE.match(line)
+        if match:
+            dcu_id, key, value = match.groups()
+            details.setdefault(dcu_id, {})[key] = value
+    return details
+
+def fixture_name(args):
+    """hy-smi参数对应的录制文件名"""
+    return ('_'.join(arg.lstrip('-') for arg in args) or 'default') + '.txt'
+
+class LocalRunner:
+    """在本机执行hy-smi"""
+    
+    def __init__(self, hy_smi_path=DEFAULT_HY_SMI, timeout=30):
+        self.hy_smi_path = hy_smi_path
+        self.timeout = timeout
+    
+    def __call__(self, args):
+        result = subprocess.run([self.hy_smi_path] + list(args),
+                                capture_output=True, text=True, check=True, timeout=self.timeout)
+        return result.stdout
+
+class FixtureRunner:
+    """从目录回放录制的hy-smi输出（用于无DCU环境的测试）"""
+    
+    def __init__(self, directory):
+        self.directory = Path(directory)
+    
+    def __call__(self, args):
+        path = self.directory / fixture_name(args)
+        if not path.exists():
+            raise FileNotFoundError(f"缺少录制文件: {path}")
+        return path.read_text(encoding='utf-8')
+
+class RemoteRunner:
+    """通过传输层(SSH或本地替身)在目标主机执行hy-smi"""
+    
+    def __init__(self, transport, host, hy_smi_path=DEFAULT_HY_SMI, timeout=60):
+        self.transport = transport
+        self.host = host
+        self.hy_smi_path = hy_smi_path
+        self.timeout = timeout
+    
+    def __call__(self, args):
+        result = self.transport.run(self.host, [self.hy_smi_path] + list(args), timeout=self.timeout)
+        if not result.ok:
+            raise RemoteCommandError(result)
+        return result.stdout
+
+class RecordingRunner:
+    """执行真实命令的同时保存输出，生成FixtureRunner可用的录制目录"""
+    
+    def __init__(self, runner, directory):
+        self.runner = runner
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+    
+    def __call__(self, args):
+        output = self.runner(args)
+        (self.directory / fixture_name(args)).write_text(output, encoding='utf-8')
+        return output
+
+class HySmiSampler:
+    """
+    并行执行hy-smi默认表格和详细查询，解析为HySmiDevice
+    结果在ttl秒内缓存，重复对比不会再次执行hy-smi
+    """
+    
+    def __init__(self, runner=None, detail_queries=DETAIL_QUERIES, ttl=5.0, workers=4):
+        self.runner = runner or LocalRunner()
+        self.detail_queries = detail_queries
+        self.ttl = ttl
+        self.workers = max(1, workers)
+        self._cached = None
+        self._cached_at = 0.0
+        self._lock = threading.Lock()
+    
+    def sample(self, force=False):
+        """返回HySmiSample；缓存未过期时直接复用"""
+        with self._lock:
+            if not force and self._cached is not None and time.monotonic() - self._cached_at < self.ttl:
+                return self._cached
+            self._cached = self._collect()
+            self._cached_at = time.monotonic()
+            return self._cached
+    
+    def _run(self, args):
+        try:
+            return self.runner(args), None
+        except Exception as e:
+            return None, f"hy-smi {' '.join(args) or '(默认)'} 失败: {e}"
+    
+    def _collect(self):
+        queries = [[]] + [args for _, args in self.detail_queries]
+        timestamp = time.time()
+        with ThreadPoolExecutor(max_workers=min(self.workers, len(queries))) as executor:
+            outputs = list(executor.map(self._run, queries))
         
-        metrics = {}
-        lines = response.text.strip().split('\n')
+        errors = [error for _, error in outputs if error]
+        table_output = outputs[0][0]
+        devices = parse_hy_smi_table(table_output, errors) if table_output else {}
         
-        for line in lines:
-            if line.startswith('#') or not line.strip():
+        for (name, _), (output, _) in zip(self.detail_queries, outputs[1:]):
+            if not output:
                 continue
-            
-            # 解析指标行
-            if 'hygon' in line.lower():
-                # 提取指标名称和值
-                parts = line.split()
-                if len(parts) >= 2:
-                    metric_part = parts[0]
-                    value = parts[1]
-                    
-                    # 解析标签
-                    if '{' in metric_part:
-                        metric_name = metric_part.split('{')[0]
-                        labels_str = metric_part.split('{')[1].split('}')[0]
-                        labels = {}
-                        for label_pair in labels_str.split(','):
-                            if '=' in label_pair:
-                                key, val = label_pair.split('=', 1)
-                                labels[key.strip()] = val.strip('"')
-                    else:
-                        metric_name = metric_part
-                        labels = {}
-                    
-                    if metric_name not in metrics:
-                        metrics[metric_name] = []
-                    
-                    metrics[metric_name].append({
-                        'labels': labels,
-                        'value': float(value)
-                    })
+            for dcu_id, fields in parse_hy_smi_details(output).items():
+                device = devices.get(dcu_id)
+                if device is None:
+                    continue
+                device.details[name] = fields
         
-        return metrics
+        return HySmiSample(timestamp, devices, errors)
+
+def run_hy_smi(sampler=None) -> Dict[str, HySmiDevice]:
+    """运行hy-smi并解析输出"""
+    result = (sampler or HySmiSampler()).sample()
+    for error in result.errors:
+        print(f"   ⚠️  {error}")
+    return result.devices
+
+def get_exporter_snapshot(url=DEFAULT_EXPORTER_URL) -> Optional[MetricSnapshot]:
+    """抓取一次exporter指标，失败返回None"""
+    try:
+        return MetricSnapshot.from_url(url)
     except Exception as e:
         print(f"获取exporter指标失败: {e}")
+        return None
+
+def get_exporter_metrics(url=DEFAULT_EXPORTER_URL, snapshot=None) -> Dict[str, Any]:
+    """获取exporter指标；传入snapshot时不再重新抓取"""
+    snapshot = snapshot or get_exporter_snapshot(url)
+    if snapshot is None:
         return {}
+    metrics = {}
+    for sample in snapshot.samples:
+        if 'hygon' not in sample.name.lower():
+            continue
+        metrics.setdefault(sample.name, []).append({
+            'labels': sample.labels_dict(),
+            'value': sample.value
+        })
+    return metrics
 
-def compare_metrics():
+def compare_metrics(sampler=None, exporter_url=DEFAULT_EXPORTER_URL):
     """对比hy-smi和exporter指标"""
     print("=" * 80)
     print("海光DCU指标对比分析")
@@ -109,19 +253,20 @@ def compare_metrics():
     
     # 获取hy-smi数据
     print("\n1. 获取hy-smi数据...")
-    hy_smi_data = run_hy_smi()
+    hy_smi_data = run_hy_smi(sampler)
     if hy_smi_data:
         print(f"   发现 {len(hy_smi_data)} 个DCU设备")
         for dcu_id, data in hy_smi_data.items():
-            print(f"   DCU {dcu_id}: 温度={data['temperature']}°C, "
-                  f"功耗={data['power']}W, DCU使用率={data['dcu_utilization']}%, "
-                  f"显存使用率={data['vram_utilization']}%")
+            print(f"   DCU {dcu_id}: 温度={data.temperature}°C, "
+                  f"功耗={data.power}W, DCU使用率={data.dcu_utilization}%, "
+                  f"显存使用率={data.vram_utilization}%")
     else:
         print("   未获取到hy-smi数据")
     
     # 获取exporter数据
     print("\n2. 获取exporter指标...")
-    exporter_data = get_exporter_metrics()
+    snapshot = get_exporter_snapshot(exporter_url)
+    exporter_data = get_exporter_metrics(snapshot=snapshot) if snapshot else {}
     if exporter_data:
         print(f"   发现 {len(exporter_data)} 种指标类型")
         for metric_name, values in exporter_data.items():
@@ -177,16 +322,16 @@ def compare_metrics():
                 labels = value_data['labels']
                 if labels.get('device_id') == dcu_id:
                     if 'temperature' in metric_name:
-                        print(f"     温度: hy-smi={hy_data['temperature']}°C, exporter={value_data['value']}°C")
+                        print(f"     温度: hy-smi={hy_data.temperature}°C, exporter={value_data['value']}°C")
                         found_temp = True
                     elif 'power' in metric_name:
-                        print(f"     功耗: hy-smi={hy_data['power']}W, exporter={value_data['value']}W")
+                        print(f"     功耗: hy-smi={hy_data.power}W, exporter={value_data['value']}W")
                         found_power = True
                     elif 'utilization' in metric_name and 'memory' not in metric_name:
-                        print(f"     DCU使用率: hy-smi={hy_data['dcu_utilization']}%, exporter={value_data['value']}%")
+                        print(f"     DCU使用率: hy-smi={hy_data.dcu_utilization}%, exporter={value_data['value']}%")
                         found_util = True
                     elif 'memory' in metric_name and 'utilization' in metric_name:
-                        print(f"     显存使用率: hy-smi={hy_data['vram_utilization']}%, exporter={value_data['value']}%")
+                        print(f"     显存使用率: hy-smi={hy_data.vram_utilization}%, exporter={value_data['value']}%")
                         found_mem = True
         
         if not found_temp:
@@ -197,11 +342,387 @@ def compare_metrics():
             print(f"     ❌ 未找到DCU使用率指标")
         if not found_mem:
             print(f"     ❌ 未找到显存使用率指标")
+    
+    compare_details(hy_smi_data, snapshot)
+
+# 详细查询字段与exporter指标的对应：(查询名, 字段名正则, exporter指标, 标签过滤, 标题)
+DETAIL_COMPARISONS = [
+    ('vram', re.compile(r'used', re.I), 'hygon_vram_usage_bytes', {}, '显存使用量(B)'),
+    ('vram', re.compile(r'total memory', re.I), 'hygon_vram_total_bytes', {}, '显存总量(B)'),
+    ('temp', re.compile(r'edge', re.I), 'hygon_temperature_celsius', {'sensor': 'edge'}, '边缘温度(°C)'),
+    ('temp', re.compile(r'junction', re.I), 'hygon_temperature_celsius', {'sensor': 'junction'}, '结温(°C)'),
+    ('temp', re.compile(r'mem', re.I), 'hygon_temperature_celsius', {'sensor': 'memory'}, '显存温度(°C)'),
+    ('power', re.compile(r'power', re.I), 'hygon_power_watts', {}, '功耗(W)'),
+    ('use', re.compile(r'use', re.I), 'hygon_dcu_utilization_percent', {}, 'DCU使用率(%)'),
+]
+
+_LEADING_NUMBER_RE = re.compile(r'^-?\d+(?:\.\d+)?')
+
+def detail_value(device, query, pattern):
+    """取出详细查询中第一个名称匹配pattern的数值字段，找不到返回None"""
+    for field, value in device.details.get(query, {}).items():
+        if pattern.search(field):
+            match = _LEADING_NUMBER_RE.match(value)
+            if match:
+                return float(match.group(0))
+    return None
+
+def _format_detail(value, title):
+    """字节数按整数输出，其余按%g"""
+    return f"{value:,.0f}" if title.endswith('(B)') else f"{value:g}"
+
+def compare_details(hy_smi_data, snapshot):
+    """对比详细查询中默认表格没有的字段（显存字节数、各温度传感器等）"""
+    if snapshot is None or not any(device.details for device in hy_smi_data.values()):
+        return
+    print(f"\n   详细查询对比:")
+    for dcu_id, device in hy_smi_data.items():
+        families = snapshot.device(dcu_id)
+        lines = []
+        for query, pattern, family, labels, title in DETAIL_COMPARISONS:
+            hy_value = detail_value(device, query, pattern)
+            if hy_value is None:
+                continue
+            exporter_value = next((sample.value for sample in families.get(family, [])
+                                   if all(sample.label(k) == v for k, v in labels.items())), None)
+            hy_text = _format_detail(hy_value, title)
+            if exporter_value is None:
+                lines.append(f"     {title}: hy-smi={hy_text}, exporter=缺失")
+            else:
+                diff = exporter_value - hy_value
+                lines.append(f"     {title}: hy-smi={hy_text}, exporter={_format_detail(exporter_value, title)}, "
+                             f"差值={'+' if diff >= 0 else '-'}{_format_detail(abs(diff), title)}")
+        if lines:
+            print(f"\n   DCU {dcu_id}:")
+            print("\n".join(lines))
+
+# hy-smi字段对应的exporter指标，按顺序尝试：
+# sysfs exporter (hygon_*_celsius/_watts/_percent) 与 dcgm-exporter海光模式 (hygon_temperature等)
+EXPORTER_SOURCES = {
+    'temperature': [('hygon_temperature_celsius', {'sensor': 'edge'}),
+                    ('hygon_temperature_celsius', {}),
+                    ('hygon_temperature', {})],
+    'power': [('hygon_power_watts', {}), ('hygon_avg_power', {})],
+    'dcu_utilization': [('hygon_dcu_utilization_percent', {}), ('hygon_dcu_usage', {})],
+    'vram_utilization': [('hygon_vram_usage', {})],
+}
+
+# 每个指标默认允许的最大绝对误差
+DEFAULT_TOLERANCES = {
+    'temperature': 3.0,
+    'power': 15.0,
+    'dcu_utilization': 10.0,
+    'vram_utilization': 5.0,
+}
+
+def exporter_device_value(snapshot, device_id, metric):
+    """从快照中取出某设备与hy-smi字段对应的值，找不到返回None"""
+    families = snapshot.device(device_id)
+    for family, labels in EXPORTER_SOURCES.get(metric, []):
+        for sample in families.get(family, []):
+            if all(sample.label(k) == v for k, v in labels.items()):
+                return sample.value
+    
+    # sysfs exporter 只导出字节数，按 usage/total 换算显存使用率
+    if metric == 'vram_utilization':
+        used = families.get('hygon_vram_usage_bytes')
+        total = families.get('hygon_vram_total_bytes')
+        if used and total and total[0].value > 0:
+            return used[0].value / total[0].value * 100
+    return None
+
+def _timed(func, *args):
+    """执行函数，返回 (开始时间, 结束时间, 结果或异常)"""
+    start = time.time()
+    try:
+        result = func(*args)
+    except Exception as e:
+        result = e
+    return start, time.time(), result
+
+def collect_aligned_samples(sampler, exporter_url, count, interval, session=None, verbose=True):
+    """
+    交替采集count组hy-smi和exporter读数，每组两个来源并发读取
+    返回 (hy-smi读数列表, exporter读数列表)，元素为 (时间戳, 结果)，时间戳取读取区间中点
+    """
+    session = session or requests.Session()
+    hy_readings = []
+    exporter_readings = []
+    next_tick = time.monotonic()
+    
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        for i in range(count):
+            hy_future = executor.submit(_timed, sampler.sample, True)
+            ex_future = executor.submit(_timed, MetricSnapshot.from_url, exporter_url, session)
+            
+            for future, readings, name in ((hy_future, hy_readings, "hy-smi"),
+                                           (ex_future, exporter_readings, "exporter")):
+                start, end, result = future.result()
+                if isinstance(result, Exception):
+                    if verbose:
+                        print(f"   ⚠️  第{i + 1}组 {name} 读取失败: {result}")
+                    continue
+                readings.append(((start + end) / 2, result))
+            
+            if verbose:
+                print(f"   已采集 {i + 1}/{count} 组")
+            next_tick += interval
+            if i + 1 < count:
+                time.sleep(max(0.0, next_tick - time.monotonic()))
+    
+    return hy_readings, exporter_readings
+
+def align_readings(hy_readings, exporter_readings, max_skew):
+    """
+    按时间把hy-smi读数与exporter读数一一配对：时间差小的优先，每个读数最多使用一次，
+    超过max_skew的不配对；结果按hy-smi读数的顺序返回
+    """
+    candidates = sorted(
+        (abs(ex_time - hy_time), hy_index, ex_index)
+        for hy_index, (hy_time, _) in enumerate(hy_readings)
+        for ex_index, (ex_time, _) in enumerate(exporter_readings)
+        if abs(ex_time - hy_time) <= max_skew)
+    matched = {}
+    used = set()
+    for skew, hy_index, ex_index in candidates:
+        if hy_index in matched or ex_index in used:
+            continue
+        matched[hy_index] = (skew, ex_index)
+        used.add(ex_index)
+    return [(skew, hy_readings[hy_index][1], exporter_readings[ex_index][1])
+            for hy_index, (skew, ex_index) in sorted(matched.items())]
+
+def error_stats(points):
+    """points为 [(hy-smi值, exporter值)]，返回 (偏差, 最大绝对误差, 相关系数)"""
+    errors = [exporter - reference for reference, exporter in points]
+    bias = sum(errors) / len(errors)
+    max_abs = max(abs(error) for error in errors)
+    
+    correlation = None
+    if len(points) > 1:
+        xs = [p[0] for p in points]
+        ys = [p[1] for p in points]
+        mean_x = sum(xs) / len(xs)
+        mean_y = sum(ys) / len(ys)
+        cov = sum((x - mean_x) * (y - mean_y) for x, y in points)
+        var_x = sum((x - mean_x) ** 2 for x in xs)
+        var_y = sum((y - mean_y) ** 2 for y in ys)
+        if var_x > 0 and var_y > 0:
+            correlation = cov / (var_x * var_y) ** 0.5
+    return bias, max_abs, correlation
+
+def analyze_aligned(pairs, tolerances):
+    """按设备和指标汇总误差，返回结果行列表"""
+    points = {}
+    for _, hy_sample, snapshot in pairs:
+        for dcu_id, device in hy_sample.devices.items():
+            for metric in tolerances:
+                reference = getattr(device, metric, None)
+                observed = exporter_device_value(snapshot, dcu_id, metric)
+                if reference is None or observed is None:
+                    continue
+                points.setdefault((dcu_id, metric), []).append((reference, observed))
+    
+    rows = []
+    for (dcu_id, metric), values in points.items():
+        bias, max_abs, correlation = error_stats(values)
+        rows.append({
+            'dcu': dcu_id,
+            'metric': metric,
+            'samples': len(values),
+            'bias': bias,
+            'max_abs_error': max_abs,
+            'correlation': correlation,
+            'tolerance': tolerances[metric],
+            'passed': max_abs <= tolerances[metric]
+        })
+    rows.sort(key=lambda row: (int(row['dcu']) if row['dcu'].isdigit() else 0, row['dcu'], row['metric']))
+    return rows
+
+def compare_aligned(sampler, exporter_url, count, interval, tolerances, max_skew=None):
+    """多组时间对齐采样对比"""
+    print("=" * 80)
+    print(f"海光DCU指标时间对齐对比 ({count} 组样本, 间隔 {interval}s)")
+    print("=" * 80)
+    
+    print("\n1. 交替采集hy-smi与exporter数据...")
+    hy_readings, exporter_readings = collect_aligned_samples(sampler, exporter_url, count, interval)
+    max_skew = max_skew if max_skew is not None else max(interval / 2, 1.0)
+    pairs = align_readings(hy_readings, exporter_readings, max_skew)
+    if not pairs:
+        print("   无法进行对比：没有时间对齐的样本")
+        return False
+    
+    skews = [skew for skew, _, _ in pairs]
+    print(f"   对齐样本 {len(pairs)} 组, 平均时间差 {sum(skews) / len(skews) * 1000:.0f}ms, "
+          f"最大 {max(skews) * 1000:.0f}ms")
+    
+    print("\n2. 误差统计 (误差 = exporter - hy-smi)...")
+    rows = analyze_aligned(pairs, tolerances)
+    if not rows:
+        print("   未找到可对比的设备指标")
+        return False
+    
+    print(f"   {'DCU':<5}{'指标':<18}{'样本':>5}{'偏差':>10}{'最大误差':>10}{'相关系数':>10}{'容差':>8}  结果")
+    for row in rows:
+        corr = f"{row['correlation']:.3f}" if row['correlation'] is not None else "N/A"
+        status = "✅" if row['passed'] else "❌"
+        print(f"   {row['dcu']:<5}{row['metric']:<18}{row['samples']:>5}{row['bias']:>+10.2f}"
+              f"{row['max_abs_error']:>10.2f}{corr:>10}{row['tolerance']:>8g}  {status}")
+    
+    failed = [row for row in rows if not row['passed']]
+    if failed:
+        print(f"\n   ⚠️  {len(failed)} 项超出容差")
+    else:
+        print("\n   ✅ 全部指标在容差范围内")
+    return not failed
+
+def audit_host(host, transport, session, url_template, hy_smi_path, fixtures,
+               count, interval, tolerances, max_skew):
+    """审计单台主机，返回 {'host', 'rows', 'error', 'elapsed'}"""
+    start = time.perf_counter()
+    if fixtures:
+        host_dir = Path(fixtures) / host
+        runner = FixtureRunner(host_dir if host_dir.is_dir() else fixtures)
+    else:
+        runner = RemoteRunner(transport, host, hy_smi_path)
+    sampler = HySmiSampler(runner, detail_queries=[], ttl=0)
+    
+    hy_readings, exporter_readings = collect_aligned_samples(
+        sampler, url_template.format(host=host), count, interval, session, verbose=False)
+    result = {'host': host, 'rows': [], 'error': '', 'elapsed': 0.0}
+    
+    hy_errors = [error for _, sample in hy_readings for error in sample.errors]
+    if not any(sample.devices for _, sample in hy_readings):
+        result['error'] = hy_errors[0] if hy_errors else "hy-smi未返回设备"
+    elif not exporter_readings:
+        result['error'] = "exporter不可访问"
+    else:
+        pairs = align_readings(hy_readings, exporter_readings, max_skew)
+        rows = analyze_aligned(pairs, tolerances)
+        for row in rows:
+            row['host'] = host
+        result['rows'] = rows
+        
+        hy_count = len(pairs[-1][1].devices) if pairs else 0
+        exporter_count = len(pairs[-1][2].device_ids()) if pairs else 0
+        if hy_count != exporter_count:
+            result['error'] = f"设备数量不一致: hy-smi={hy_count}, exporter={exporter_count}"
+    
+    result['elapsed'] = time.perf_counter() - start
+    return result
+
+def audit_fleet(hosts, args, tolerances):
+    """并发审计多台主机的hy-smi与exporter漂移，输出按误差排序的汇总报告"""
+    transport = make_transport(args.transport, user=args.ssh_user)
+    session = requests.Session()
+    adapter = requests.adapters.HTTPAdapter(pool_connections=max(len(hosts), 1), pool_maxsize=2)
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    max_skew = args.max_skew if args.max_skew is not None else max(args.sample_interval / 2, 1.0)
+    
+    print("=" * 80)
+    print(f"海光DCU集群漂移审计 ({len(hosts)} 台主机, 每台 {args.samples} 组样本)")
+    print("=" * 80)
+    
+    results = []
+    try:
+        with ThreadPoolExecutor(max_workers=max(1, min(args.workers, len(hosts)))) as executor:
+            futures = [executor.submit(audit_host, host, transport, session, args.url_template,
+                                       args.hy_smi_path, args.hy_smi_fixtures, args.samples,
+                                       args.sample_interval, tolerances, max_skew)
+                       for host in hosts]
+            for future in futures:
+                result = future.result()
+                results.append(result)
+                status = "⚠️ " if result['error'] else "✓"
+                print(f"   {status} {result['host']} ({result['elapsed']:.1f}s) {result['error']}")
+    finally:
+        transport.close_all()
+    
+    rows = [row for result in results for row in result['rows']]
+    # 按误差相对容差的比例排序，不同量纲的指标可以放在一起比较
+    rows.sort(key=lambda row: row['max_abs_error'] / row['tolerance'] if row['tolerance'] else row['max_abs_error'],
+              reverse=True)
+    mismatches = [row for row in rows if not row['passed']]
+    shown = rows if args.show_all else mismatches
+    
+    print(f"\n{'主机':<20}{'DCU':<5}{'指标':<18}{'样本':>5}{'偏差':>10}{'最大误差':>10}{'容差':>8}  结果")
+    for row in shown:
+        status = "✅" if row['passed'] else "❌"
+        print(f"{row['host']:<20}{row['dcu']:<5}{row['metric']:<18}{row['samples']:>5}"
+              f"{row['bias']:>+10.2f}{row['max_abs_error']:>10.2f}{row['tolerance']:>8g}  {status}")
+    
+    failed_hosts = [result for result in results if result['error']]
+    print(f"\n共 {len(rows)} 项对比, {len(mismatches)} 项超出容差, {len(failed_hosts)} 台主机异常")
+    
+    if args.report_json:
+        with open(args.report_json, 'w', encoding='utf-8') as f:
+            json.dump({'hosts': results, 'mismatches': mismatches}, f, indent=2, ensure_ascii=False)
+        print(f"报告已写入 {args.report_json}")
+    
+    return not mismatches and not failed_hosts
+
+def parse_tolerances(values):
+    """解析 metric=value 形式的容差参数"""
+    tolerances = dict(DEFAULT_TOLERANCES)
+    for item in values or []:
+        metric, _, value = item.partition('=')
+        if metric not in DEFAULT_TOLERANCES or not value:
+            raise ValueError(f"无效的容差: {item} (可用指标: {', '.join(DEFAULT_TOLERANCES)})")
+        tolerances[metric] = float(value)
+    return tolerances
+
+def build_sampler(args, detail_queries=DETAIL_QUERIES):
+    """根据命令行参数创建hy-smi采样器"""
+    if args.hy_smi_fixtures:
+        runner = FixtureRunner(args.hy_smi_fixtures)
+    else:
+        runner = LocalRunner(args.hy_smi_path)
+        if args.record_fixtures:
+            runner = RecordingRunner(runner, args.record_fixtures)
+    return HySmiSampler(runner, detail_queries=detail_queries, ttl=args.hy_smi_ttl)
 
 def main():
     """主函数"""
+    parser = argparse.ArgumentParser(description="海光DCU指标对比调试工具")
+    parser.add_argument("--hy-smi-path", default=os.environ.get("HY_SMI_PATH", DEFAULT_HY_SMI),
+                        help=f"hy-smi路径 (默认: $HY_SMI_PATH 或 {DEFAULT_HY_SMI})")
+    parser.add_argument("--hy-smi-fixtures", help="从目录回放录制的hy-smi输出，不执行hy-smi")
+    parser.add_argument("--record-fixtures", help="执行hy-smi的同时把输出录制到目录")
+    parser.add_argument("--hy-smi-ttl", type=float, default=5.0, help="hy-smi结果缓存时间(秒)")
+    parser.add_argument("--exporter-url", default=DEFAULT_EXPORTER_URL, help="exporter指标地址")
+    parser.add_argument("--samples", type=int, default=1,
+                        help="采样组数，大于1时进行时间对齐的多样本对比")
+    parser.add_argument("--sample-interval", type=float, default=2.0, help="多样本对比的采样间隔(秒)")
+    parser.add_argument("--max-skew", type=float, help="对齐时允许的最大时间差(秒)，默认为间隔的一半且不小于1秒")
+    parser.add_argument("--tolerance", action="append", metavar="METRIC=VALUE",
+                        help=f"指标容差(最大绝对误差)，可多次指定，可用指标: {', '.join(DEFAULT_TOLERANCES)}")
+    parser.add_argument("--hosts", help="集群模式: 逗号分隔的主机列表")
+    parser.add_argument("--hosts-file", help="集群模式: 主机列表文件，每行一个")
+    parser.add_argument("--url-template", default=DEFAULT_FLEET_URL_TEMPLATE,
+                        help=f"集群模式exporter地址模板 (默认: {DEFAULT_FLEET_URL_TEMPLATE})")
+    parser.add_argument("--transport", choices=["ssh", "local"], default="ssh",
+                        help="集群模式执行hy-smi的方式 (local: 本机子进程，用于测试)")
+    parser.add_argument("--ssh-user", default="root", help="SSH用户名")
+    parser.add_argument("--workers", type=int, default=16, help="集群模式并发主机数")
+    parser.add_argument("--show-all", action="store_true", help="集群模式显示所有对比项，而不仅是超差项")
+    parser.add_argument("--report-json", help="集群模式报告写入JSON文件")
+    
+    args = parser.parse_args()
+    
     try:
-        compare_metrics()
+        if args.hosts or args.hosts_file:
+            hosts = load_hosts(args.hosts, args.hosts_file)
+            ok = audit_fleet(hosts, args, parse_tolerances(args.tolerance))
+            sys.exit(0 if ok else 1)
+        if args.samples > 1:
+            # 多样本模式只需要默认表格，减少每次采样的耗时
+            sampler = build_sampler(args, detail_queries=[])
+            ok = compare_aligned(sampler, args.exporter_url, args.samples, args.sample_interval,
+                                 parse_tolerances(args.tolerance), args.max_skew)
+            sys.exit(0 if ok else 1)
+        compare_metrics(build_sampler(args), args.exporter_url)
     except KeyboardInterrupt:
         print("\n\n程序被用户中断")
     except Exception as e:
@@ -0,0 +1,647 @@
+#!/usr/bin/env python3
+"""
+Grafana仪表板查询开销检查
+检查仓库自带仪表板中的PromQL：可合并为记录规则的重复/近似查询、相对抓取间隔过短的
+rate/irate窗口、无界正则匹配；提供exposition样本时估算每个面板触及的序列数。
+--rules-out 生成记录规则，--rewrite 把重复查询改写为读取记录规则
+"""
+
+import argparse
+import json
+import math
+import re
+import sys
+from collections import Counter, defaultdict
+from pathlib import Path
+from typing import List, NamedTuple, Tuple
+
+import yaml
+
+from setup_grafana_monitoring import PROJECT_ROOT, load_dashboard
+
+sys.path.insert(0, str(PROJECT_ROOT / "hygon-sysfs-exporter"))
+from metrics_parser import ExpositionParser, stream_samples  # noqa: E402
+
+PROMETHEUS_CONFIG = PROJECT_ROOT / "prometheus" / "prometheus.yml"
+DEFAULT_RULES_FILE = PROJECT_ROOT / "prometheus" / "rules" / "dashboard-recording.yml"
+RULE_GROUP = "dashboard-recording"
+
+# 区间函数要求窗口覆盖的最少抓取周期数：
+# rate类需要4个周期才能容忍一次抓取失败，irate类至少需要两个样本
+RANGE_FUNCTIONS = {'rate': 4, 'increase': 4, 'delta': 4, 'deriv': 4, 'irate': 2, 'idelta': 2}
+
+# 指标名前缀 -> prometheus.yml中对应job名包含的关键字
+JOB_HINTS = (('DCGM_', 'dcgm'), ('hygon_', 'hygon'), ('node_', 'node'), ('container_', 'cadvisor'))
+
+AGGREGATIONS = {'sum', 'avg', 'min', 'max', 'count', 'stddev', 'stdvar', 'topk', 'bottomk',
+                'quantile', 'count_values', 'group'}
+GROUPING = {'by', 'without', 'on', 'ignoring', 'group_left', 'group_right'}
+KEYWORDS = GROUPING | {'bool', 'offset', 'and', 'or', 'unless', 'inf', 'nan', 'Inf', 'NaN'}
+
+# 匹配任意值的正则
+MATCH_ALL = {'.*', '.+', '.*.*', '(.*)', '(.+)', '^.*$', '^.+$'}
+
+_TOKEN_RE = re.compile(
+    r'"(?:[^"\\]|\\.)*"|\'(?:[^\'\\]|\\.)*\''
+    r'|\{(?:[^}"]|"(?:[^"\\]|\\.)*")*\}'
+    r'|\[[^\]]*\]'
+    r'|\d+(?:ms|[smhdwy])(?:\d+(?:ms|[smhdwy]))*\b'
+    r'|[a-zA-Z_:][a-zA-Z0-9_:]*(?:\s*\()?'
+    r'|\$\w+|\$\{[^}]*\}|\[\[\w+\]\]'
+    r'|\d+(?:\.\d+)?(?:[eE][+-]?\d+)?'
+    r'|==|!=|>=|<='
+    r'|\S'
+)
+_MATCHER_RE = re.compile(r'([a-zA-Z_][a-zA-Z0-9_]*)\s*(=~|!~|!=|=)\s*"((?:[^"\\]|\\.)*)"')
+_DURATION_RE = re.compile(r'(\d+)(ms|[smhdwy])')
+_DURATION_UNITS = {'ms': 0.001, 's': 1, 'm': 60, 'h': 3600, 'd': 86400, 'w': 604800, 'y': 31536000}
+_VARIABLE_RE = re.compile(r'\$\{(\w+)[^}]*\}|\$(\w+)|\[\[(\w+)\]\]')
+# 整个表达式乘以100：结果是百分比而不是比值
+_PERCENT_RE = re.compile(r'(?:^|[)\s])\*\s*100(?:\.0*)?\s*$|^\s*100(?:\.0*)?\s*\*')
+
+
+class Selector(NamedTuple):
+    """查询中的向量选择器"""
+    metric: str
+    matchers: Tuple[Tuple[str, str, str], ...]
+    range: str = ''
+    function: str = ''
+
+
+class ParsedQuery(NamedTuple):
+    """PromQL的结构摘要（只做开销分析需要的浅层解析）"""
+    selectors: Tuple[Selector, ...]
+    functions: Tuple[str, ...]
+    by_labels: Tuple[str, ...]
+    aggregated: bool
+    vector_matching: bool
+
+
+class PanelQuery(NamedTuple):
+    """面板中的一条查询"""
+    dashboard: str
+    path: str
+    panel_id: object
+    panel: str
+    ref_id: str
+    expr: str
+
+
+class Finding(NamedTuple):
+    """检查发现的问题"""
+    severity: str
+    rule: str
+    dashboard: str
+    panel: str
+    expr: str
+    message: str
+
+
+def parse_duration(text):
+    """解析PromQL时长（如 5m、1h30m），无法解析（模板变量等）时返回None"""
+    text = text.strip()
+    if not re.fullmatch(r'(?:\d+(?:ms|[smhdwy]))+', text):
+        return None
+    return sum(int(value) * _DURATION_UNITS[unit] for value, unit in _DURATION_RE.findall(text))
+
+
+def format_duration(seconds):
+    seconds = int(math.ceil(seconds))
+    for unit, size in (('h', 3600), ('m', 60)):
+        if seconds >= size and seconds % size == 0:
+            return f"{seconds // size}{unit}"
+    return f"{seconds}s"
+
+
+def has_variable(text):
+    return bool(_VARIABLE_RE.search(text))
+
+
+def parse_matchers(block):
+    return tuple(_MATCHER_RE.findall(block))
+
+
+def parse_query(expr) -> ParsedQuery:
+    """提取选择器、函数调用、聚合标签和向量匹配修饰符"""
+    tokens = _TOKEN_RE.findall(expr)
+    selectors, functions, by_labels = [], [], []
+    aggregated = vector_matching = False
+    i = 0
+    while i < len(tokens):
+        token = tokens[i]
+        word = token.rstrip('( \t\r\n')
+        is_call = token.endswith('(') and bool(word)
+        if word in GROUPING:
+            vector_matching |= word not in ('by', 'without')
+            if not is_call and i + 1 < len(tokens) and tokens[i + 1] == '(':
+                i, is_call = i + 1, True
+            if is_call:
+                while i + 1 < len(tokens) and tokens[i + 1] != ')':
+                    i += 1
+                    if word == 'by' and re.fullmatch(r'[a-zA-Z_]\w*', tokens[i]):
+                        by_labels.append(tokens[i])
+        elif word == 'offset':
+            i += 1
+        elif word in AGGREGATIONS:
+            functions.append(word)
+            aggregated = True
+        elif is_call:
+            functions.append(word)
+        elif token[0] == '{' or (re.fullmatch(r'[a-zA-Z_:][a-zA-Z0-9_:]*', token) and token not in KEYWORDS):
+            start = i
+            metric, matchers = ('', parse_matchers(token)) if token[0] == '{' else (token, ())
+            if metric and i + 1 < len(tokens) and tokens[i + 1][0] == '{':
+                i += 1
+                matchers = parse_matchers(tokens[i])
+            window = ''
+            if i + 1 < len(tokens) and tokens[i + 1][0] == '[' and not tokens[i + 1].startswith('[['):
+                i += 1
+                window = tokens[i][1:-1].split(':', 1)[0].strip()
+            if not metric:
+                metric = next((value for name, op, value in matchers if name == '__name__' and op == '='), '')
+            previous = tokens[start - 1] if start > 0 else ''
+            function = previous.rstrip('( \t\r\n') if previous.endswith('(') else ''
+            selectors.append(Selector(metric, matchers, window, function))
+        i += 1
+    return ParsedQuery(tuple(selectors), tuple(functions), tuple(by_labels), aggregated, vector_matching)
+
+
+def _render_matchers(block, drop_variables):
+    matchers = [m for m in parse_matchers(block) if not (drop_variables and has_variable(m[2]))]
+    if not matchers:
+        return ''
+    return '{' + ','.join(f'{name}{op}"{value}"' for name, op, value in sorted(matchers)) + '}'
+
+
+def normalize(expr, drop_variables=False):
+    """
+    规范化查询文本：按token重新排版、匹配器排序；
+    drop_variables=True 时去掉引用模板变量的匹配器（这些过滤可以叠加在记录规则之上）
+    """
+    text = ''
+    for token in _TOKEN_RE.findall(expr):
+        if token[0] == '{':
+            token = _render_matchers(token, drop_variables)
+            if not token:
+                continue
+        elif token.endswith('('):
+            token = re.sub(r'\s+', '', token)
+        if text and text[-1] not in '([' and token[0] not in ')],[{':
+            text += ' '
+        text += token
+    return text
+
+
+def variable_matchers(expr):
+    """引用模板变量的匹配器（去重并排序）"""
+    found = set()
+    for token in _TOKEN_RE.findall(expr):
+        if token[0] == '{':
+            found.update(m for m in parse_matchers(token) if has_variable(m[2]))
+    return tuple(sorted(found))
+
+
+def iter_panels(panels):
+    """遍历面板，包括折叠行内嵌的面板"""
+    for panel in panels or []:
+        yield panel
+        yield from iter_panels(panel.get('panels'))
+
+
+def dashboard_panels(model):
+    panels = list(model.get('panels') or [])
+    for row in model.get('rows') or []:
+        panels.extend(row.get('panels') or [])
+    return iter_panels(panels)
+
+
+def find_dashboards(root=PROJECT_ROOT):
+    """仓库根目录和grafana/下的所有仪表板JSON"""
+    paths = sorted(Path(root).glob('*.json')) + sorted((Path(root) / 'grafana').rglob('*.json'))
+    dashboards = []
+    for path in paths:
+        try:
+            item = load_dashboard(path)
+        except (ValueError, OSError, AttributeError):
+            continue
+        if 'panels' in item.model or 'rows' in item.model:
+            dashboards.append(item)
+    return dashboards
+
+
+def collect_queries(dashboard) -> List[PanelQuery]:
+    queries = []
+    for panel in dashboard_panels(dashboard.model):
+        for target in panel.get('targets') or []:
+            expr = target.get('expr')
+            if expr and expr.strip():
+                queries.append(PanelQuery(dashboard.title, dashboard.path, panel.get('id'),
+                                          panel.get('title') or f"#{panel.get('id')}",
+                                          target.get('refId', ''), expr))
+    return queries
+
+
+def load_scrape_intervals(path=PROMETHEUS_CONFIG):
+    """读取prometheus.yml，返回 (全局抓取间隔, {job: 抓取间隔})，单位秒"""
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            config = yaml.safe_load(f) or {}
+    except OSError:
+        return 15.0, {}
+    default = parse_duration(str(config.get('global', {}).get('scrape_interval', '1m'))) or 60.0
+    jobs = {}
+    for job in config.get('scrape_configs') or []:
+        jobs[job.get('job_name', '')] = parse_duration(str(job.get('scrape_interval', ''))) or default
+    return default, jobs
+
+
+class ScrapeIntervals:
+    """按指标名前缀推断所属job的抓取间隔"""
+
+    def __init__(self, default, jobs=None, override=None):
+        self.default = default
+        self.jobs = jobs or {}
+        self.override = override
+
+    def get(self, metric):
+        if self.override:
+            return self.override
+        for prefix, hint in JOB_HINTS:
+            if metric.startswith(prefix):
+                matches = [value for job, value in self.jobs.items() if hint in job.lower()]
+                if matches:
+                    return max(matches)
+        return self.default
+
+
+def template_variables(model):
+    return {item.get('name'): item for item in (model.get('templating') or {}).get('list') or []}
+
+
+def lint_query(query, parsed, intervals, variables):
+    """检查单条查询的窗口和正则匹配"""
+    findings = []
+
+    def add(severity, rule, message):
+        findings.append(Finding(severity, rule, query.dashboard, query.panel, query.expr, message))
+
+    for selector in parsed.selectors:
+        factor = RANGE_FUNCTIONS.get(selector.function)
+        if factor and selector.range:
+            scrape = intervals.get(selector.metric)
+            window = parse_duration(selector.range)
+            if selector.range in ('$__interval', '${__interval}'):
+                add('warning', 'rate-window',
+                    f"{selector.function}({selector.metric}[$__interval]) 在缩小时间范围时可能低于抓取间隔，"
+                    f"建议改用 $__rate_interval")
+            elif window is not None and window < factor * scrape:
+                add('warning', 'rate-window',
+                    f"{selector.function}({selector.metric}[{selector.range}]) 窗口小于抓取间隔 "
+                    f"{format_duration(scrape)} 的 {factor} 倍，建议至少 {format_duration(factor * scrape)} "
+                    f"或使用 $__rate_interval")
+
+        if not selector.metric:
+            add('warning', 'no-metric-name', "选择器没有固定指标名，需要扫描所有指标的索引")
+        for name, op, value in selector.matchers:
+            if op != '=~':
+                continue
+            if name == '__name__':
+                add('warning', 'unbounded-regex', f'__name__=~"{value}" 需要对全部指标名执行正则')
+            elif value in MATCH_ALL:
+                add('warning', 'unbounded-regex',
+                    f'{name}=~"{value}" 匹配所有值，只会增加正则开销，建议删除该匹配器')
+            elif value.startswith('.*') and value.endswith('.*') and not has_variable(value):
+                add('info', 'unbounded-regex',
+                    f'{name}=~"{value}" 是非锚定的子串匹配，需要对 {name} 的每个取值执行正则')
+            for match in _VARIABLE_RE.finditer(value):
+                variable = variables.get(next(g for g in match.groups() if g)) or {}
+                if variable.get('includeAll') and (variable.get('allValue') or '') in MATCH_ALL:
+                    add('warning', 'unbounded-regex',
+                        f'变量 ${variable["name"]} 选择"All"时展开为 {variable["allValue"]}，'
+                        f'{name} 上的过滤变成无界正则')
+    return findings
+
+
+class SeriesIndex:
+    """exposition样本的序列索引，用于估算选择器匹配的序列数"""
+
+    def __init__(self):
+        self.series = defaultdict(list)
+        self.sources = 0
+
+    def add_samples(self, samples):
+        for sample in samples:
+            self.series[sample.name].append(sample.labels_dict())
+        self.sources += 1
+
+    def add_file(self, path):
+        with open(path, 'r', encoding='utf-8') as f:
+            self.add_samples(ExpositionParser().parse(f))
+
+    def add_url(self, url, timeout=10):
+        self.add_samples(stream_samples(url, timeout=timeout))
+
+    def count(self, selector):
+        """匹配的序列数：单值变量按选中一个取值估算，多值/正则变量按全部取值（最坏情况）估算"""
+        if selector.metric:
+            matched = self.series.get(selector.metric, [])
+        else:
+            names = [m for m in selector.matchers if m[0] == '__name__' and not has_variable(m[2])]
+            matched = [labels for metric, series in self.series.items()
+                       if all(_match(metric, op, value) for _, op, value in names) for labels in series]
+        narrowing = []
+        for name, op, value in selector.matchers:
+            if name == '__name__':
+                continue
+            if has_variable(value):
+                if op == '=':
+                    narrowing.append(name)
+                continue
+            matched = [labels for labels in matched if _match(labels.get(name, ''), op, value)]
+        for name in narrowing:
+            distinct = len({labels.get(name, '') for labels in matched})
+            if distinct > 1:
+                matched = matched[:math.ceil(len(matched) / distinct)]
+        return len(matched)
+
+
+def _match(actual, op, value):
+    if op in ('=', '!='):
+        return (actual == value) == (op == '=')
+    try:
+        return bool(re.fullmatch(value, actual)) == (op == '=~')
+    except re.error:
+        return True
+
+
+def estimate_cost(parsed, index, intervals, nodes=1):
+    """估算一次求值触及的 (序列数, 样本数)"""
+    series = samples = 0
+    for selector in parsed.selectors:
+        count = index.count(selector) * nodes
+        scrape = intervals.get(selector.metric)
+        window = parse_duration(selector.range) if selector.range else None
+        if selector.range and window is None:
+            window = max(RANGE_FUNCTIONS.values()) * scrape
+        series += count
+        samples += count * (max(1, int(window // scrape)) if window else 1)
+    return series, samples
+
+
+def rule_name(parsed, recorded_expr):
+    """按 level:metric:operations 约定生成记录规则名，operations描述结果的实际含义（乘以100的记为percent）"""
+    if parsed.aggregated:
+        level = '_'.join(parsed.by_labels) or 'cluster'
+    else:
+        level = 'instance'
+    metrics = list(dict.fromkeys(selector.metric for selector in parsed.selectors if selector.metric))
+    metric = (metrics[0] if metrics else 'expr')
+    windows = {selector.function: selector.range for selector in parsed.selectors if selector.function}
+    ops = []
+    for function in parsed.functions:
+        if function == 'sum':
+            continue
+        window = windows.get(function, '') if function in RANGE_FUNCTIONS else ''
+        ops.append(function + window)
+    if _PERCENT_RE.search(recorded_expr):
+        ops.append('percent')
+    elif len(metrics) > 1 or not ops:
+        ops.append('ratio' if '/' in recorded_expr else 'expr')
+    if any(function in RANGE_FUNCTIONS for function in parsed.functions) and metric.endswith('_total'):
+        metric = metric[:-len('_total')]
+    return f"{level}:{metric}:{'_'.join(ops)}"
+
+
+class DuplicateGroup(NamedTuple):
+    """可以共用一条记录规则的查询组"""
+    key: str
+    queries: Tuple[PanelQuery, ...]
+    exact: bool
+    recordable: bool
+    reason: str
+
+
+def find_duplicates(queries, min_uses=2):
+    """
+    按规范化文本分组：完全相同（exact）或只差模板变量过滤（近似）的查询；
+    只有一个选择器且没有任何计算的查询不值得记录
+    """
+    groups = defaultdict(list)
+    for query in queries:
+        groups[normalize(query.expr, drop_variables=True)].append(query)
+
+    result = []
+    for key, members in groups.items():
+        if len(members) < min_uses:
+            continue
+        parsed = parse_query(key)
+        exact = len({normalize(query.expr) for query in members}) == 1
+        reason = ''
+        if len(parsed.selectors) == 1 and not parsed.functions and re.fullmatch(r'[\w:]+(\{[^}]*\})?', key):
+            reason = '只是单个选择器，记录规则不会减少开销'
+        elif has_variable(key):
+            reason = '含有模板变量（如 $__rate_interval），记录规则无法表达'
+        elif any(variable_matchers(query.expr) for query in members) and \
+                (parsed.aggregated or parsed.vector_matching):
+            reason = '变量过滤位于聚合/向量匹配之内，不能移到记录规则之外'
+        result.append(DuplicateGroup(key, tuple(members), exact, not reason, reason))
+    result.sort(key=lambda group: (-len(group.queries), group.key))
+    return result
+
+
+def load_rules(path):
+    """读取此前生成的记录规则，文件不存在时返回空列表"""
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            document = yaml.safe_load(f) or {}
+    except FileNotFoundError:
+        return []
+    for group in document.get('groups') or []:
+        if group.get('name') == RULE_GROUP:
+            return list(group.get('rules') or [])
+    return []
+
+
+def build_rules(groups, existing=()):
+    """
+    为可记录的查询组生成记录规则，返回 (规则列表, {原查询规范化文本: 改写后的查询})；
+    existing中已记录的表达式沿用原规则名，规则列表包含existing
+    """
+    rules = list(existing)
+    recorded = {normalize(rule['expr']): rule['record'] for rule in rules}
+    names = Counter(rule['record'] for rule in rules)
+    rewrites = {}
+    for group in groups:
+        if not group.recordable:
+            continue
+        name = recorded.get(group.key)
+        if name is None:
+            base = rule_name(parse_query(group.key), group.key)
+            names[base] += 1
+            name = base if names[base] == 1 else f"{base}_{names[base]}"
+            rules.append({'record': name, 'expr': group.key})
+        for query in group.queries:
+            matchers = variable_matchers(query.expr)
+            selector = name + ('{' + ','.join(f'{k}{op}"{v}"' for k, op, v in matchers) + '}' if matchers else '')
+            rewrites[normalize(query.expr)] = selector
+    return rules, rewrites
+
+
+def write_rules(rules, path):
+    document = {'groups': [{'name': RULE_GROUP, 'rules': rules}]}
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write("# 由 deploy/scripts/dashboard_lint.py --rules-out 生成，请勿手工修改\n")
+        yaml.safe_dump(document, f, allow_unicode=True, sort_keys=False, width=1000)
+
+
+def rewrite_dashboard(path, rewrites):
+    """
+    逐个面板target把查询替换为记录规则，返回替换数量；
+    只改动targets[].expr，有改动时按Grafana导出的2空格缩进重新写出JSON
+    """
+    with open(path, 'r', encoding='utf-8') as f:
+        raw = json.load(f)
+    model = raw['dashboard'] if 'dashboard' in raw and 'panels' not in raw else raw
+    changed = 0
+    for panel in dashboard_panels(model):
+        for target in panel.get('targets') or []:
+            expr = target.get('expr')
+            replacement = rewrites.get(normalize(expr)) if expr else None
+            if replacement and replacement != expr:
+                target['expr'] = replacement
+                changed += 1
+    if changed:
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(raw, f, indent=2, ensure_ascii=False)
+            f.write('\n')
+    return changed
+
+
+def lint_dashboards(dashboards, intervals, index=None, nodes=1, min_uses=2):
+    """检查所有仪表板，返回报告字典"""
+    report = {'dashboards': [], 'findings': [], 'duplicates': []}
+    all_queries = []
+    for dashboard in dashboards:
+        variables = template_variables(dashboard.model)
+        panels = {}
+        for query in collect_queries(dashboard):
+            all_queries.append(query)
+            parsed = parse_query(query.expr)
+            report['findings'].extend(lint_query(query, parsed, intervals, variables))
+            panel = panels.setdefault(query.panel_id, {'id': query.panel_id, 'title': query.panel,
+                                                       'queries': 0, 'series': 0, 'samples': 0})
+            panel['queries'] += 1
+            if index is not None:
+                series, samples = estimate_cost(parsed, index, intervals, nodes)
+                panel['series'] += series
+                panel['samples'] += samples
+        report['dashboards'].append({'title': dashboard.title, 'path': dashboard.path,
+                                     'panels': list(panels.values())})
+    report['duplicates'] = find_duplicates(all_queries, min_uses)
+    return report
+
+
+def print_report(report, estimated=False, nodes=1):
+    """输出检查结果"""
+    if estimated:
+        print(f"=== 面板查询开销估算 ({nodes} 个节点，每次求值) ===")
+        for dashboard in report['dashboards']:
+            panels = sorted(dashboard['panels'], key=lambda item: -item['samples'])
+            total = sum(panel['series'] for panel in panels)
+            print(f"\n📊 {dashboard['title']}  共 {total} 个序列")
+            for panel in panels:
+                print(f"  {panel['series']:>8} 序列 {panel['samples']:>10} 样本  {panel['title']}")
+
+    icons = {'warning': '⚠️ ', 'info': 'ℹ️ '}
+    print(f"\n=== 查询检查 ({len(report['findings'])} 项) ===")
+    for item in report['findings']:
+        print(f"{icons[item.severity]} [{item.rule}] {item.dashboard} / {item.panel}: {item.message}")
+        print(f"      {item.expr}")
+    if not report['findings']:
+        print("✅ 未发现过短的区间窗口或无界正则")
+
+    print(f"\n=== 可共用记录规则的查询 ({len(report['duplicates'])} 组) ===")
+    for group in report['duplicates']:
+        kind = '完全相同' if group.exact else '仅模板变量过滤不同'
+        icon = '🔁' if group.recordable else '➖'
+        print(f"{icon} {len(group.queries)} 处{kind}: {group.key}")
+        for query in group.queries:
+            print(f"      {query.dashboard} / {query.panel}")
+        if group.reason:
+            print(f"      不生成规则: {group.reason}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Grafana仪表板查询开销检查")
+    parser.add_argument("dashboards", nargs="*", help="仪表板JSON文件 (默认检查仓库根目录和grafana/下的全部仪表板)")
+    parser.add_argument("--prometheus-config", default=str(PROMETHEUS_CONFIG),
+                        help="用于读取各job抓取间隔的prometheus.yml")
+    parser.add_argument("--scrape-interval", help="统一使用的抓取间隔 (如 15s)，覆盖prometheus.yml")
+    parser.add_argument("--sample-file", action="append", default=[], help="exposition样本文件 (可多次指定)")
+    parser.add_argument("--sample-url", action="append", default=[],
+                        help="exporter的/metrics地址，作为exposition样本 (可多次指定)")
+    parser.add_argument("--nodes", type=int, default=1, help="把样本推算到的节点数")
+    parser.add_argument("--min-uses", type=int, default=2, help="查询至少出现几次才建议记录规则")
+    parser.add_argument("--rules-out", nargs="?", const=str(DEFAULT_RULES_FILE),
+                        help=f"生成记录规则文件 (默认 {DEFAULT_RULES_FILE.relative_to(PROJECT_ROOT)})")
+    parser.add_argument("--rewrite", action="store_true",
+                        help="把重复查询改写为读取记录规则（会同时生成--rules-out）")
+    parser.add_argument("--json", action="store_true", help="以JSON输出")
+
+    args = parser.parse_args()
+
+    dashboards = [load_dashboard(path) for path in args.dashboards] if args.dashboards else find_dashboards()
+    default, jobs = load_scrape_intervals(args.prometheus_config)
+    override = parse_duration(args.scrape_interval) if args.scrape_interval else None
+    if args.scrape_interval and not override:
+        parser.error(f"无法解析抓取间隔: {args.scrape_interval}")
+    intervals = ScrapeIntervals(default, jobs, override)
+
+    index = None
+    if args.sample_file or args.sample_url:
+        index = SeriesIndex()
+        for path in args.sample_file:
+            index.add_file(path)
+        for url in args.sample_url:
+            try:
+                index.add_url(url)
+            except Exception as e:
+                print(f"❌ 获取样本失败 {url}: {e}", file=sys.stderr)
+                sys.exit(1)
+
+    report = lint_dashboards(dashboards, intervals, index, args.nodes, args.min_uses)
+    rules_out = args.rules_out or (str(DEFAULT_RULES_FILE) if args.rewrite else None)
+    existing = load_rules(rules_out) if rules_out else []
+    rules, rewrites = build_rules(report['duplicates'], existing)
+
+    if args.json:
+        print(json.dumps({
+            'dashboards': report['dashboards'],
+            'findings': [item._asdict() for item in report['findings']],
+            'duplicates': [{'expr': group.key, 'exact': group.exact, 'recordable': group.recordable,
+                            'reason': group.reason,
+                            'panels': [f"{query.dashboard} / {query.panel}" for query in group.queries]}
+                           for group in report['duplicates']],
+            'rules': rules,
+        }, ensure_ascii=False, indent=2))
+    else:
+        print(f"🔍 检查 {len(dashboards)} 个仪表板...")
+        print_report(report, index is not None, args.nodes)
+
+    if rules_out and len(rules) > len(existing):
+        write_rules(rules, rules_out)
+        print(f"\n📝 新增 {len(rules) - len(existing)} 条记录规则: {rules_out}",
+              file=sys.stderr if args.json else sys.stdout)
+    if args.rewrite and rewrites:
+        for dashboard in dashboards:
+            changed = rewrite_dashboard(dashboard.path, rewrites)
+            if changed:
+                print(f"✏️  {dashboard.path}: 改写 {changed} 条查询", file=sys.stderr if args.json else sys.stdout)
+        print("⚠️  改写后的仪表板依赖上述记录规则，请先让Prometheus加载规则文件再同步仪表板",
+              file=sys.stderr if args.json else sys.stdout)
+
+    sys.exit(1 if any(item.severity == 'warning' for item in report['findings']) else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -6,12 +6,24 @@
 """
 
 import os
+import shlex
 import sys
 import subprocess
 import argparse
 import json
+import threading
 import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
 from pathlib import Path
+from typing import Callable, NamedTuple, Tuple
+
+PROMETHEUS_URL = "http://192.7.111.66:9090"
+GRAFANA_URL = "http://192.7.111.66:3000"
+EXPORTER_PORT = 9400
+
+# 可部署的exporter：dcgm 通过remote_deploy.py部署DCGM-Exporter，
+# sysfs 按清单增量分发hygon-sysfs-exporter编译出的hygon-dcu-exporter
+EXPORTER_KINDS = ("dcgm", "sysfs")
 
 class Colors:
     RED = '\033[0;31m'
@@ -23,13 +35,124 @@ class Colors:
     WHITE = '\033[1;37m'
     NC = '\033[0m'  # No Color
 
+class Stage(NamedTuple):
+    """部署阶段：依赖的阶段全部完成后才会执行"""
+    name: str
+    title: str
+    func: Callable[[], bool]
+    deps: Tuple[str, ...] = ()
+    required: bool = True    # False: 失败不阻断依赖它的阶段
+    always: bool = False     # True: 续跑时也重新执行（如验证）
+
+class StageRunner:
+    """
+    按依赖关系并发执行阶段，完成状态写入状态文件；
+    再次运行时跳过已完成的阶段，从失败处继续
+    """
+
+    def __init__(self, stages, state_file, key, workers=4, log=print):
+        self.stages = {stage.name: stage for stage in stages}
+        self.state_file = Path(state_file)
+        self.key = key
+        self.workers = workers
+        self.log = log
+        self._lock = threading.Lock()
+        self.state = self._load_state()
+
+    def _load_state(self):
+        try:
+            with open(self.state_file, 'r', encoding='utf-8') as f:
+                state = json.load(f)
+        except (OSError, ValueError):
+            return {'key': self.key, 'stages': {}}
+        if state.get('key') != self.key:
+            # 部署参数变化，之前的进度作废
+            return {'key': self.key, 'stages': {}}
+        return state
+
+    def _save_state(self):
+        tmp = self.state_file.with_suffix('.tmp')
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(self.state, f, indent=2, ensure_ascii=False)
+        os.replace(tmp, self.state_file)
+
+    def _record(self, name, status, elapsed):
+        with self._lock:
+            self.state['stages'][name] = {
+                'status': status,
+                'elapsed': round(elapsed, 3),
+                'finished_at': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            }
+            self._save_state()
+
+    def _execute(self, stage):
+        start = time.perf_counter()
+        try:
+            ok = stage.func() is not False
+        except Exception as e:
+            self.log(f"阶段 {stage.title} 出错: {e}")
+            ok = False
+        elapsed = time.perf_counter() - start
+        status = 'ok' if ok else 'failed'
+        self._record(stage.name, status, elapsed)
+        return status, elapsed
+
+    def run(self):
+        """执行全部阶段，返回 {阶段名: (状态, 耗时)}，状态为 ok/failed/resumed/blocked"""
+        results = {}
+        for name, stage in self.stages.items():
+            previous = self.state['stages'].get(name, {})
+            if previous.get('status') == 'ok' and not stage.always:
+                results[name] = ('resumed', 0.0)
+
+        def satisfied(dep):
+            status = results.get(dep, (None,))[0]
+            return status in ('ok', 'resumed') or (status == 'failed' and not self.stages[dep].required)
+
+        def blocked(stage):
+            return any(results.get(dep, (None,))[0] in ('failed', 'blocked') and self.stages[dep].required
+                       for dep in stage.deps)
+
+        running = {}
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            while True:
+                for name, stage in self.stages.items():
+                    if name in results or name in running.values():
+                        continue
+                    if blocked(stage):
+                        results[name] = ('blocked', 0.0)
+                    elif all(satisfied(dep) for dep in stage.deps):
+                        running[executor.submit(self._execute, stage)] = name
+                if not running:
+                    break
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    results[running.pop(future)] = future.result()
+
+        if all(status in ('ok', 'resumed') for status, _ in results.values()):
+            # 全部完成后清除状态，下次从头部署
+            self.state_file.unlink(missing_ok=True)
+        return results
+
 class OneClickDeployer:
-    def __init__(self):
+    def __init__(self, goarches=("amd64",), use_cache=True, state_file=None,
+                 prometheus_url=PROMETHEUS_URL, grafana_url=GRAFANA_URL, exporter="dcgm", log_stream=None):
         self.project_root = Path(__file__).parent.parent.parent
         self.deploy_dir = Path(__file__).parent.parent
+        self.goarches = list(goarches)
+        self.use_cache = use_cache
+        self.state_file = Path(state_file) if state_file else self.deploy_dir / ".deploy-state.json"
+        self.prometheus_url = prometheus_url.rstrip('/')
+        self.grafana_url = grafana_url.rstrip('/')
+        self.exporter = exporter
+        # 进度日志的输出流，默认stdout；--verify-only时为stderr，stdout只输出JSON
+        self.log_stream = log_stream
+        self.verification = None
+        self._print_lock = threading.Lock()
         
     def print_colored(self, message, color=Colors.WHITE):
-        print(f"{color}{message}{Colors.NC}")
+        with self._print_lock:
+            print(f"{color}{message}{Colors.NC}", file=self.log_stream or sys.stdout, flush=True)
         
     def print_step(self, step, message):
         self.print_colored(f"[步骤 {step}] {message}", Colors.BLUE)
@@ -77,14 +200,14 @@ class OneClickDeployer:
         else:
             self.print_warning("Go未安装，将跳过本地构建")
             
-        # 检查网络连接
+        # 检查网络连接（与verify_deployment使用相同的地址和健康检查接口）
         test_urls = [
-            "http://192.7.111.66:9090",  # Prometheus
-            "http://192.7.111.66:3000",  # Grafana
+            (self.prometheus_url, "/-/ready"),  # Prometheus
+            (self.grafana_url, "/api/health"),  # Grafana
         ]
         
-        for url in test_urls:
-            success, _, _ = self.run_command(f"curl -s -f {url}/api/v1/status/config", check=False)
+        for url, path in test_urls:
+            success, _, _ = self.run_command(f"curl -s -f {shlex.quote(url + path)}", check=False)
             if success:
                 self.print_success(f"服务可访问: {url}")
             else:
@@ -93,29 +216,44 @@ class OneClickDeployer:
         return True
 
     def build_exporter(self):
-        """构建DCGM-Exporter"""
-        self.print_step(2, "构建DCGM-Exporter")
-        
-        build_script = self.project_root / "build" / "build-hygon.sh"
-        if not build_script.exists():
-            # 如果没有构建脚本，尝试直接构建
-            self.print_warning("构建脚本不存在，尝试直接构建")
-            success, stdout, stderr = self.run_command("go build -o dcgm-exporter ./cmd/dcgm-exporter")
-            if success:
-                self.print_success("DCGM-Exporter构建成功")
-                return True
+        """构建DCGM-Exporter；源码、go.mod/go.sum和ldflags未变时复用缓存，多架构并发构建"""
+        self.print_step(2, f"构建DCGM-Exporter ({', '.join(self.goarches)})")
+        
+        sys.path.insert(0, str(self.project_root / "hygon-sysfs-exporter"))
+        from build_cache import BuildCache, cached_build, go_version, output_name
+        from concurrent.futures import ThreadPoolExecutor
+        
+        # 链接参数与scripts/build-hygon.sh相同，但构建时间取HEAD的提交时间：同一份源码得到相同的ldflags，
+        # 缓存指纹使用的就是实际传给go build的参数，缓存的二进制与重新构建的完全一致
+        _, version, _ = self.run_command("git describe --tags --always --dirty", check=False)
+        _, build_time, _ = self.run_command(
+            "TZ=UTC git log -1 --format=%cd --date=format-local:%Y-%m-%d_%H:%M:%S", check=False)
+        _, commit, _ = self.run_command("git rev-parse HEAD", check=False)
+        ldflags = (f"-X main.BuildVersion={version.strip() or 'dev'} "
+                   f"-X main.BuildTime={build_time.strip() or 'unknown'} "
+                   f"-X main.GitCommit={commit.strip() or 'unknown'}")
+        
+        cache = BuildCache()
+        toolchain = go_version()
+        multi = len(self.goarches) > 1
+        
+        def build(goarch):
+            output = self.project_root / "bin" / output_name("dcgm-exporter", goarch, multi)
+            return cached_build(str(self.project_root), str(output), "./cmd/dcgm-exporter", ldflags,
+                                goarch=goarch, cache=cache, use_cache=self.use_cache, toolchain=toolchain)
+        
+        with ThreadPoolExecutor(max_workers=len(self.goarches)) as executor:
+            results = list(executor.map(build, self.goarches))
+        
+        for item in results:
+            if not item.ok:
+                self.print_error(f"{item.goarch} 构建失败: {item.error}")
+            elif item.cached:
+                self.print_success(f"{item.goarch}: 源码未变化，复用缓存 {item.output}")
             else:
-                self.print_error(f"构建失败: {stderr}")
-                return False
+                self.print_success(f"{item.goarch}: 构建成功 {item.output} ({item.elapsed:.1f}s)")
         
-        # 使用构建脚本
-        success, stdout, stderr = self.run_command(f"bash {build_script}")
-        if success:
-            self.print_success("DCGM-Exporter构建成功")
-            return True
-        else:
-            self.print_error(f"构建失败: {stderr}")
-            return False
+        return all(item.ok for item in results)
 
     def deploy_prometheus(self):
         """部署Prometheus"""
@@ -174,12 +312,26 @@ scrape_configs:
         return True
 
     def deploy_exporters(self, servers):
-        """部署DCGM-Exporter到服务器"""
-        self.print_step(5, f"部署DCGM-Exporter到服务器: {', '.join(servers)}")
+        """部署exporter到服务器：--exporter指定部署DCGM-Exporter还是hygon-sysfs-exporter"""
+        self.print_step(5, f"部署Exporter到服务器: {', '.join(servers)}")
+        
+        # sysfs exporter按清单增量分发：只向哈希不一致的服务器传输
+        if self.exporter == "sysfs":
+            exporter_dir = self.project_root / "hygon-sysfs-exporter"
+            binaries = sorted(exporter_dir.glob("hygon-dcu-exporter-linux-*"))
+            if (exporter_dir / "hygon-dcu-exporter").exists():
+                binaries.insert(0, exporter_dir / "hygon-dcu-exporter")
+            if not binaries:
+                self.print_error(f"hygon-sysfs-exporter二进制不存在: {exporter_dir}，请先在该目录执行 deploy.py --build")
+                return False
+            self.print_colored(f"部署hygon-sysfs-exporter: {', '.join(path.name for path in binaries)}"
+                               f" (按各服务器架构选择)", Colors.CYAN)
+            return self._deploy_with_manifest(exporter_dir, servers)
         
         # 调用远程部署脚本
         remote_deploy_script = self.deploy_dir / "scripts" / "remote_deploy.py"
         if remote_deploy_script.exists():
+            self.print_colored(f"部署DCGM-Exporter: {remote_deploy_script}", Colors.CYAN)
             servers_str = ",".join(servers)
             success, stdout, stderr = self.run_command(
                 f"python {remote_deploy_script} --servers {servers_str}"
@@ -195,6 +347,28 @@ scrape_configs:
             self.print_colored("请手动部署DCGM-Exporter到目标服务器", Colors.YELLOW)
             return True
 
+    def _deploy_with_manifest(self, exporter_dir, servers):
+        """使用hygon-sysfs-exporter/deploy.py的清单部署，每台服务器部署其架构对应的编译输出"""
+        sys.path.insert(0, str(exporter_dir))
+        from deploy import ArchManifests, deploy_hosts
+        
+        results = deploy_hosts(servers, manifests=ArchManifests(str(exporter_dir)), progress=self.print_colored)
+        for item in results:
+            if item.skipped:
+                self.print_success(f"{item.host}: 已是最新，跳过 ({item.total:.1f}s)")
+            elif item.ok:
+                self.print_success(f"{item.host}: 已更新 {', '.join(item.changed)} ({item.total:.1f}s)")
+            else:
+                self.print_error(f"{item.host}: {item.error}")
+        
+        failed = [item.host for item in results if not item.ok]
+        if failed:
+            self.print_error(f"hygon-sysfs-exporter部署失败: {', '.join(failed)}")
+            return False
+        skipped = sum(1 for item in results if item.skipped)
+        self.print_success(f"hygon-sysfs-exporter部署成功 ({len(results) - skipped} 台已更新, {skipped} 台已是最新)")
+        return True
+
     def setup_monitoring(self):
         """设置监控系统"""
         self.print_step(6, "设置Grafana监控")
@@ -203,7 +377,8 @@ scrape_configs:
         grafana_setup_script = self.deploy_dir / "scripts" / "setup_grafana_monitoring.py"
         if grafana_setup_script.exists():
             success, stdout, stderr = self.run_command(
-                f"python {grafana_setup_script} --grafana-url http://192.7.111.66:3000"
+                f"{shlex.quote(sys.executable)} {shlex.quote(str(grafana_setup_script))} "
+                f"--grafana-url {shlex.quote(self.grafana_url)} --prometheus-url {shlex.quote(self.prometheus_url)}"
             )
             if success:
                 self.print_success("Grafana监控设置完成")
@@ -215,85 +390,198 @@ scrape_configs:
             self.print_warning("Grafana设置脚本不存在")
             return True
 
-    def verify_deployment(self):
-        """验证部署结果"""
+    def _check_exporter(self, session, server, timeout):
+        """流式抓取一个exporter，统计hygon_指标族并校验每个指标族覆盖的设备数"""
+        from metrics_parser import DEVICE_LABELS, ExpositionParser, stream_samples
+        
+        url = server if "://" in server else f"http://{server}"
+        if url.count(":") < 2:
+            url = f"{url}:{EXPORTER_PORT}"
+        url = f"{url.rstrip('/')}/metrics"
+        result = {'server': server, 'url': url, 'ok': False, 'latency': None, 'series': 0,
+                  'families': 0, 'devices': 0, 'mismatched': {}, 'error': ''}
+        
+        start = time.perf_counter()
+        parser = ExpositionParser()
+        family_devices = {}
+        devices = set()
+        try:
+            for sample in stream_samples(url, session=session, timeout=timeout, parser=parser):
+                if not sample.name.startswith("hygon_"):
+                    continue
+                result['series'] += 1
+                device = next((sample.label(key) for key in DEVICE_LABELS if sample.label(key)), None)
+                if device is None:
+                    continue
+                family = parser.family_name(sample.name)
+                family_devices.setdefault(family, set()).add(device)
+                if family == "hygon_device_info":
+                    devices.add(device)
+        except Exception as e:
+            result['error'] = self._describe_error(e, timeout)
+            return result
+        
+        result['latency'] = round(time.perf_counter() - start, 4)
+        result['families'] = len(family_devices)
+        result['devices'] = len(devices)
+        # 每个按设备导出的指标族都应覆盖全部设备
+        result['mismatched'] = {family: len(found) for family, found in family_devices.items()
+                                if len(found) != len(devices)}
+        if not family_devices:
+            result['error'] = "未发现hygon_指标"
+        elif not devices:
+            result['error'] = "未发现hygon_device_info，无法确定设备数"
+        elif result['mismatched']:
+            result['error'] = f"{len(result['mismatched'])} 个指标族的设备数与 {len(devices)} 不一致"
+        result['ok'] = not result['error']
+        return result
+
+    def _check_service(self, session, name, url, timeout):
+        try:
+            response = session.get(url, timeout=timeout)
+            ok = response.status_code == 200
+            return {'name': name, 'url': url, 'ok': ok, 'error': '' if ok else f"HTTP {response.status_code}"}
+        except Exception as e:
+            return {'name': name, 'url': url, 'ok': False, 'error': self._describe_error(e, timeout)}
+
+    @staticmethod
+    def _describe_error(error, timeout):
+        import requests
+        if isinstance(error, requests.exceptions.Timeout):
+            return f"超时 ({timeout}s)"
+        if isinstance(error, requests.exceptions.ConnectionError):
+            return "连接失败"
+        if isinstance(error, requests.exceptions.HTTPError):
+            return f"HTTP {error.response.status_code}"
+        return str(error)
+
+    def verify_deployment(self, servers, timeout=10, workers=32):
+        """
+        并发验证部署结果（进程内HTTP，连接池复用）
+        返回 {'ok', 'exporters': [...], 'services': [...]}，全部exporter正常时ok为True
+        """
         self.print_step(7, "验证部署结果")
+        import requests
+        from requests.adapters import HTTPAdapter
+        sys.path.insert(0, str(self.project_root / "hygon-sysfs-exporter"))
         
-        # 检查exporter指标
-        test_urls = [
-            "http://192.7.111.66:9400/metrics",
-            "http://192.7.111.67:9400/metrics", 
-            "http://192.7.111.68:9400/metrics"
-        ]
+        session = requests.Session()
+        pool_size = max(1, min(workers, len(servers) + 2))
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        session.mount("http://", adapter)
+        session.mount("https://", adapter)
+        
+        with ThreadPoolExecutor(max_workers=pool_size) as executor:
+            exporter_futures = [executor.submit(self._check_exporter, session, server, timeout)
+                                for server in servers]
+            service_futures = [
+                executor.submit(self._check_service, session, "Prometheus",
+                                f"{self.prometheus_url}/-/ready", timeout),
+                executor.submit(self._check_service, session, "Grafana",
+                                f"{self.grafana_url}/api/health", timeout),
+            ]
+            exporters = [future.result() for future in exporter_futures]
+            services = [future.result() for future in service_futures]
         
-        active_exporters = 0
-        for url in test_urls:
-            success, stdout, stderr = self.run_command(f"curl -s {url} | grep hygon_", check=False)
-            if success and "hygon_" in stdout:
-                self.print_success(f"Exporter正常: {url}")
-                active_exporters += 1
+        for item in exporters:
+            if item['ok']:
+                self.print_success(f"Exporter正常: {item['url']} ({item['devices']} 个设备, "
+                                   f"{item['series']} 个序列, {item['latency'] * 1000:.0f}ms)")
             else:
-                self.print_warning(f"Exporter异常: {url}")
+                self.print_warning(f"Exporter异常: {item['url']} - {item['error']}")
+                for family, count in sorted(item['mismatched'].items()):
+                    self.print_colored(f"     {family}: {count} 个设备", Colors.YELLOW)
         
-        if active_exporters > 0:
-            self.print_success(f"发现 {active_exporters} 个正常运行的Exporter")
+        active = sum(1 for item in exporters if item['ok'])
+        if active == len(exporters) and active:
+            self.print_success(f"全部 {active} 个Exporter正常运行")
+        elif active:
+            self.print_warning(f"{active}/{len(exporters)} 个Exporter正常运行")
         else:
             self.print_error("没有发现正常运行的Exporter")
         
-        # 检查Prometheus
-        success, stdout, stderr = self.run_command("curl -s http://192.7.111.66:9090/api/v1/targets", check=False)
-        if success:
-            self.print_success("Prometheus服务正常")
-        else:
-            self.print_warning("Prometheus服务异常")
+        for item in services:
+            if item['ok']:
+                self.print_success(f"{item['name']}服务正常")
+            else:
+                self.print_warning(f"{item['name']}服务异常: {item['error']}")
         
-        # 检查Grafana
-        success, stdout, stderr = self.run_command("curl -s http://192.7.111.66:3000/api/health", check=False)
-        if success:
-            self.print_success("Grafana服务正常")
-        else:
-            self.print_warning("Grafana服务异常")
+        self.verification = {'ok': bool(exporters) and active == len(exporters),
+                             'exporters': exporters, 'services': services}
+        return self.verification
 
-    def deploy(self, servers):
+    def stages(self, servers, skip_build=False, skip_deploy=False):
+        """部署阶段及其依赖：构建、Prometheus配置和Grafana仪表板准备互不依赖，可并发执行"""
+        def build():
+            if not self.build_exporter():
+                self.print_warning("构建失败，将使用预编译版本")
+                return False
+            return True
+        
+        stages = [
+            Stage("prerequisites", "检查环境", self.check_prerequisites),
+            Stage("prometheus", "配置Prometheus", self.deploy_prometheus, ("prerequisites",)),
+            Stage("grafana", "准备Grafana仪表板", self.deploy_grafana, ("prerequisites",)),
+            Stage("monitoring", "设置Grafana监控", self.setup_monitoring, ("grafana",)),
+        ]
+        exporter_deps = ("prerequisites",)
+        if not skip_build:
+            stages.append(Stage("build", "构建Exporter", build, ("prerequisites",), required=False))
+            exporter_deps = ("build",)
+        verify_deps = ("prometheus", "monitoring")
+        if not skip_deploy:
+            stages.append(Stage("exporters", "部署Exporter", lambda: self.deploy_exporters(servers), exporter_deps))
+            verify_deps += ("exporters",)
+        stages.append(Stage("verify", "验证部署", lambda: self.verify_deployment(servers)['ok'],
+                            verify_deps, always=True))
+        return stages
+    
+    def print_stage_timing(self, stages, results):
+        """输出各阶段耗时"""
+        labels = {'ok': '完成', 'failed': '失败', 'resumed': '已完成(跳过)', 'blocked': '未执行'}
+        self.print_colored("\n⏱️  阶段耗时:", Colors.CYAN)
+        for stage in stages:
+            status, elapsed = results.get(stage.name, ('blocked', 0.0))
+            color = {'ok': Colors.GREEN, 'failed': Colors.RED, 'blocked': Colors.YELLOW}.get(status, Colors.WHITE)
+            self.print_colored(f"   {stage.title:<16}{labels[status]:<12}{elapsed:>8.2f}s", color)
+    
+    def deploy(self, servers, skip_build=False, skip_deploy=False, fresh=False):
         """执行完整部署流程"""
         self.print_colored("🚀 海光DCU监控系统一键部署", Colors.CYAN)
         self.print_colored("=" * 50, Colors.CYAN)
         
         try:
-            # 检查环境
-            if not self.check_prerequisites():
-                return False
-            
-            # 构建项目
-            if not self.build_exporter():
-                self.print_warning("构建失败，将使用预编译版本")
+            if fresh:
+                self.state_file.unlink(missing_ok=True)
+            stages = self.stages(servers, skip_build, skip_deploy)
+            key = {'servers': sorted(servers), 'goarches': self.goarches, 'exporter': self.exporter,
+                   'skip_build': skip_build, 'skip_deploy': skip_deploy}
+            runner = StageRunner(stages, self.state_file, key, log=self.print_error)
+            resumed = [stage.title for stage in stages
+                       if runner.state['stages'].get(stage.name, {}).get('status') == 'ok' and not stage.always]
+            if resumed:
+                self.print_warning(f"从上次中断处继续，跳过已完成阶段: {', '.join(resumed)}")
             
-            # 部署Prometheus配置
-            if not self.deploy_prometheus():
-                return False
-            
-            # 部署Grafana配置
-            if not self.deploy_grafana():
-                return False
+            start = time.perf_counter()
+            results = runner.run()
+            self.print_stage_timing(stages, results)
+            self.print_colored(f"   {'总计':<16}{'':<12}{time.perf_counter() - start:>8.2f}s", Colors.CYAN)
             
-            # 部署Exporter
-            if not self.deploy_exporters(servers):
+            failed = [stage for stage in stages
+                      if results[stage.name][0] in ('failed', 'blocked') and stage.required]
+            if failed:
+                self.print_error(f"部署未完成: {', '.join(stage.title for stage in failed)}")
+                self.print_colored(f"修复后重新运行将从失败阶段继续 (状态文件: {self.state_file})", Colors.YELLOW)
                 return False
             
-            # 设置监控
-            if not self.setup_monitoring():
-                return False
-            
-            # 验证部署
-            self.verify_deployment()
-            
             # 显示结果
             self.print_colored("=" * 50, Colors.GREEN)
             self.print_success("🎉 海光DCU监控系统部署完成！")
             self.print_colored("\n📊 访问地址:", Colors.CYAN)
-            self.print_colored("   Prometheus: http://192.7.111.66:9090", Colors.WHITE)
-            self.print_colored("   Grafana: http://192.7.111.66:3000", Colors.WHITE)
-            self.print_colored("   Exporter指标: http://192.7.111.66:9400/metrics", Colors.WHITE)
+            self.print_colored(f"   Prometheus: {self.prometheus_url}", Colors.WHITE)
+            self.print_colored(f"   Grafana: {self.grafana_url}", Colors.WHITE)
+            for server in servers:
+                self.print_colored(f"   Exporter指标: http://{server}:{EXPORTER_PORT}/metrics", Colors.WHITE)
             
             self.print_colored("\n📋 后续步骤:", Colors.CYAN)
             self.print_colored("   1. 登录Grafana查看监控仪表板", Colors.WHITE)
@@ -315,13 +603,34 @@ def main():
                        help='跳过构建步骤')
     parser.add_argument('--skip-deploy', action='store_true', 
                        help='跳过远程部署步骤')
+    parser.add_argument('--goarch', default='amd64',
+                       help='构建的目标架构，逗号分隔 (如 amd64,arm64)')
+    parser.add_argument('--no-cache', action='store_true',
+                       help='忽略构建缓存强制重新构建')
+    parser.add_argument('--fresh', action='store_true',
+                       help='忽略上次的部署进度，从头执行所有阶段')
+    parser.add_argument('--state-file', help='部署进度状态文件 (默认: deploy/.deploy-state.json)')
+    parser.add_argument('--prometheus-url', default=PROMETHEUS_URL, help='Prometheus地址')
+    parser.add_argument('--grafana-url', default=GRAFANA_URL, help='Grafana地址')
+    parser.add_argument('--exporter', choices=EXPORTER_KINDS, default='dcgm',
+                       help='部署的exporter: dcgm 为DCGM-Exporter, sysfs 为hygon-sysfs-exporter (默认: dcgm)')
+    parser.add_argument('--verify-only', action='store_true',
+                       help='只验证部署结果，结果以JSON输出')
     
     args = parser.parse_args()
     
     servers = [s.strip() for s in args.servers.split(',')]
+    goarches = [arch.strip() for arch in args.goarch.split(',') if arch.strip()]
+    
+    deployer = OneClickDeployer(goarches, use_cache=not args.no_cache, state_file=args.state_file,
+                                prometheus_url=args.prometheus_url, grafana_url=args.grafana_url,
+                                exporter=args.exporter, log_stream=sys.stderr if args.verify_only else None)
+    if args.verify_only:
+        result = deployer.verify_deployment(servers)
+        print(json.dumps(result, indent=2, ensure_ascii=False))
+        sys.exit(0 if result['ok'] else 1)
     
-    deployer = OneClickDeployer()
-    success = deployer.deploy(servers)
+    success = deployer.deploy(servers, args.skip_build, args.skip_deploy, args.fresh)
     
     sys.exit(0 if success else 1)
 
@@ -4,21 +4,43 @@
 自动配置Grafana数据源和导入监控仪表板
 """
 
+import hashlib
 import json
+import re
 import requests
 import argparse
 import sys
 import os
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
+from typing import NamedTuple
 from urllib.parse import urljoin
+from requests.adapters import HTTPAdapter
 from requests.auth import HTTPBasicAuth
 
+PROJECT_ROOT = Path(__file__).resolve().parent.parent.parent
+
+# --provision 默认同步的仪表板
+DEFAULT_DASHBOARDS = [
+    PROJECT_ROOT / "hygon-dcu-dashboard-simple.json",
+    PROJECT_ROOT / "hygon-dcu-detailed-dashboard.json",
+    PROJECT_ROOT / "hygon-single-dcu-dashboard.json",
+    PROJECT_ROOT / "grafana" / "dashboards" / "gpu-monitoring.json",
+]
+
 class GrafanaSetup:
-    def __init__(self, grafana_url, username, password):
+    def __init__(self, grafana_url, username, password, org_id=None, pool_size=8, timeout=30):
         self.grafana_url = grafana_url.rstrip('/')
         self.auth = HTTPBasicAuth(username, password)
         self.session = requests.Session()
         self.session.auth = self.auth
+        self.timeout = timeout
+        self.label = self.grafana_url if org_id is None else f"{self.grafana_url}#org{org_id}"
+        if org_id is not None:
+            self.session.headers['X-Grafana-Org-Id'] = str(org_id)
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
         self.project_root = Path(__file__).parent.parent.parent
         
     def test_connection(self):
@@ -35,9 +57,10 @@ class GrafanaSetup:
             print(f"❌ 连接Grafana时出错: {e}")
             return False
     
-    def create_datasource(self, prometheus_url):
-        """创建Prometheus数据源"""
-        datasource_config = {
+    @staticmethod
+    def datasource_config(prometheus_url):
+        """Prometheus数据源配置"""
+        return {
             "name": "Prometheus",
             "type": "prometheus",
             "url": prometheus_url,
@@ -50,6 +73,10 @@ class GrafanaSetup:
                 "timeInterval": "15s"
             }
         }
+    
+    def create_datasource(self, prometheus_url):
+        """创建Prometheus数据源"""
+        datasource_config = self.datasource_config(prometheus_url)
         
         try:
             # 检查数据源是否已存在
@@ -75,21 +102,16 @@ class GrafanaSetup:
             print(f"❌ 创建数据源时出错: {e}")
             return False
     
-    def import_dashboard(self, dashboard_file=None):
-        """导入仪表板"""
+    def import_dashboard(self, dashboard_file=None, folder_title="海光DCU监控"):
+        """导入仪表板：与Grafana中的现有版本比较内容哈希，只在不存在或有差异时上传"""
+        possible_files = [
+            self.project_root / "hygon-dcu-dashboard-simple.json",
+            self.project_root / "deploy" / "monitoring" / "grafana" / "dashboards" / "hygon-dcu-dashboard.json",
+            Path(__file__).parent.parent / "monitoring" / "grafana" / "dashboards" / "hygon-dcu-dashboard.json"
+        ]
         if dashboard_file is None:
             # 尝试多个可能的仪表板文件位置
-            possible_files = [
-                self.project_root / "hygon-dcu-dashboard-simple.json",
-                self.project_root / "deploy" / "monitoring" / "grafana" / "dashboards" / "hygon-dcu-dashboard.json",
-                Path(__file__).parent.parent / "monitoring" / "grafana" / "dashboards" / "hygon-dcu-dashboard.json"
-            ]
-            
-            dashboard_file = None
-            for file_path in possible_files:
-                if file_path.exists():
-                    dashboard_file = file_path
-                    break
+            dashboard_file = next((path for path in possible_files if path.exists()), None)
         
         if not dashboard_file or not Path(dashboard_file).exists():
             print(f"❌ 仪表板文件不存在")
@@ -99,41 +121,21 @@ class GrafanaSetup:
             return False
         
         try:
-            with open(dashboard_file, 'r', encoding='utf-8') as f:
-                dashboard_json = json.load(f)
-            
-            # 准备导入数据
-            import_data = {
-                "dashboard": dashboard_json,
-                "overwrite": True,
-                "inputs": [
-                    {
-                        "name": "DS_PROMETHEUS",
-                        "type": "datasource",
-                        "pluginId": "prometheus",
-                        "value": "Prometheus"
-                    }
-                ]
-            }
-            
-            response = self.session.post(
-                f"{self.grafana_url}/api/dashboards/import",
-                json=import_data
-            )
-            
-            if response.status_code == 200:
-                result = response.json()
-                dashboard_url = f"{self.grafana_url}/d/{result.get('uid', '')}/{result.get('slug', '')}"
-                print(f"✅ 仪表板导入成功")
-                print(f"🔗 仪表板地址: {dashboard_url}")
-                return True
-            else:
-                print(f"❌ 导入仪表板失败: {response.status_code} - {response.text}")
-                return False
-                
+            dashboard = load_dashboard(dashboard_file)
+            record, = self.provision_dashboards([dashboard], folder_title, workers=1)
         except Exception as e:
             print(f"❌ 导入仪表板时出错: {e}")
             return False
+        
+        if record['action'] == 'failed':
+            print(f"❌ 导入仪表板失败: {record['error']}")
+            return False
+        if record['action'] == 'unchanged':
+            print(f"ℹ️  仪表板 '{dashboard.title}' 未变化 (v{record['version']})，跳过导入")
+        else:
+            print(f"✅ 仪表板导入成功 ({'新建' if record['action'] == 'created' else '更新'}, v{record['version']})")
+        print(f"🔗 仪表板地址: {self.grafana_url}/d/{dashboard.uid}")
+        return True
     
     def create_folder(self, folder_name):
         """创建仪表板文件夹"""
@@ -161,6 +163,73 @@ class GrafanaSetup:
             print(f"❌ 创建文件夹时出错: {e}")
             return False
 
+    def ensure_datasource(self, prometheus_url):
+        """确保Prometheus数据源存在（不输出），返回 created / unchanged"""
+        response = self.session.get(f"{self.grafana_url}/api/datasources/name/Prometheus", timeout=self.timeout)
+        if response.status_code == 200:
+            return 'unchanged'
+        response = self.session.post(f"{self.grafana_url}/api/datasources",
+                                     json=self.datasource_config(prometheus_url), timeout=self.timeout)
+        response.raise_for_status()
+        return 'created'
+
+    def fetch_dashboard(self, uid):
+        """获取现有仪表板，返回 (模型, 版本, 文件夹uid)；不存在时返回 (None, None, None)"""
+        response = self.session.get(f"{self.grafana_url}/api/dashboards/uid/{uid}", timeout=self.timeout)
+        if response.status_code == 404:
+            return None, None, None
+        response.raise_for_status()
+        data = response.json()
+        dashboard = data.get('dashboard', {})
+        return dashboard, dashboard.get('version'), data.get('meta', {}).get('folderUid', '')
+
+    def ensure_folder(self, title):
+        """查找或创建文件夹，返回 (uid, id)"""
+        response = self.session.get(f"{self.grafana_url}/api/folders", timeout=self.timeout)
+        response.raise_for_status()
+        for folder in response.json():
+            if folder.get('title') == title:
+                return folder.get('uid'), folder.get('id')
+        response = self.session.post(f"{self.grafana_url}/api/folders", json={"title": title},
+                                     timeout=self.timeout)
+        response.raise_for_status()
+        folder = response.json()
+        return folder.get('uid'), folder.get('id')
+
+    def provision_dashboards(self, dashboards, folder_title="海光DCU监控", workers=8, dry_run=False):
+        """
+        幂等地同步多个仪表板：并发获取现有版本并比较内容哈希，只上传有差异的仪表板
+        dashboards为load_dashboard()的结果列表，返回每个仪表板的变更记录
+        """
+        folder_uid, folder_id = (None, None) if dry_run else self.ensure_folder(folder_title)
+
+        def sync(item):
+            record = {'instance': self.label, 'uid': item.uid, 'title': item.title,
+                      'action': 'unchanged', 'version': None, 'error': ''}
+            try:
+                existing, version, current_folder = self.fetch_dashboard(item.uid)
+                record['version'] = version
+                if existing is not None and dashboard_hash(existing) == item.sha256 \
+                        and (dry_run or current_folder == folder_uid):
+                    return record
+                record['action'] = 'created' if existing is None else 'updated'
+                if dry_run:
+                    return record
+                payload = {"dashboard": dict(item.model, id=existing.get('id') if existing else None),
+                           "folderUid": folder_uid, "folderId": folder_id, "overwrite": True,
+                           "message": f"provisioned sha256:{item.sha256[:12]}"}
+                response = self.session.post(f"{self.grafana_url}/api/dashboards/db", json=payload,
+                                             timeout=self.timeout)
+                response.raise_for_status()
+                record['version'] = response.json().get('version')
+            except Exception as e:
+                record['action'] = 'failed'
+                record['error'] = str(e)
+            return record
+
+        with ThreadPoolExecutor(max_workers=max(1, min(workers, len(dashboards)))) as executor:
+            return list(executor.map(sync, dashboards))
+
     def verify_setup(self):
         """验证监控设置"""
         print("\n🔍 验证监控设置...")
@@ -197,6 +266,89 @@ class GrafanaSetup:
         except Exception as e:
             print(f"❌ 检查仪表板时出错: {e}")
 
+class DashboardFile(NamedTuple):
+    """待同步的本地仪表板"""
+    path: str
+    uid: str
+    title: str
+    model: dict
+    sha256: str
+
+# 比较内容时忽略的字段：由Grafana维护，每次保存都会变化
+VOLATILE_DASHBOARD_KEYS = ('id', 'version', 'iteration')
+
+def dashboard_hash(dashboard):
+    """去掉易变字段后的规范化JSON哈希"""
+    model = {key: value for key, value in dashboard.items() if key not in VOLATILE_DASHBOARD_KEYS}
+    canonical = json.dumps(model, sort_keys=True, ensure_ascii=False, separators=(',', ':'))
+    return hashlib.sha256(canonical.encode('utf-8')).hexdigest()
+
+def load_dashboard(path):
+    """读取仪表板JSON（兼容 {"dashboard": {...}} 包装格式），没有uid时由文件名生成"""
+    with open(path, 'r', encoding='utf-8') as f:
+        model = json.load(f)
+    if 'dashboard' in model and 'panels' not in model:
+        model = model['dashboard']
+    model = {key: value for key, value in model.items() if key not in VOLATILE_DASHBOARD_KEYS}
+    if not model.get('uid'):
+        model['uid'] = re.sub(r'[^A-Za-z0-9_-]', '-', Path(path).stem)[:40]
+    return DashboardFile(str(path), model['uid'], model.get('title', model['uid']), model, dashboard_hash(model))
+
+def load_instances(urls=None, instances_file=None, username='admin', password='admin'):
+    """
+    加载Grafana实例：--instances为逗号分隔的URL（共用账号），
+    --instances-file为JSON列表，每项 {"url", "username", "password", "org_id"}
+    """
+    instances = []
+    for url in (urls or '').split(','):
+        if url.strip():
+            instances.append({'url': url.strip(), 'username': username, 'password': password})
+    if instances_file:
+        with open(instances_file, 'r', encoding='utf-8') as f:
+            for item in json.load(f):
+                item = {'url': item} if isinstance(item, str) else dict(item)
+                item.setdefault('username', username)
+                item.setdefault('password', password)
+                instances.append(item)
+    return instances
+
+def provision_instances(instances, dashboards, folder_title="海光DCU监控", workers=8, dry_run=False,
+                        prometheus_url=None):
+    """并发同步多个Grafana实例/组织，返回所有变更记录；指定prometheus_url时同时确保数据源存在"""
+    def provision(instance):
+        grafana = GrafanaSetup(instance['url'], instance['username'], instance['password'],
+                               org_id=instance.get('org_id'), pool_size=workers)
+        try:
+            records = []
+            if prometheus_url and not dry_run:
+                records.append({'instance': grafana.label, 'uid': 'Prometheus', 'title': '数据源',
+                                'action': grafana.ensure_datasource(prometheus_url), 'version': None, 'error': ''})
+            return records + grafana.provision_dashboards(dashboards, folder_title, workers, dry_run)
+        except Exception as e:
+            return [{'instance': grafana.label, 'uid': item.uid, 'title': item.title,
+                     'action': 'failed', 'version': None, 'error': str(e)} for item in dashboards]
+
+    records = []
+    with ThreadPoolExecutor(max_workers=max(1, min(workers, len(instances)))) as executor:
+        for result in executor.map(provision, instances):
+            records.extend(result)
+    return records
+
+def print_provision_report(records, dry_run=False):
+    """输出同步结果"""
+    icons = {'created': '➕', 'updated': '🔄', 'unchanged': '✔️ ', 'failed': '❌'}
+    title = "同步计划 (dry-run)" if dry_run else "同步结果"
+    print(f"\n=== 仪表板{title} ===")
+    for record in records:
+        version = f" v{record['version']}" if record['version'] is not None else ""
+        line = f"{icons[record['action']]} {record['instance']}  {record['title']} ({record['uid']}){version}: {record['action']}"
+        if record['error']:
+            line += f" - {record['error']}"
+        print(line)
+    counts = {action: sum(1 for record in records if record['action'] == action) for action in icons}
+    print(f"\n新建 {counts['created']}, 更新 {counts['updated']}, 未变化 {counts['unchanged']}, 失败 {counts['failed']}")
+    return counts['failed'] == 0
+
 def main():
     parser = argparse.ArgumentParser(description='海光DCU Grafana监控设置脚本')
     parser.add_argument('--grafana-url', default='http://192.7.111.66:3000',
@@ -213,11 +365,31 @@ def main():
                        help='跳过数据源创建')
     parser.add_argument('--skip-dashboard', action='store_true',
                        help='跳过仪表板导入')
+    parser.add_argument('--provision', action='store_true',
+                       help='批量幂等同步：把多个仪表板同步到多个Grafana实例，只上传有差异的')
+    parser.add_argument('--instances', help='--provision: 逗号分隔的Grafana地址 (默认: --grafana-url)')
+    parser.add_argument('--instances-file',
+                       help='--provision: JSON实例列表，每项 {"url", "username", "password", "org_id"}')
+    parser.add_argument('--dashboards', action='append',
+                       help='--provision: 仪表板JSON文件 (可多次指定，默认同步仓库自带的仪表板)')
+    parser.add_argument('--folder', default='海光DCU监控', help='--provision: 目标文件夹')
+    parser.add_argument('--workers', type=int, default=8, help='--provision: 每个实例的并发请求数')
+    parser.add_argument('--dry-run', action='store_true', help='--provision: 只报告差异，不上传')
     parser.add_argument('--verify-only', action='store_true',
                        help='仅验证现有配置')
     
     args = parser.parse_args()
     
+    if args.provision:
+        instances = load_instances(args.instances, args.instances_file, args.username, args.password)
+        if not instances:
+            instances = load_instances(args.grafana_url, None, args.username, args.password)
+        dashboards = [load_dashboard(path) for path in (args.dashboards or DEFAULT_DASHBOARDS)]
+        print(f"🚀 同步 {len(dashboards)} 个仪表板到 {len(instances)} 个Grafana实例...")
+        records = provision_instances(instances, dashboards, args.folder, args.workers, args.dry_run,
+                                      None if args.skip_datasource else args.prometheus_url)
+        sys.exit(0 if print_provision_report(records, args.dry_run) else 1)
+    
     print("🚀 开始设置海光DCU Grafana监控...")
     print(f"📊 Grafana地址: {args.grafana_url}")
     print(f"📈 Prometheus地址: {args.prometheus_url}")
@@ -0,0 +1,199 @@
+#!/usr/bin/env python3
+"""
+dashboard_lint.py测试：PromQL浅层解析、规范化、重复查询分组、记录规则生成和仪表板改写
+运行: python3 -m pytest -q test_dashboard_lint.py
+"""
+
+import json
+
+import pytest
+
+import dashboard_lint as dl
+from setup_grafana_monitoring import load_dashboard
+
+ENERGY = 'sum by (instance) (rate(hygon_energy_joules_total{job="hygon"}[5m]))'
+VRAM = ('hygon_vram_usage_bytes{instance=~"$node",job="hygon"}'
+        ' / hygon_vram_total_bytes{job="hygon",instance=~"$node"} * 100')
+
+
+def panel(panel_id, title, *exprs):
+    return {'id': panel_id, 'title': title, 'type': 'timeseries',
+            'targets': [{'refId': chr(ord('A') + i), 'expr': expr} for i, expr in enumerate(exprs)]}
+
+
+@pytest.fixture
+def dashboard_file(tmp_path):
+    """折叠行内嵌面板、完全相同/仅变量不同的重复查询，以及不能记录的重复查询"""
+    row = {'id': 10, 'title': '显存', 'type': 'row', 'collapsed': True, 'panels': [
+        panel(11, '功耗(按节点)', 'sum by(instance)(rate(hygon_energy_joules_total{job="hygon"}[5m]))'),
+        panel(12, '显存使用率', VRAM),
+    ]}
+    model = {
+        'uid': 'lint-fixture',
+        'title': '检查用仪表板',
+        'templating': {'list': [{'name': 'node', 'includeAll': True, 'allValue': '.*'}]},
+        'panels': [
+            panel(1, '功耗', ENERGY),
+            row,
+            panel(2, '单卡显存使用率',
+                  'hygon_vram_usage_bytes{job="hygon",gpu="$gpu"} / hygon_vram_total_bytes{gpu="$gpu",job="hygon"} * 100'),
+            panel(3, '温度', 'hygon_temperature_celsius{sensor="edge"}', 'rate(hygon_energy_joules_total[$__rate_interval])'),
+            panel(4, '温度(边缘)', 'hygon_temperature_celsius{sensor="edge"}', 'rate(hygon_energy_joules_total[$__rate_interval])'),
+            panel(5, '平均功耗', 'avg by (gpu) (hygon_power_watts{instance=~"$node"})'),
+            panel(6, '平均功耗(按卡)', 'avg by (gpu) (hygon_power_watts{instance=~"$node"})'),
+            panel(7, '节点数', 'count(up{job="hygon"})'),
+        ],
+    }
+    path = tmp_path / "dashboard.json"
+    path.write_text(json.dumps({'dashboard': model}, ensure_ascii=False, indent=2) + "\n", encoding="utf-8")
+    return path
+
+
+def test_parse_query_selectors_and_grouping():
+    parsed = dl.parse_query(ENERGY)
+
+    assert parsed.selectors == (dl.Selector('hygon_energy_joules_total', (('job', '=', 'hygon'),), '5m', 'rate'),)
+    assert parsed.functions == ('sum', 'rate')
+    assert parsed.by_labels == ('instance',)
+    assert parsed.aggregated and not parsed.vector_matching
+
+
+@pytest.mark.parametrize("expr, selectors", [
+    # 向量匹配修饰符的标签不是选择器
+    ('hygon_vram_usage_bytes / on(instance, gpu) group_left hygon_vram_total_bytes',
+     [('hygon_vram_usage_bytes', ''), ('hygon_vram_total_bytes', '')]),
+    # 子查询取外层窗口，offset的时长不是选择器
+    ('max_over_time(rate(hygon_energy_joules_total[1m])[30m:1m]) offset 5m',
+     [('hygon_energy_joules_total', '1m')]),
+    # 只有__name__匹配器时以其取值为指标名
+    ('count({__name__="hygon_power_watts",gpu="0"})', [('hygon_power_watts', '')]),
+    ('count({__name__=~"hygon_.*"})', [('', '')]),
+    # [[var]] 是Grafana旧式变量，不是区间窗口
+    ('hygon_power_watts{instance="[[node]]"} > bool 300', [('hygon_power_watts', '')]),
+])
+def test_parse_query_selector_edge_cases(expr, selectors):
+    parsed = dl.parse_query(expr)
+
+    assert [(selector.metric, selector.range) for selector in parsed.selectors] == selectors
+
+
+def test_parse_query_vector_matching():
+    assert dl.parse_query('a / on(instance) group_left b').vector_matching
+    assert not dl.parse_query('sum without (gpu) (a)').vector_matching
+
+
+def test_normalize_ignores_spacing_and_matcher_order():
+    spaced = 'sum  by ( instance ) ( rate( hygon_energy_joules_total{ job = "hygon" }[5m] ) )'
+
+    assert dl.normalize(spaced) == dl.normalize(ENERGY) == \
+        'sum by(instance) (rate(hygon_energy_joules_total{job="hygon"}[5m]))'
+    assert dl.normalize('up{job="b",instance="a"}') == 'up{instance="a",job="b"}'
+
+
+def test_normalize_drops_variable_matchers():
+    assert dl.normalize(VRAM, drop_variables=True) == \
+        'hygon_vram_usage_bytes{job="hygon"} / hygon_vram_total_bytes{job="hygon"} * 100'
+    # 只剩变量匹配器的选择器去掉整个匹配器块
+    assert dl.normalize('hygon_power_watts{instance=~"$node"}', drop_variables=True) == 'hygon_power_watts'
+    assert dl.variable_matchers(VRAM) == (('instance', '=~', '$node'),)
+
+
+@pytest.mark.parametrize("expr, name", [
+    (ENERGY, 'instance:hygon_energy_joules:rate5m'),
+    ('sum(rate(hygon_energy_joules_total[5m]))', 'cluster:hygon_energy_joules:rate5m'),
+    ('max by (gpu) (hygon_temperature_celsius{sensor="junction"})', 'gpu:hygon_temperature_celsius:max'),
+    (dl.normalize(VRAM, drop_variables=True), 'instance:hygon_vram_usage_bytes:percent'),
+    ('100 * hygon_vram_usage_bytes / hygon_vram_total_bytes', 'instance:hygon_vram_usage_bytes:percent'),
+    ('hygon_vram_usage_bytes / hygon_vram_total_bytes', 'instance:hygon_vram_usage_bytes:ratio'),
+    # 只乘以100的子表达式不算百分比
+    ('(hygon_power_watts * 100) / hygon_power_cap_watts', 'instance:hygon_power_watts:ratio'),
+    ('count(up{job="hygon"})', 'cluster:up:count'),
+])
+def test_rule_name(expr, name):
+    assert dl.rule_name(dl.parse_query(expr), expr) == name
+
+
+def test_find_duplicates_groups_and_reasons(dashboard_file):
+    queries = dl.collect_queries(load_dashboard(dashboard_file))
+
+    groups = {group.key: group for group in dl.find_duplicates(queries)}
+
+    energy = groups[dl.normalize(ENERGY)]
+    assert energy.exact and energy.recordable
+    assert [query.panel_id for query in energy.queries] == [1, 11]
+
+    vram = groups[dl.normalize(VRAM, drop_variables=True)]
+    assert not vram.exact and vram.recordable
+    assert [query.panel_id for query in vram.queries] == [12, 2]
+
+    reasons = {key: group.reason for key, group in groups.items() if not group.recordable}
+    assert reasons == {
+        'hygon_temperature_celsius{sensor="edge"}': '只是单个选择器，记录规则不会减少开销',
+        'rate(hygon_energy_joules_total[$__rate_interval])': '含有模板变量（如 $__rate_interval），记录规则无法表达',
+        'avg by(gpu) (hygon_power_watts)': '变量过滤位于聚合/向量匹配之内，不能移到记录规则之外',
+    }
+    # 只出现一次的查询不分组
+    assert 'count(up{job="hygon"})' not in groups
+    assert len(dl.find_duplicates(queries, min_uses=3)) == 0
+
+
+def test_build_rules_reuses_existing_names_and_dedupes():
+    group = dl.DuplicateGroup
+    energy = dl.PanelQuery('d', 'p', 1, '功耗', 'A', ENERGY)
+    sum_energy = dl.PanelQuery('d', 'p', 2, '功耗', 'A', 'sum by (instance) (rate(hygon_energy_joules_total[5m]))')
+    existing = [{'record': 'instance:energy:custom', 'expr': dl.normalize(ENERGY)}]
+
+    rules, rewrites = dl.build_rules([
+        group(dl.normalize(ENERGY), (energy,), True, True, ''),
+        group(dl.normalize(sum_energy.expr), (sum_energy,), True, True, ''),
+        group('hygon_power_watts', (energy,), True, False, '只是单个选择器，记录规则不会减少开销'),
+    ], existing)
+
+    assert rules == existing + [{'record': 'instance:hygon_energy_joules:rate5m', 'expr': dl.normalize(sum_energy.expr)}]
+    assert rewrites == {dl.normalize(ENERGY): 'instance:energy:custom',
+                        dl.normalize(sum_energy.expr): 'instance:hygon_energy_joules:rate5m'}
+
+    # 新规则名冲突时加序号
+    again, _ = dl.build_rules([group('sum by(instance) (rate(hygon_energy_joules_total[5m])) > 0',
+                                     (sum_energy,), True, True, '')], rules)
+    assert again[-1]['record'] == 'instance:hygon_energy_joules:rate5m_2'
+
+
+def test_rewrite_round_trip(dashboard_file, tmp_path):
+    dashboard = load_dashboard(dashboard_file)
+    report = dl.lint_dashboards([dashboard], dl.ScrapeIntervals(15.0))
+    rules, rewrites = dl.build_rules(report['duplicates'])
+    originals = {(query.panel_id, query.ref_id): query.expr for query in dl.collect_queries(dashboard)}
+
+    changed = dl.rewrite_dashboard(dashboard_file, rewrites)
+
+    rewritten = {(query.panel_id, query.ref_id): query.expr for query in dl.collect_queries(load_dashboard(dashboard_file))}
+    records = {rule['expr']: rule['record'] for rule in rules}
+    assert len(rules) == 2
+    assert changed == 4
+    for key, original in originals.items():
+        record = records.get(dl.normalize(original, drop_variables=True))
+        if record is None:
+            assert rewritten[key] == original
+            continue
+        # 改写后的查询 = 记录规则名 + 原查询中重新附加的变量匹配器
+        matchers = ','.join(f'{name}{op}"{value}"' for name, op, value in dl.variable_matchers(original))
+        assert rewritten[key] == record + (f'{{{matchers}}}' if matchers else '')
+    assert rewritten[1, 'A'] == rewritten[11, 'A'] == 'instance:hygon_energy_joules:rate5m'
+    assert rewritten[12, 'A'] == 'instance:hygon_vram_usage_bytes:percent{instance=~"$node"}'
+    assert rewritten[2, 'A'] == 'instance:hygon_vram_usage_bytes:percent{gpu="$gpu"}'
+    # 包装格式和其余字段不变
+    raw = json.loads(dashboard_file.read_text(encoding="utf-8"))
+    assert raw['dashboard']['templating'] == dashboard.model['templating']
+
+    # 再次改写没有变化，文件内容不变
+    content = dashboard_file.read_text(encoding="utf-8")
+    assert dl.rewrite_dashboard(dashboard_file, rewrites) == 0
+    assert dashboard_file.read_text(encoding="utf-8") == content
+
+    # 生成的规则文件可被重新读取，再次生成时沿用已有规则
+    rules_file = tmp_path / "rules.yml"
+    dl.write_rules(rules, rules_file)
+    assert dl.load_rules(rules_file) == rules
+    again, _ = dl.build_rules(report['duplicates'], dl.load_rules(rules_file))
+    assert again == rules
@@ -0,0 +1,299 @@
+#!/usr/bin/env python3
+"""
+海光DCU Exporter 抓取性能基准测试
+测量/metrics的延迟分布、吞吐量、负载大小和序列数，结果可保存为JSON并与基线对比
+"""
+
+import argparse
+import json
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urljoin
+
+import requests
+
+from metrics_parser import ExpositionParser
+from test_exporter import format_latency_histogram, percentile
+
+# 对比时检查的指标：(JSON路径, 显示名, 越大越好)
+COMPARE_FIELDS = [
+    (('latency', 'p50'), "p50延迟(s)", False),
+    (('latency', 'p95'), "p95延迟(s)", False),
+    (('latency', 'p99'), "p99延迟(s)", False),
+    (('throughput_rps',), "吞吐量(req/s)", True),
+    (('payload_bytes',), "负载大小(bytes)", False),
+    (('series',), "序列数", False),
+]
+
+class FixtureServer:
+    """本地假exporter：轮流返回录制的exposition文本"""
+
+    def __init__(self, payloads, port=0, delay=0.0):
+        self.payloads = payloads
+        self.delay = delay
+        self._index = 0
+        self._lock = threading.Lock()
+
+        fixture = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            disable_nagle_algorithm = True
+
+            def do_GET(self):
+                if self.path.split('?')[0] != '/metrics':
+                    self.send_response(404)
+                    self.send_header("Content-Length", "0")
+                    self.end_headers()
+                    return
+                body = fixture.next_payload()
+                if fixture.delay:
+                    time.sleep(fixture.delay)
+                try:
+                    self.send_response(200)
+                    self.send_header("Content-Type", "text/plain; version=0.0.4")
+                    self.send_header("Content-Length", str(len(body)))
+                    self.end_headers()
+                    self.wfile.write(body)
+                except (BrokenPipeError, ConnectionResetError):
+                    # 客户端已超时断开（delay大于客户端超时时的预期情况）
+                    self.close_connection = True
+
+            def log_message(self, format, *args):
+                pass
+
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", port), Handler)
+        self.httpd.daemon_threads = True
+        self.url = f"http://127.0.0.1:{self.httpd.server_address[1]}"
+        self._thread = None
+
+    @classmethod
+    def from_files(cls, paths, port=0, delay=0.0):
+        payloads = []
+        for path in paths:
+            with open(path, 'rb') as f:
+                payloads.append(f.read())
+        return cls(payloads, port=port, delay=delay)
+
+    def next_payload(self):
+        with self._lock:
+            body = self.payloads[self._index % len(self.payloads)]
+            self._index += 1
+        return body
+
+    def start(self):
+        """在后台线程中启动"""
+        self._thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+class ScrapeBenchmark:
+    """以固定并发持续抓取/metrics"""
+
+    def __init__(self, base_url, concurrency=4, requests_total=200, warmup=5, timeout=30):
+        self.metrics_url = urljoin(base_url, "/metrics")
+        self.concurrency = max(1, concurrency)
+        self.requests_total = requests_total
+        self.warmup = warmup
+        self.timeout = timeout
+        self._local = threading.local()
+
+    def _session(self):
+        # 每个工作线程一个Session，保持keep-alive
+        session = getattr(self._local, 'session', None)
+        if session is None:
+            session = self._local.session = requests.Session()
+        return session
+
+    def _scrape(self, _):
+        start = time.perf_counter()
+        try:
+            response = self._session().get(self.metrics_url, timeout=self.timeout)
+            body = response.content
+            elapsed = time.perf_counter() - start
+            if response.status_code != 200:
+                return None, 0
+            return elapsed, len(body)
+        except requests.exceptions.RequestException:
+            return None, 0
+
+    def inspect_payload(self):
+        """抓取一次并解析，统计序列数和指标族数"""
+        response = requests.get(self.metrics_url, timeout=self.timeout)
+        response.raise_for_status()
+        parser = ExpositionParser()
+        series = 0
+        families = set()
+        for sample in parser.parse(response.iter_lines()):
+            series += 1
+            families.add(parser.family_name(sample.name))
+        return len(response.content), series, len(families)
+
+    def run(self):
+        """执行基准测试，返回结果字典"""
+        payload_bytes, series, families = self.inspect_payload()
+
+        with ThreadPoolExecutor(max_workers=self.concurrency) as executor:
+            list(executor.map(self._scrape, range(self.warmup)))
+
+            start = time.perf_counter()
+            outcomes = list(executor.map(self._scrape, range(self.requests_total)))
+            wall = time.perf_counter() - start
+
+        latencies = [elapsed for elapsed, _ in outcomes if elapsed is not None]
+        sizes = [size for elapsed, size in outcomes if elapsed is not None]
+        errors = len(outcomes) - len(latencies)
+
+        return {
+            'url': self.metrics_url,
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+            'concurrency': self.concurrency,
+            'requests': self.requests_total,
+            'errors': errors,
+            'wall_seconds': round(wall, 6),
+            'throughput_rps': round(len(latencies) / wall, 3) if wall > 0 else 0.0,
+            'latency': {
+                'min': round(min(latencies), 6) if latencies else None,
+                'mean': round(sum(latencies) / len(latencies), 6) if latencies else None,
+                'p50': round(percentile(latencies, 50), 6) if latencies else None,
+                'p95': round(percentile(latencies, 95), 6) if latencies else None,
+                'p99': round(percentile(latencies, 99), 6) if latencies else None,
+                'max': round(max(latencies), 6) if latencies else None,
+            },
+            'payload_bytes': max(sizes) if sizes else payload_bytes,
+            'series': series,
+            'families': families,
+            '_latencies': latencies,
+        }
+
+def print_result(result):
+    """输出基准测试结果"""
+    latency = result['latency']
+    print(f"=== 抓取基准: {result['url']} ===")
+    print(f"并发 {result['concurrency']}, 请求 {result['requests']}, 失败 {result['errors']}, "
+          f"耗时 {result['wall_seconds']:.2f}s")
+    print(f"吞吐量: {result['throughput_rps']:.1f} req/s")
+    if latency['p50'] is not None:
+        print(f"延迟: p50={latency['p50'] * 1000:.1f}ms  p95={latency['p95'] * 1000:.1f}ms  "
+              f"p99={latency['p99'] * 1000:.1f}ms  max={latency['max'] * 1000:.1f}ms")
+    print(f"负载: {result['payload_bytes']} bytes, {result['series']} 个序列, {result['families']} 个指标族")
+
+    latencies = result.get('_latencies')
+    if latencies:
+        print("\n--- 延迟分布 ---")
+        for line in format_latency_histogram(latencies):
+            print(line)
+
+def _lookup(result, path):
+    value = result
+    for key in path:
+        if not isinstance(value, dict) or key not in value:
+            return None
+        value = value[key]
+    return value
+
+def compare_results(baseline, current, threshold=10.0):
+    """与基线对比，返回回归项列表；threshold为允许的恶化百分比"""
+    print(f"\n=== 与基线对比 (阈值 {threshold:g}%) ===")
+    print(f"{'指标':<18}{'基线':>14}{'当前':>14}{'变化':>10}")
+
+    regressions = []
+    for path, title, higher_is_better in COMPARE_FIELDS:
+        old = _lookup(baseline, path)
+        new = _lookup(current, path)
+        if old is None or new is None:
+            continue
+        change = (new - old) / old * 100 if old else 0.0
+        worse = -change if higher_is_better else change
+        flag = ""
+        if worse > threshold:
+            flag = " ❌"
+            regressions.append(title)
+        print(f"{title:<18}{old:>14.6g}{new:>14.6g}{change:>+9.1f}%{flag}")
+
+    if regressions:
+        print(f"\n❌ 发现 {len(regressions)} 项性能回归: {', '.join(regressions)}")
+    else:
+        print("\n✓ 未发现性能回归")
+    return regressions
+
+def record_fixture(base_url, path, timeout=30):
+    """录制一次/metrics输出，供假exporter回放"""
+    response = requests.get(urljoin(base_url, "/metrics"), timeout=timeout)
+    response.raise_for_status()
+    with open(path, 'wb') as f:
+        f.write(response.content)
+    print(f"✓ 已录制 {len(response.content)} bytes 到 {path}")
+
+def main():
+    parser = argparse.ArgumentParser(description="海光DCU Exporter 抓取性能基准测试")
+    parser.add_argument("--url", default="http://localhost:9400", help="Exporter URL")
+    parser.add_argument("--concurrency", type=int, default=4, help="并发抓取数")
+    parser.add_argument("--requests", type=int, default=200, help="总请求数")
+    parser.add_argument("--warmup", type=int, default=5, help="预热请求数(不计入结果)")
+    parser.add_argument("--timeout", type=float, default=30, help="单次请求超时(秒)")
+    parser.add_argument("--output", help="结果写入JSON文件")
+    parser.add_argument("--compare", help="与基线JSON对比，出现回归时返回非0")
+    parser.add_argument("--threshold", type=float, default=10.0, help="回归判定阈值(百分比)")
+    parser.add_argument("--fixture", action="append",
+                        help="启动本地假exporter回放录制的exposition文件(可多次指定，轮流返回)")
+    parser.add_argument("--fixture-delay", type=float, default=0.0, help="假exporter每次响应的附加延迟(秒)")
+    parser.add_argument("--serve", action="store_true", help="仅运行假exporter(配合--fixture和--port)")
+    parser.add_argument("--port", type=int, default=9400, help="--serve模式监听端口")
+    parser.add_argument("--record", help="录制--url的/metrics输出到文件后退出")
+
+    args = parser.parse_args()
+
+    if args.record:
+        record_fixture(args.url, args.record, args.timeout)
+        return
+
+    fixture = None
+    if args.fixture:
+        port = args.port if args.serve else 0
+        fixture = FixtureServer.from_files(args.fixture, port=port, delay=args.fixture_delay)
+        if args.serve:
+            print(f"假exporter运行于 {fixture.url}/metrics (Ctrl+C 退出)")
+            try:
+                fixture.httpd.serve_forever()
+            except KeyboardInterrupt:
+                pass
+            return
+        fixture.start()
+        args.url = fixture.url
+    elif args.serve:
+        parser.error("--serve 需要 --fixture")
+
+    try:
+        result = ScrapeBenchmark(args.url, args.concurrency, args.requests,
+                                 args.warmup, args.timeout).run()
+    except requests.exceptions.RequestException as e:
+        print(f"✗ 无法抓取 {args.url}: {e}")
+        sys.exit(1)
+    finally:
+        if fixture:
+            fixture.stop()
+
+    print_result(result)
+    result.pop('_latencies', None)
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(result, f, indent=2, ensure_ascii=False)
+        print(f"\n结果已写入 {args.output}")
+
+    if args.compare:
+        with open(args.compare, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+        if compare_results(baseline, result, args.threshold):
+            sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,213 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Go构建缓存
+以Go源码、go.mod/go.sum、ldflags、GOOS/GOARCH和Go版本计算指纹，
+指纹未变时直接复用缓存的二进制；多个GOARCH并发构建
+"""
+
+import argparse
+import hashlib
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import NamedTuple, Optional
+
+DEFAULT_CACHE_DIR = os.path.join(
+    os.environ.get('XDG_CACHE_HOME') or os.path.expanduser('~/.cache'), 'hygon-dcu-exporter', 'builds')
+
+# 参与指纹的模块文件
+MODULE_FILES = ('go.mod', 'go.sum')
+
+# 遍历源码时跳过的目录
+SKIP_DIRS = {'.git', 'vendor', 'testdata', 'node_modules', '__pycache__', 'dist', 'bin'}
+
+
+class BuildResult(NamedTuple):
+    """单个目标的构建结果"""
+    goarch: str
+    output: str
+    fingerprint: str
+    cached: bool
+    elapsed: float
+    error: str = ''
+
+    @property
+    def ok(self):
+        return not self.error
+
+
+def go_version():
+    """当前Go工具链版本，未安装时返回空字符串"""
+    try:
+        result = subprocess.run(['go', 'env', 'GOVERSION'], capture_output=True, text=True)
+    except OSError:
+        return ''
+    return result.stdout.strip() if result.returncode == 0 else ''
+
+
+def iter_sources(src_dir):
+    """模块内参与构建的文件（排除测试文件和嵌套模块），按相对路径排序"""
+    paths = []
+    for root, dirs, files in os.walk(src_dir):
+        rel_root = os.path.relpath(root, src_dir)
+        # 含go.mod的子目录是独立模块，不属于本次构建
+        dirs[:] = [d for d in dirs if d not in SKIP_DIRS and not d.startswith('.')
+                   and not os.path.exists(os.path.join(root, d, 'go.mod'))]
+        for name in files:
+            if (name.endswith('.go') and not name.endswith('_test.go')) or \
+                    (rel_root == '.' and name in MODULE_FILES):
+                paths.append(os.path.normpath(os.path.join(rel_root, name)))
+    return sorted(paths)
+
+
+def fingerprint(src_dir, package='.', ldflags='', goos='linux', goarch='amd64', cgo=False,
+                toolchain=None):
+    """计算构建指纹"""
+    digest = hashlib.sha256()
+    toolchain = go_version() if toolchain is None else toolchain
+    for key, value in (('package', package), ('ldflags', ldflags), ('goos', goos),
+                       ('goarch', goarch), ('cgo', str(int(cgo))), ('go', toolchain)):
+        digest.update(f"{key}={value}\0".encode())
+    for rel in iter_sources(src_dir):
+        digest.update(rel.encode() + b'\0')
+        with open(os.path.join(src_dir, rel), 'rb') as f:
+            for chunk in iter(lambda: f.read(1 << 20), b''):
+                digest.update(chunk)
+        digest.update(b'\0')
+    return digest.hexdigest()
+
+
+class BuildCache:
+    """按指纹存放构建产物：<cache_dir>/<指纹>/<二进制名>"""
+
+    def __init__(self, cache_dir=DEFAULT_CACHE_DIR):
+        self.cache_dir = cache_dir
+
+    def path(self, key, name):
+        return os.path.join(self.cache_dir, key, name)
+
+    def lookup(self, key, name) -> Optional[str]:
+        path = self.path(key, name)
+        return path if os.path.isfile(path) else None
+
+    def store(self, key, name, artifact):
+        """原子地把产物放入缓存"""
+        target = self.path(key, name)
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=os.path.dirname(target), prefix=f".{name}.")
+        os.close(fd)
+        shutil.copy2(artifact, tmp)
+        os.replace(tmp, target)
+        return target
+
+
+def _install(source, output):
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    shutil.copy2(source, output)
+    os.chmod(output, 0o755)
+
+
+def cached_build(src_dir, output, package='.', ldflags='-s -w', goos='linux', goarch='amd64',
+                 cgo=False, cache=None, use_cache=True, toolchain=None, builder=None):
+    """
+    构建单个目标；指纹命中缓存时直接复制缓存产物
+    builder(env, artifact) 可替换默认的 go build（例如调用构建脚本），需把二进制写到artifact
+    """
+    start = time.perf_counter()
+    cache = cache or BuildCache()
+    name = os.path.basename(output)
+    key = fingerprint(src_dir, package, ldflags, goos, goarch, cgo, toolchain)
+
+    cached = cache.lookup(key, name) if use_cache else None
+    if cached:
+        _install(cached, output)
+        return BuildResult(goarch, output, key, True, time.perf_counter() - start)
+
+    env = os.environ.copy()
+    env.update({'GOOS': goos, 'GOARCH': goarch, 'CGO_ENABLED': '1' if cgo else '0'})
+    with tempfile.TemporaryDirectory(prefix='hygon-build-') as tmp:
+        artifact = os.path.join(tmp, name)
+        if builder:
+            error = builder(env, artifact)
+        else:
+            argv = ['go', 'build', '-ldflags', ldflags, '-o', artifact, package]
+            result = subprocess.run(argv, cwd=src_dir, env=env, capture_output=True, text=True)
+            error = result.stderr.strip() if result.returncode != 0 else ''
+        if not error and not os.path.isfile(artifact):
+            error = f"未生成 {artifact}"
+        if error:
+            return BuildResult(goarch, output, key, False, time.perf_counter() - start, error)
+        cache.store(key, name, artifact)
+        _install(artifact, output)
+    return BuildResult(goarch, output, key, False, time.perf_counter() - start)
+
+
+def output_name(binary, goarch, multi):
+    """单架构保持原文件名，多架构时追加 -linux-<arch> 后缀"""
+    return f"{binary}-linux-{goarch}" if multi else binary
+
+
+def build_targets(src_dir, binary, goarches=('amd64',), package='.', ldflags='-s -w',
+                  output_dir=None, use_cache=True, cache=None, workers=None):
+    """并发构建多个GOARCH，结果顺序与goarches一致"""
+    goarches = list(goarches)
+    output_dir = output_dir or src_dir
+    multi = len(goarches) > 1
+    cache = cache or BuildCache()
+    toolchain = go_version()
+
+    def build(goarch):
+        output = os.path.join(output_dir, output_name(binary, goarch, multi))
+        try:
+            return cached_build(src_dir, output, package, ldflags, goarch=goarch, cache=cache,
+                                use_cache=use_cache, toolchain=toolchain)
+        except Exception as e:
+            return BuildResult(goarch, output, '', False, 0.0, str(e))
+
+    with ThreadPoolExecutor(max_workers=workers or len(goarches)) as executor:
+        return list(executor.map(build, goarches))
+
+
+def print_results(results):
+    """输出构建结果"""
+    for item in results:
+        if not item.ok:
+            print(f"✗ {item.goarch}: 编译失败: {item.error}")
+        elif item.cached:
+            print(f"✓ {item.goarch}: 命中缓存 {item.fingerprint[:12]} -> {item.output} ({item.elapsed:.2f}s)")
+        else:
+            print(f"✓ {item.goarch}: 已编译 {item.fingerprint[:12]} -> {item.output} ({item.elapsed:.1f}s)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="带缓存的Go构建")
+    parser.add_argument("--src", default=".", help="Go模块目录")
+    parser.add_argument("--package", default=".", help="构建的包")
+    parser.add_argument("--binary", default="hygon-dcu-exporter", help="二进制文件名")
+    parser.add_argument("--goarch", default="amd64", help="目标架构，逗号分隔(如 amd64,arm64)")
+    parser.add_argument("--ldflags", default="-s -w", help="链接参数")
+    parser.add_argument("--output-dir", help="输出目录(默认为--src)")
+    parser.add_argument("--no-cache", action="store_true", help="忽略缓存强制重新编译")
+    parser.add_argument("--fingerprint", action="store_true", help="只输出指纹")
+
+    args = parser.parse_args()
+    goarches = [arch.strip() for arch in args.goarch.split(',') if arch.strip()]
+
+    if args.fingerprint:
+        for goarch in goarches:
+            print(f"{goarch}: {fingerprint(args.src, args.package, args.ldflags, goarch=goarch)}")
+        return
+
+    results = build_targets(args.src, args.binary, goarches, args.package, args.ldflags,
+                            args.output_dir, use_cache=not args.no_cache)
+    print_results(results)
+    sys.exit(0 if all(item.ok for item in results) else 1)
+
+
+if __name__ == "__main__":
+    main()
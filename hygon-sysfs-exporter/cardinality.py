@@ -0,0 +1,364 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Exporter输出基数分析
+流式解析一个或多个/metrics，统计每个指标族的序列数和每个标签的不同取值数，
+推算N个节点的总序列数，并给出可删除的标签建议。
+标签取值数在较小时精确计数，超过阈值后改用HyperLogLog估算，内存与负载大小无关
+"""
+
+import argparse
+import hashlib
+import math
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, NamedTuple
+
+from metrics_parser import DEVICE_LABELS, ExpositionParser, stream_samples
+
+# HyperLogLog精度：2^12个寄存器，4KiB，标准误差约1.6%
+HLL_PRECISION = 12
+
+# 不同取值数超过该值后从精确集合切换为HLL
+EXACT_LIMIT = 1024
+
+# Prometheus单个时间序列在head block中的大致内存开销(字节)，用于推算
+BYTES_PER_SERIES = 4096
+
+
+def _hash64(value):
+    return int.from_bytes(hashlib.blake2b(value.encode('utf-8'), digest_size=8).digest(), 'big')
+
+
+class HyperLogLog:
+    """HyperLogLog基数估算"""
+
+    def __init__(self, precision=HLL_PRECISION):
+        self.precision = precision
+        self.size = 1 << precision
+        self.registers = bytearray(self.size)
+
+    def add(self, value):
+        h = _hash64(value)
+        index = h >> (64 - self.precision)
+        rest = (h << self.precision) & 0xFFFFFFFFFFFFFFFF
+        rank = 64 - self.precision + 1 if rest == 0 else 65 - rest.bit_length()
+        if rank > self.registers[index]:
+            self.registers[index] = rank
+
+    def merge(self, other):
+        if other.precision != self.precision:
+            raise ValueError("HyperLogLog精度不一致，无法合并")
+        self.registers = bytearray(max(a, b) for a, b in zip(self.registers, other.registers))
+
+    def count(self):
+        m = self.size
+        alpha = 0.7213 / (1 + 1.079 / m)
+        estimate = alpha * m * m / sum(2.0 ** -r for r in self.registers)
+        zeros = self.registers.count(0)
+        if estimate <= 2.5 * m and zeros:
+            # 小基数修正：线性计数
+            estimate = m * math.log(m / zeros)
+        return int(round(estimate))
+
+
+class DistinctCounter:
+    """不同取值计数：先用集合精确计数，超过上限后转为HLL"""
+
+    def __init__(self, exact_limit=EXACT_LIMIT):
+        self.exact_limit = exact_limit
+        self.values = set()
+        self.sketch = None
+
+    @property
+    def exact(self):
+        return self.sketch is None
+
+    def add(self, value):
+        if self.sketch is not None:
+            self.sketch.add(value)
+            return
+        self.values.add(value)
+        if len(self.values) > self.exact_limit:
+            self._promote()
+
+    def _promote(self):
+        self.sketch = HyperLogLog()
+        for value in self.values:
+            self.sketch.add(value)
+        self.values = set()
+
+    def merge(self, other):
+        if other.sketch is None:
+            for value in other.values:
+                self.add(value)
+            return
+        if self.sketch is None:
+            self._promote()
+        self.sketch.merge(other.sketch)
+
+    def count(self):
+        return len(self.values) if self.sketch is None else self.sketch.count()
+
+
+class LabelSuggestion(NamedTuple):
+    """可删除标签建议"""
+    label: str
+    reason: str
+    series: int
+
+
+class CardinalityAnalyzer:
+    """
+    累积一个或多个exposition的基数统计
+    每个来源（节点）一个实例，分析完成后可用merge()合并
+    """
+
+    def __init__(self, exact_limit=EXACT_LIMIT):
+        self.exact_limit = exact_limit
+        self.sources = 0
+        self.series = 0
+        self.label_bytes = 0
+        self.errors = 0
+        self.family_series: Dict[str, int] = {}
+        self.family_types: Dict[str, str] = {}
+        self.family_labels: Dict[str, set] = {}
+        self.label_values: Dict[str, DistinctCounter] = {}
+        self.label_series: Dict[str, int] = {}
+        # 在单个来源内取值恒定的标签（与target标签重复）
+        self.constant_labels = None
+        # 在单个来源内由设备标签唯一确定的标签（适合放入info指标）
+        self.device_bound_labels = None
+
+    def _counter(self, label):
+        counter = self.label_values.get(label)
+        if counter is None:
+            counter = self.label_values[label] = DistinctCounter(self.exact_limit)
+        return counter
+
+    def add_samples(self, samples, parser):
+        """统计一个来源的样本流"""
+        source_values = {}
+        device_values = {}
+        varying = set()
+        unbound = set()
+
+        for sample in samples:
+            self.series += 1
+            family = parser.family_name(sample.name)
+            self.family_series[family] = self.family_series.get(family, 0) + 1
+            names = self.family_labels.get(family)
+            if names is None:
+                names = self.family_labels[family] = set()
+
+            device = None
+            for key in DEVICE_LABELS:
+                device = sample.label(key, None)
+                if device is not None:
+                    break
+
+            for label, value in sample.labels:
+                names.add(label)
+                self.label_bytes += len(label) + len(value)
+                self.label_series[label] = self.label_series.get(label, 0) + 1
+                self._counter(label).add(value)
+
+                first = source_values.setdefault(label, value)
+                if first != value:
+                    varying.add(label)
+                if device is not None and label not in DEVICE_LABELS:
+                    bound = device_values.setdefault((label, device), value)
+                    if bound != value:
+                        unbound.add(label)
+
+        self.errors += parser.errors
+        self.sources += 1
+        for family, meta in parser.families.items():
+            self.family_types.setdefault(family, meta.type)
+
+        constant = set(source_values) - varying
+        device_bound = {label for label, _ in device_values} - unbound - constant
+        self.constant_labels = constant if self.constant_labels is None else self.constant_labels & constant
+        self.device_bound_labels = (device_bound if self.device_bound_labels is None
+                                    else self.device_bound_labels & device_bound)
+
+    def add_lines(self, lines):
+        parser = ExpositionParser()
+        self.add_samples(parser.parse(lines), parser)
+
+    def add_url(self, url, session=None, timeout=30):
+        parser = ExpositionParser()
+        self.add_samples(stream_samples(url, session=session, timeout=timeout, parser=parser), parser)
+
+    def merge(self, other):
+        self.sources += other.sources
+        self.series += other.series
+        self.label_bytes += other.label_bytes
+        self.errors += other.errors
+        for family, count in other.family_series.items():
+            self.family_series[family] = self.family_series.get(family, 0) + count
+        for family, kind in other.family_types.items():
+            self.family_types.setdefault(family, kind)
+        for family, names in other.family_labels.items():
+            self.family_labels.setdefault(family, set()).update(names)
+        for label, counter in other.label_values.items():
+            self._counter(label).merge(counter)
+        for label, count in other.label_series.items():
+            self.label_series[label] = self.label_series.get(label, 0) + count
+        for attr in ('constant_labels', 'device_bound_labels'):
+            mine, theirs = getattr(self, attr), getattr(other, attr)
+            if theirs is not None:
+                setattr(self, attr, theirs if mine is None else mine & theirs)
+        return self
+
+    def series_per_source(self):
+        return self.series / self.sources if self.sources else 0.0
+
+    def project(self, nodes):
+        """按平均每节点序列数推算N个节点的总序列数和Prometheus内存占用"""
+        total = int(round(self.series_per_source() * nodes))
+        return {'nodes': nodes, 'series': total, 'memory_bytes': total * BYTES_PER_SERIES}
+
+    def _info_only_labels(self):
+        # 只出现在*_info指标上的标签本身就是元数据，不作为删除建议
+        labels = {}
+        for family, names in self.family_labels.items():
+            for label in names:
+                labels[label] = labels.get(label, True) and family.endswith('_info')
+        return {label for label, info_only in labels.items() if info_only}
+
+    def suggestions(self):
+        """可删除标签建议，按涉及的序列数降序"""
+        result = []
+        info_only = self._info_only_labels()
+        for label in sorted((self.constant_labels or set()) - info_only):
+            result.append(LabelSuggestion(
+                label, "每个节点内取值恒定，与instance重复，可在relabel中删除",
+                self.label_series.get(label, 0)))
+        for label in sorted((self.device_bound_labels or set()) - info_only):
+            result.append(LabelSuggestion(
+                label, "由设备标签唯一确定，可只保留在*_info指标上，查询时用group_left关联",
+                self.label_series.get(label, 0)))
+        result.sort(key=lambda item: item.series, reverse=True)
+        return result
+
+    def report(self, nodes=None):
+        """结构化结果"""
+        return {
+            'sources': self.sources,
+            'series': self.series,
+            'series_per_source': round(self.series_per_source(), 1),
+            'label_bytes': self.label_bytes,
+            'errors': self.errors,
+            'families': {
+                family: {
+                    'series': count,
+                    'type': self.family_types.get(family, 'untyped'),
+                    'labels': sorted(self.family_labels.get(family, ())),
+                }
+                for family, count in sorted(self.family_series.items(), key=lambda item: -item[1])
+            },
+            'labels': {
+                label: {
+                    'distinct': counter.count(),
+                    'exact': counter.exact,
+                    'series': self.label_series.get(label, 0),
+                }
+                for label, counter in sorted(self.label_values.items(), key=lambda item: -item[1].count())
+            },
+            'projection': self.project(nodes) if nodes else None,
+            'suggestions': [item._asdict() for item in self.suggestions()],
+        }
+
+
+def analyze_sources(urls=(), files=(), workers=8, timeout=30):
+    """并发分析多个URL和录制文件，返回合并后的CardinalityAnalyzer"""
+    def analyze(source):
+        kind, location = source
+        analyzer = CardinalityAnalyzer()
+        if kind == 'url':
+            analyzer.add_url(location, timeout=timeout)
+        else:
+            with open(location, 'rb') as f:
+                analyzer.add_lines(f)
+        return analyzer
+
+    sources = [('url', url) for url in urls] + [('file', path) for path in files]
+    if not sources:
+        raise ValueError("没有可分析的来源")
+
+    merged = CardinalityAnalyzer()
+    with ThreadPoolExecutor(max_workers=max(1, min(workers, len(sources)))) as executor:
+        for analyzer in executor.map(analyze, sources):
+            merged.merge(analyzer)
+    return merged
+
+
+def _format_bytes(value):
+    for unit in ('B', 'KiB', 'MiB', 'GiB'):
+        if value < 1024 or unit == 'GiB':
+            return f"{value:.1f} {unit}" if unit != 'B' else f"{value} B"
+        value /= 1024
+
+
+def print_report(analyzer, nodes=None, top=20):
+    """输出基数分析报告"""
+    report = analyzer.report(nodes)
+    print(f"=== 基数分析: {report['sources']} 个来源, {report['series']} 个序列 "
+          f"(平均每来源 {report['series_per_source']:.0f}) ===")
+    if report['errors']:
+        print(f"⚠️  解析失败行数: {report['errors']}")
+
+    print(f"\n--- 指标族序列数 (前{top}) ---")
+    for family, item in list(report['families'].items())[:top]:
+        print(f"{item['series']:>8}  {family} ({item['type']})  [{', '.join(item['labels'])}]")
+
+    print("\n--- 标签取值数 ---")
+    for label, item in report['labels'].items():
+        marker = "" if item['exact'] else " (HLL估算)"
+        print(f"{item['distinct']:>8}  {label}  出现于 {item['series']} 个序列{marker}")
+    print(f"标签键值总长度: {_format_bytes(report['label_bytes'])}")
+
+    projection = report['projection']
+    if projection:
+        print(f"\n--- {projection['nodes']} 节点推算 ---")
+        print(f"总序列数: {projection['series']:,}")
+        print(f"Prometheus head内存(约{BYTES_PER_SERIES}B/序列): {_format_bytes(projection['memory_bytes'])}")
+
+    if report['suggestions']:
+        print("\n--- 可删除标签建议 ---")
+        for item in report['suggestions']:
+            print(f"• {item['label']}: {item['reason']} (涉及 {item['series']} 个序列)")
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Exporter输出基数分析")
+    parser.add_argument("--url", action="append", default=[], help="/metrics地址(可多次指定)")
+    parser.add_argument("--file", action="append", default=[], help="录制的exposition文件(可多次指定)")
+    parser.add_argument("--nodes", type=int, help="推算该节点数下的总序列数")
+    parser.add_argument("--top", type=int, default=20, help="显示序列数最多的前N个指标族")
+    parser.add_argument("--workers", type=int, default=8, help="并发抓取数")
+    parser.add_argument("--timeout", type=float, default=30, help="抓取超时(秒)")
+    parser.add_argument("--json", action="store_true", help="以JSON格式输出")
+
+    args = parser.parse_args()
+    if not args.url and not args.file:
+        parser.error("需要 --url 或 --file")
+
+    try:
+        analyzer = analyze_sources(args.url, args.file, args.workers, args.timeout)
+    except Exception as e:
+        print(f"✗ 分析失败: {e}")
+        sys.exit(1)
+
+    if args.json:
+        import json
+        json.dump(analyzer.report(args.nodes), sys.stdout, indent=2, ensure_ascii=False)
+        print()
+    else:
+        print_report(analyzer, args.nodes, args.top)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,177 @@
+package main
+
+import (
+	"fmt"
+	"os"
+	"path/filepath"
+	"testing"
+	"time"
+
+	"github.com/prometheus/client_golang/prometheus"
+)
+
+// writeFakeSysfs 生成cards张卡的合成sysfs树（布局与 sysfs_fixture.py generate 相同）
+func writeFakeSysfs(tb testing.TB, cards int) string {
+	root := tb.TempDir()
+	for i := 0; i < cards; i++ {
+		writeFakeCard(tb, root, i, fmt.Sprintf("HG0000%06d", i))
+	}
+	return root
+}
+
+// writeFakeCard 在root下写入card<i>，序列号为serial
+func writeFakeCard(tb testing.TB, root string, i int, serial string) {
+	device := filepath.Join(root, "class", "drm", fmt.Sprintf("card%d", i), "device")
+	hwmon := filepath.Join(device, "hwmon", fmt.Sprintf("hwmon%d", i+2))
+	files := map[string]string{
+		filepath.Join(device, "vendor"):              "0x1e83",
+		filepath.Join(device, "serial_number"):       serial,
+		filepath.Join(device, "unique_id"):           fmt.Sprintf("%016x", i+1),
+		filepath.Join(device, "product_name"):        "Hygon DCU",
+		filepath.Join(device, "vbios_version"):       "113-D1640200-100",
+		filepath.Join(device, "gpu_busy_percent"):    "57",
+		filepath.Join(device, "mem_busy_percent"):    "23",
+		filepath.Join(device, "mem_info_vram_total"): "68719476736",
+		filepath.Join(device, "mem_info_vram_used"):  "17179869184",
+		filepath.Join(device, "chip_power_average"):  "215000",
+		filepath.Join(hwmon, "temp1_input"):          "61000",
+		filepath.Join(hwmon, "temp2_input"):          "67000",
+		filepath.Join(hwmon, "temp3_input"):          "58000",
+		filepath.Join(hwmon, "power1_cap"):           "300000000",
+		filepath.Join(hwmon, "fan1_input"):           "0",
+	}
+	for path, value := range files {
+		if err := os.MkdirAll(filepath.Dir(path), 0o755); err != nil {
+			tb.Fatal(err)
+		}
+		if err := os.WriteFile(path, []byte(value+"\n"), 0o644); err != nil {
+			tb.Fatal(err)
+		}
+	}
+}
+
+// legacyCollect 改造前的采集方式：每次采集获取主机名、重新生成标签，逐个open/read/close全部属性文件
+func legacyCollect(c *HygonSysfsCollector, ch chan<- prometheus.Metric) {
+	hostname, _ := os.Hostname()
+	for _, d := range c.devices {
+		device := d.HygonDevice
+		labels := []string{
+			fmt.Sprintf("%d", device.CardID),
+			device.UniqueID,
+			fmt.Sprintf("hygon%d", device.CardID),
+			device.SerialNumber,
+			hostname,
+		}
+		c.dcuUsage.WithLabelValues(labels...).Set(c.readSysfsFloat(filepath.Join(device.SysfsPath, "gpu_busy_percent")))
+		c.memUsage.WithLabelValues(labels...).Set(c.readSysfsFloat(filepath.Join(device.SysfsPath, "mem_busy_percent")))
+		c.vramTotal.WithLabelValues(labels...).Set(c.readSysfsFloat(filepath.Join(device.SysfsPath, "mem_info_vram_total")))
+		c.vramUsage.WithLabelValues(labels...).Set(c.readSysfsFloat(filepath.Join(device.SysfsPath, "mem_info_vram_used")))
+		c.avgPower.WithLabelValues(labels...).Set(c.readSysfsFloat(filepath.Join(device.SysfsPath, "chip_power_average")) / 1000)
+		for i, name := range tempSensorFiles {
+			if temp := c.readSysfsFloat(filepath.Join(device.HwmonPath, name)); temp > 0 {
+				c.temperature.WithLabelValues(append(labels, tempSensorLabels[i])...).Set(temp / 1000)
+			}
+		}
+		if powerCap := c.readSysfsFloat(filepath.Join(device.HwmonPath, "power1_cap")); powerCap > 0 {
+			c.powerCap.WithLabelValues(labels...).Set(powerCap / 1000000)
+		}
+		c.fanSpeed.WithLabelValues(labels...).Set(c.readSysfsFloat(filepath.Join(device.HwmonPath, "fan1_input")))
+		c.deviceInfo.WithLabelValues(append(labels, device.VBIOSVersion)...).Set(1.0)
+	}
+	c.temperature.Collect(ch)
+	c.avgPower.Collect(ch)
+	c.powerCap.Collect(ch)
+	c.vramUsage.Collect(ch)
+	c.vramTotal.Collect(ch)
+	c.dcuUsage.Collect(ch)
+	c.memUsage.Collect(ch)
+	c.fanSpeed.Collect(ch)
+	c.deviceInfo.Collect(ch)
+}
+
+func benchmarkCollect(b *testing.B, cards int, collect func(*HygonSysfsCollector, chan<- prometheus.Metric), sampler bool) {
+	c := NewHygonSysfsCollector(writeFakeSysfs(b, cards))
+	if len(c.devices) != cards {
+		b.Fatalf("discovered %d devices, want %d", len(c.devices), cards)
+	}
+	if sampler {
+		stop := make(chan struct{})
+		defer close(stop)
+		c.StartSampler(time.Hour, stop)
+	}
+
+	ch := make(chan prometheus.Metric, 1024)
+	done := make(chan struct{})
+	go func() {
+		for range ch {
+		}
+		close(done)
+	}()
+
+	b.ReportAllocs()
+	b.ResetTimer()
+	for i := 0; i < b.N; i++ {
+		collect(c, ch)
+	}
+	b.StopTimer()
+	close(ch)
+	<-done
+}
+
+// BenchmarkCollect 对比单次Collect的耗时和内存分配：
+// legacy为逐个open/read/close的旧方式，cached为抓取时同步pread，snapshot为后台采样模式下只输出快照
+//
+//	go test -run '^$' -bench Collect -benchmem .
+func BenchmarkCollect(b *testing.B) {
+	for _, cards := range []int{8, 16, 64} {
+		cards := cards
+		b.Run(fmt.Sprintf("cards=%d/legacy", cards), func(b *testing.B) {
+			benchmarkCollect(b, cards, legacyCollect, false)
+		})
+		b.Run(fmt.Sprintf("cards=%d/cached", cards), func(b *testing.B) {
+			benchmarkCollect(b, cards, (*HygonSysfsCollector).Collect, false)
+		})
+		b.Run(fmt.Sprintf("cards=%d/snapshot", cards), func(b *testing.B) {
+			benchmarkCollect(b, cards, (*HygonSysfsCollector).Collect, true)
+		})
+	}
+}
+
+// subsampleCPUBudget 16卡、100ms子采样间隔下子采样允许占用的单核CPU比例
+const subsampleCPUBudget = 0.01
+
+// subsampleBudgetEnv 设置后BenchmarkSubsample才检查subsampleCPUBudget；
+// 负载较高的CI机器上墙钟耗时不稳定，默认只报告占比
+const subsampleBudgetEnv = "HYGON_SUBSAMPLE_BUDGET"
+
+// BenchmarkSubsample 测量一次子采样（每张卡pread功耗和使用率各一次）的耗时，
+// 并折算为100ms间隔下的单核CPU占比；子采样在单个协程内顺序执行，墙钟时间即其CPU时间的上界。
+// 设置HYGON_SUBSAMPLE_BUDGET时，16卡占比超过subsampleCPUBudget则失败
+//
+//	HYGON_SUBSAMPLE_BUDGET=1 go test -run '^$' -bench Subsample .
+func BenchmarkSubsample(b *testing.B) {
+	const interval = 100 * time.Millisecond
+	enforce := os.Getenv(subsampleBudgetEnv) != ""
+	for _, cards := range []int{8, 16, 64} {
+		cards := cards
+		b.Run(fmt.Sprintf("cards=%d", cards), func(b *testing.B) {
+			c := NewHygonSysfsCollector(writeFakeSysfs(b, cards))
+			c.enableSubsampling(interval, 30*time.Second)
+			devices := c.currentDevices()
+
+			b.ReportAllocs()
+			b.ResetTimer()
+			for i := 0; i < b.N; i++ {
+				c.subsampleDevices(devices)
+			}
+			b.StopTimer()
+
+			share := float64(b.Elapsed()) / float64(b.N) / float64(interval)
+			b.ReportMetric(share*100, "%cpu@100ms")
+			if enforce && cards == 16 && b.N >= 100 && share > subsampleCPUBudget {
+				b.Errorf("sub-sampling 16 cards costs %.3f%% of a core at %s, budget %.1f%%",
+					share*100, interval, subsampleCPUBudget*100)
+			}
+		})
+	}
+}
@@ -0,0 +1,265 @@
+package main
+
+import (
+	"bytes"
+	"io"
+	"os"
+	"path/filepath"
+	"strconv"
+	"sync"
+
+	"github.com/prometheus/client_golang/prometheus"
+	"github.com/sirupsen/logrus"
+)
+
+// 温度传感器文件及对应的sensor标签
+var (
+	tempSensorFiles  = [...]string{"temp1_input", "temp2_input", "temp3_input"}
+	tempSensorLabels = [...]string{"edge", "junction", "memory"}
+)
+
+// sysfsAttr 常驻打开的sysfs属性文件
+// sysfs属性每次从偏移0读取都会重新生成内容，因此用pread(ReadAt)代替每次open/read/close
+type sysfsAttr struct {
+	path string
+	file *os.File
+	buf  [64]byte
+}
+
+// openSysfsAttr 打开属性文件；文件不存在时返回nil
+func openSysfsAttr(path string) *sysfsAttr {
+	file, err := os.Open(path)
+	if err != nil {
+		logrus.Warnf("Failed to open %s: %v", path, err)
+		return nil
+	}
+	return &sysfsAttr{path: path, file: file}
+}
+
+// read 读取并解析当前值；读取失败时关闭文件，下次读取时重新打开（设备复位后旧fd会失效）
+func (a *sysfsAttr) read() (float64, error) {
+	if a.file == nil {
+		file, err := os.Open(a.path)
+		if err != nil {
+			return 0, err
+		}
+		a.file = file
+	}
+	n, err := a.file.ReadAt(a.buf[:], 0)
+	if err != nil && err != io.EOF {
+		a.file.Close()
+		a.file = nil
+		return 0, err
+	}
+	return parseSysfsValue(a.buf[:n])
+}
+
+// close 关闭属性文件（设备消失时调用）
+func (a *sysfsAttr) close() {
+	if a != nil && a.file != nil {
+		a.file.Close()
+		a.file = nil
+	}
+}
+
+// parseSysfsValue 解析sysfs数值，非负整数走快速路径（不分配内存）
+func parseSysfsValue(b []byte) (float64, error) {
+	b = bytes.TrimSpace(b)
+	if len(b) > 0 && len(b) < 19 {
+		var v uint64
+		for _, ch := range b {
+			if ch < '0' || ch > '9' {
+				return strconv.ParseFloat(string(b), 64)
+			}
+			v = v*10 + uint64(ch-'0')
+		}
+		return float64(v), nil
+	}
+	return strconv.ParseFloat(string(b), 64)
+}
+
+// deviceState 单个设备的采集状态：发现时缓存静态属性和标签对应的子指标，
+// 动态属性保持打开，每次采集只做pread
+type deviceState struct {
+	HygonDevice
+
+	name     string      // class/drm下的目录名（cardN）
+	identity os.FileInfo // 发现时device目录的stat结果，用于识别目录被重建
+
+	mu     sync.Mutex
+	labels []string
+
+	dcuBusy  *sysfsAttr
+	memBusy  *sysfsAttr
+	vramUsed *sysfsAttr
+	power    *sysfsAttr
+	fan      *sysfsAttr
+	temps    [len(tempSensorFiles)]*sysfsAttr
+
+	dcuUsage    prometheus.Gauge
+	memUsage    prometheus.Gauge
+	vramUsage   prometheus.Gauge
+	avgPower    prometheus.Gauge
+	fanSpeed    prometheus.Gauge
+	temperature [len(tempSensorFiles)]prometheus.Gauge
+
+	// 子采样窗口（未启用子采样时为nil）
+	powerWindow *window
+	busyWindow  *window
+	powerStats  [len(windowStats)]prometheus.Gauge
+	busyStats   [len(windowStats)]prometheus.Gauge
+
+	closed bool // 设备已消失，属性文件已关闭
+}
+
+// newDeviceState 打开设备的动态属性，设置只需读取一次的静态指标
+func (c *HygonSysfsCollector) newDeviceState(device HygonDevice) *deviceState {
+	cardID := strconv.Itoa(device.CardID)
+	d := &deviceState{
+		HygonDevice: device,
+		labels:      []string{cardID, device.UniqueID, "hygon" + cardID, device.SerialNumber, c.hostname},
+	}
+
+	d.dcuBusy = openSysfsAttr(filepath.Join(device.SysfsPath, "gpu_busy_percent"))
+	d.memBusy = openSysfsAttr(filepath.Join(device.SysfsPath, "mem_busy_percent"))
+	d.vramUsed = openSysfsAttr(filepath.Join(device.SysfsPath, "mem_info_vram_used"))
+	d.power = openSysfsAttr(filepath.Join(device.SysfsPath, "chip_power_average"))
+
+	d.dcuUsage = c.dcuUsage.WithLabelValues(d.labels...)
+	d.memUsage = c.memUsage.WithLabelValues(d.labels...)
+	d.vramUsage = c.vramUsage.WithLabelValues(d.labels...)
+	d.avgPower = c.avgPower.WithLabelValues(d.labels...)
+
+	// 静态属性：显存总量、功耗上限（微瓦转瓦特）、VBIOS版本
+	c.vramTotal.WithLabelValues(d.labels...).Set(c.readSysfsFloat(filepath.Join(device.SysfsPath, "mem_info_vram_total")))
+	c.deviceInfo.WithLabelValues(d.labelsWith(device.VBIOSVersion)...).Set(1.0)
+
+	if device.HwmonPath != "" {
+		if powerCap := c.readSysfsFloat(filepath.Join(device.HwmonPath, "power1_cap")); powerCap > 0 {
+			c.powerCap.WithLabelValues(d.labels...).Set(powerCap / 1000000)
+		}
+		for i, name := range tempSensorFiles {
+			d.temps[i] = openSysfsAttr(filepath.Join(device.HwmonPath, name))
+		}
+		d.fan = openSysfsAttr(filepath.Join(device.HwmonPath, "fan1_input"))
+		d.fanSpeed = c.fanSpeed.WithLabelValues(d.labels...)
+	}
+	if c.windowSize > 0 {
+		c.attachWindows(d)
+	}
+	return d
+}
+
+// labelsWith 设备标签后追加一个标签值（不修改d.labels）
+func (d *deviceState) labelsWith(value string) []string {
+	return append(d.labels[:len(d.labels):len(d.labels)], value)
+}
+
+// close 关闭设备的全部属性文件，之后子采样不会再读取（避免按路径重新打开）
+func (d *deviceState) close() {
+	d.mu.Lock()
+	defer d.mu.Unlock()
+	d.closed = true
+	for _, attr := range []*sysfsAttr{d.dcuBusy, d.memBusy, d.vramUsed, d.power, d.fan} {
+		attr.close()
+	}
+	for _, attr := range d.temps {
+		attr.close()
+	}
+}
+
+// readAttr 读取动态属性，文件缺失或读取失败时返回0（与逐次读取文件时的行为一致）
+func readAttr(a *sysfsAttr) float64 {
+	if a == nil {
+		return 0
+	}
+	val, err := a.read()
+	if err != nil {
+		logrus.Warnf("Failed to read %s: %v", a.path, err)
+		return 0
+	}
+	return val
+}
+
+// deviceSample 一次采集得到的设备读数
+type deviceSample struct {
+	device    *deviceState
+	dcuUsage  float64
+	memUsage  float64
+	vramUsage float64
+	power     float64
+	fan       float64
+	temps     [len(tempSensorFiles)]float64 // <=0 表示传感器无读数
+}
+
+// read 读取设备的动态属性（只做I/O，不更新指标）
+func (d *deviceState) read(s *deviceSample) {
+	d.mu.Lock()
+	defer d.mu.Unlock()
+
+	if d.closed {
+		// 设备已被重新发现移除：属性文件已关闭，不能经sysfsAttr.read按路径重新打开
+		*s = deviceSample{device: d}
+		return
+	}
+	s.device = d
+	s.dcuUsage = readAttr(d.dcuBusy)
+	s.memUsage = readAttr(d.memBusy)
+	s.vramUsage = readAttr(d.vramUsed)
+	s.power = readAttr(d.power) / 1000 // mW转换为W
+	s.fan = readAttr(d.fan)
+	for i, attr := range d.temps {
+		s.temps[i] = 0
+		if attr != nil {
+			s.temps[i] = readAttr(attr) / 1000 // 转换为摄氏度
+		}
+	}
+}
+
+// applySample 把读数写入设备的子指标
+func (c *HygonSysfsCollector) applySample(s *deviceSample) {
+	d := s.device
+	d.dcuUsage.Set(s.dcuUsage)
+	d.memUsage.Set(s.memUsage)
+	d.vramUsage.Set(s.vramUsage)
+	d.avgPower.Set(s.power)
+	c.applyWindows(d)
+
+	if d.HwmonPath == "" {
+		return
+	}
+	d.mu.Lock()
+	defer d.mu.Unlock()
+	for i, temp := range s.temps {
+		if temp > 0 {
+			if d.temperature[i] == nil {
+				d.temperature[i] = c.temperature.WithLabelValues(d.labelsWith(tempSensorLabels[i])...)
+			}
+			d.temperature[i].Set(temp)
+		} else if d.temperature[i] != nil {
+			// 传感器不再上报，删除序列而不是一直输出最后一次读数
+			c.temperature.DeleteLabelValues(d.labelsWith(tempSensorLabels[i])...)
+			d.temperature[i] = nil
+		}
+	}
+	d.fanSpeed.Set(s.fan)
+}
+
+// readDevices 并行读取所有设备到samples（复用其容量）
+func (c *HygonSysfsCollector) readDevices(samples []deviceSample) []deviceSample {
+	if cap(samples) < len(c.devices) {
+		samples = make([]deviceSample, len(c.devices))
+	}
+	samples = samples[:len(c.devices)]
+
+	var wg sync.WaitGroup
+	for i, d := range c.devices {
+		wg.Add(1)
+		go func(d *deviceState, s *deviceSample) {
+			defer wg.Done()
+			d.read(s)
+		}(d, &samples[i])
+	}
+	wg.Wait()
+	return samples
+}
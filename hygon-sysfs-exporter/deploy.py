@@ -5,11 +5,218 @@
 """
 
 import os
+import platform
 import sys
 import subprocess
 import argparse
+import hashlib
+import shlex
 import shutil
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
+from typing import List, NamedTuple, Tuple
+
+from build_cache import build_targets, go_version, output_name, print_results
+from remote_exec import load_hosts, make_transport
+
+BINARY_NAME = "hygon-dcu-exporter"
+
+# 远程部署的文件：(本地文件, 远程安装路径, 权限)；二进制按目标主机的架构选择编译输出
+DEPLOY_ARTIFACTS = [
+    (BINARY_NAME, "/usr/local/bin/hygon-dcu-exporter", "0755"),
+    ("hygon-dcu-exporter.service", "/etc/systemd/system/hygon-dcu-exporter.service", "0644"),
+]
+
+# 远程暂存目录，相对于部署用户的主目录（rsync的相对路径同样以主目录为基准）：
+# 按本次传输文件的sha256命名，上传中断时保留，下次部署同样的文件时rsync --partial从断点续传；
+# 只有安装校验通过后才删除
+REMOTE_STAGING_ROOT = ".cache/hygon-dcu-exporter/staging"
+
+# 安装时先写到目标旁的临时文件，校验通过后再改名替换
+INSTALL_SUFFIX = ".hygon-new"
+
+SERVICE_NAME = "hygon-dcu-exporter"
+
+# uname -m 到GOARCH的映射
+GOARCH_BY_MACHINE = {
+    "x86_64": "amd64",
+    "amd64": "amd64",
+    "aarch64": "arm64",
+    "arm64": "arm64",
+}
+
+# ELF头e_machine到GOARCH的映射，用于识别不带架构后缀的单架构编译输出
+GOARCH_BY_ELF_MACHINE = {
+    0x3E: "amd64",
+    0xB7: "arm64",
+}
+
+class Artifact(NamedTuple):
+    """清单中的一个文件"""
+    local: str
+    remote: str
+    mode: str
+    sha256: str
+
+    @property
+    def name(self):
+        return os.path.basename(self.local)
+
+class HostDeploy(NamedTuple):
+    """单台主机的部署结果"""
+    host: str
+    ok: bool
+    upload: float = 0.0
+    install: float = 0.0
+    total: float = 0.0
+    error: str = ''
+    changed: Tuple[str, ...] = ()
+    skipped: bool = False
+
+def file_sha256(path, chunk_size=1 << 20):
+    """分块计算文件的SHA-256"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def machine_goarch(machine):
+    """把uname -m的输出转换为GOARCH，不支持的架构抛出RuntimeError"""
+    goarch = GOARCH_BY_MACHINE.get(machine.strip())
+    if goarch is None:
+        raise RuntimeError(f"不支持的架构: {machine.strip() or '未知'}")
+    return goarch
+
+def binary_goarch(path):
+    """读取ELF头判断二进制的GOARCH，不是ELF或架构未知时返回None"""
+    with open(path, 'rb') as f:
+        header = f.read(20)
+    if len(header) < 20 or header[:4] != b'\x7fELF':
+        return None
+    byteorder = 'little' if header[5] == 1 else 'big'
+    return GOARCH_BY_ELF_MACHINE.get(int.from_bytes(header[18:20], byteorder))
+
+def binary_for_arch(base_dir, goarch, binary=BINARY_NAME):
+    """
+    选择goarch对应的编译输出：多架构编译的 <binary>-linux-<arch>，或ELF架构相符的单架构输出 <binary>；
+    两者都存在时取较新的一个，都没有时抛出FileNotFoundError
+    """
+    candidates = []
+    suffixed = os.path.join(base_dir, output_name(binary, goarch, True))
+    if os.path.exists(suffixed):
+        candidates.append(suffixed)
+    plain = os.path.join(base_dir, binary)
+    if os.path.exists(plain) and binary_goarch(plain) == goarch:
+        candidates.append(plain)
+    if not candidates:
+        raise FileNotFoundError(f"没有 {goarch} 架构的编译输出 ({suffixed})，请先执行 --build --goarch {goarch}")
+    return max(candidates, key=os.path.getmtime)
+
+def build_manifest(base_dir=".", artifacts=DEPLOY_ARTIFACTS, goarch=None) -> List[Artifact]:
+    """为本地文件计算一次哈希，生成部署清单；指定goarch时二进制取该架构的编译输出"""
+    manifest = []
+    for local, remote, mode in artifacts:
+        path = os.path.join(base_dir, local)
+        if goarch is not None and local == BINARY_NAME:
+            path = binary_for_arch(base_dir, goarch)
+        manifest.append(Artifact(path, remote, mode, file_sha256(path)))
+    return manifest
+
+class ArchManifests:
+    """按架构生成部署清单，每个架构只计算一次哈希，可在多个部署线程间共享"""
+
+    def __init__(self, base_dir=".", artifacts=DEPLOY_ARTIFACTS):
+        self.base_dir = base_dir
+        self.artifacts = artifacts
+        self._manifests = {}
+        self._lock = threading.Lock()
+
+    def get(self, goarch) -> List[Artifact]:
+        with self._lock:
+            if goarch not in self._manifests:
+                self._manifests[goarch] = build_manifest(self.base_dir, self.artifacts, goarch)
+            return self._manifests[goarch]
+
+def _remote_path(path):
+    # LocalTransport演练时REMOTE_ROOT指向模拟主机的根目录，SSH下为空
+    return f'"${{REMOTE_ROOT:-}}"{shlex.quote(path)}'
+
+def remote_hashes(transport, host, manifest):
+    """
+    一次远程调用返回已安装文件的哈希 {远程路径: sha256}
+    文件不存在时不出现在结果中
+    """
+    paths = ' '.join(_remote_path(item.remote) for item in manifest)
+    script = f"sha256sum {paths} 2>/dev/null; true"
+    result = transport.run(host, script)
+    if not result.ok:
+        raise RuntimeError(result.stderr.strip() or f"退出码 {result.returncode}")
+
+    hashes = {}
+    for line in result.stdout.splitlines():
+        parts = line.split(None, 1)
+        if len(parts) != 2:
+            continue
+        digest, path = parts[0], parts[1].lstrip('*')
+        for item in manifest:
+            if path.endswith(item.remote):
+                hashes[item.remote] = digest
+    return hashes
+
+def remote_goarch(transport, host):
+    """查询远程主机的架构 (uname -m)，返回GOARCH"""
+    result = transport.run(host, "uname -m")
+    if not result.ok:
+        raise RuntimeError(f"查询架构失败: {result.stderr.strip() or f'退出码 {result.returncode}'}")
+    return machine_goarch(result.stdout)
+
+def staging_dir(changed):
+    """暂存目录的相对路径：单个文件以其sha256命名，多个文件以各自sha256合并后的sha256命名"""
+    if len(changed) == 1:
+        key = changed[0].sha256
+    else:
+        key = hashlib.sha256("\n".join(item.sha256 for item in changed).encode()).hexdigest()
+    return f"{REMOTE_STAGING_ROOT}/{key}"
+
+def _staging_path(path):
+    # 暂存目录位于部署用户的主目录下；LocalTransport演练时以REMOTE_ROOT作为主目录
+    return f'"${{REMOTE_ROOT:-$HOME}}"/{shlex.quote(path)}'
+
+def make_staging_dir(transport, host, staging):
+    """在远程主机创建暂存目录（权限0700，已存在时保留其中上次中断的文件）"""
+    path = _staging_path(staging)
+    result = transport.run(host, f"umask 077 && mkdir -p {path} && chmod 700 {path}")
+    if not result.ok:
+        raise RuntimeError(f"创建暂存目录失败: {result.stderr.strip() or f'退出码 {result.returncode}'}")
+
+def install_script(changed, staging, sudo="sudo"):
+    """
+    生成安装脚本：校验和安装在同一个特权shell中完成——先把暂存文件install到目标旁的临时文件，
+    校验的是已安装的副本，全部通过后再改名替换，校验之后暂存文件被替换也不会装上；
+    校验失败的暂存文件被删除，下次部署重新传输；仅在有变化时reload/restart，
+    全部成功后才删除暂存目录
+    """
+    lines = ["set -e"]
+    for item in changed:
+        staged = f'"$STAGING"/{shlex.quote(item.name)}'
+        pending = _remote_path(item.remote + INSTALL_SUFFIX)
+        lines.append(f"install -D -m {item.mode} {staged} {pending}")
+        lines.append(f'echo "{item.sha256}  "{pending} | sha256sum -c --quiet - '
+                     f'|| {{ rm -f {pending} {staged}; exit 1; }}')
+    for item in changed:
+        lines.append(f"mv -f {_remote_path(item.remote + INSTALL_SUFFIX)} {_remote_path(item.remote)}")
+    if any(item.remote.endswith('.service') for item in changed):
+        lines.append("systemctl daemon-reload")
+    lines.append(f"systemctl enable {SERVICE_NAME}")
+    lines.append(f"systemctl restart {SERVICE_NAME}")
+    privileged = "\n".join(lines)
+    # sudo会重置环境并可能改变HOME：暂存路径在部署用户的shell中展开，与REMOTE_ROOT一起显式传入
+    install = (f'{sudo} env REMOTE_ROOT="${{REMOTE_ROOT:-}}" STAGING="$STAGING" '
+               f'sh -c {shlex.quote(privileged)}').strip()
+    return f'STAGING={_staging_path(staging)}\n{install} && rm -rf -- "$STAGING"'
 
 def run_command(cmd, cwd=None, check=True):
     """执行命令"""
@@ -20,22 +227,28 @@ def run_command(cmd, cwd=None, check=True):
         sys.exit(1)
     return result
 
-def build_exporter():
-    """编译exporter"""
-    print("开始编译海光DCU Exporter...")
-    
-    # 设置Go环境变量
-    env = os.environ.copy()
-    env['GOOS'] = 'linux'
-    env['GOARCH'] = 'amd64'
-    env['CGO_ENABLED'] = '0'
+def _git(*args):
+    result = subprocess.run(["git", *args], capture_output=True, text=True, env={**os.environ, "TZ": "UTC"})
+    return result.stdout.strip() if result.returncode == 0 else ""
+
+def release_ldflags():
+    """
+    与Makefile相同的链接参数；构建时间取HEAD的提交时间而不是当前时间，
+    同一份源码的ldflags不变，构建缓存命中，部署时远程哈希相同的主机被跳过
+    """
+    version = _git("describe", "--tags", "--always", "--dirty") or "dev"
+    build_time = _git("log", "-1", "--format=%cd", "--date=format-local:%Y-%m-%d_%H:%M:%S") or "unknown"
+    return (f"-s -w -X main.Version={version} -X main.BuildTime={build_time} "
+            f"-X main.GoVersion={go_version() or 'unknown'}")
+
+def build_exporter(goarches=("amd64",), use_cache=True):
+    """编译exporter；源码和参数未变时复用缓存，多个GOARCH并发编译"""
+    print(f"开始编译海光DCU Exporter ({', '.join(goarches)})...")
     
-    # 编译
-    cmd = "go build -ldflags '-s -w' -o hygon-dcu-exporter ."
-    result = subprocess.run(cmd, shell=True, env=env, capture_output=True, text=True)
+    results = build_targets(".", "hygon-dcu-exporter", goarches, ldflags=release_ldflags(), use_cache=use_cache)
+    print_results(results)
     
-    if result.returncode != 0:
-        print(f"编译失败: {result.stderr}")
+    if not all(item.ok for item in results):
         return False
     
     print("编译成功!")
@@ -45,12 +258,14 @@ def deploy_local():
     """本地部署"""
     print("开始本地部署...")
     
-    # 复制二进制文件
-    if not os.path.exists("hygon-dcu-exporter"):
-        print("二进制文件不存在，请先编译")
+    # 复制本机架构的二进制文件
+    try:
+        binary = binary_for_arch(".", machine_goarch(platform.machine()))
+    except (FileNotFoundError, RuntimeError) as e:
+        print(f"二进制文件不存在，请先编译: {e}")
         return False
     
-    run_command("sudo cp hygon-dcu-exporter /usr/local/bin/")
+    run_command(f"sudo cp {shlex.quote(binary)} /usr/local/bin/hygon-dcu-exporter")
     run_command("sudo chmod +x /usr/local/bin/hygon-dcu-exporter")
     
     # 安装systemd服务
@@ -65,31 +280,92 @@ def deploy_local():
     
     return True
 
+def deploy_host(transport, host, manifest, force=False, sudo="sudo", progress=print):
+    """
+    部署到单台主机：先比较远程文件哈希，只把有变化的文件压缩传输到按sha256命名的暂存目录
+    （上传失败时保留，下次部署从断点续传），校验和安装合并为一个特权脚本执行；
+    所有步骤共用transport为该主机建立的复用连接
+    """
+    start = time.perf_counter()
+    installed = {} if force else remote_hashes(transport, host, manifest)
+    changed = [item for item in manifest if installed.get(item.remote) != item.sha256]
+    if not changed:
+        total = time.perf_counter() - start
+        progress(f"[{host}] 已是最新，跳过")
+        return HostDeploy(host, True, total=total, skipped=True)
+
+    names = tuple(item.name for item in changed)
+    progress(f"[{host}] 上传 {', '.join(names)}...")
+    staging = staging_dir(changed)
+    make_staging_dir(transport, host, staging)
+    result = transport.sync(host, [item.local for item in changed], staging + "/")
+    upload = time.perf_counter() - start
+    if not result.ok:
+        return HostDeploy(host, False, upload, 0.0, upload,
+                          f"上传失败 (退出码 {result.returncode}): {result.stderr.strip()}", names)
+
+    progress(f"[{host}] 安装并重启服务...")
+    result = transport.run(host, install_script(changed, staging, sudo))
+    total = time.perf_counter() - start
+    if not result.ok:
+        detail = result.stderr.strip() or result.stdout.strip()
+        return HostDeploy(host, False, upload, total - upload, total,
+                          f"安装失败 (退出码 {result.returncode}): {detail}", names)
+
+    progress(f"[{host}] 完成 ({total:.1f}s)")
+    return HostDeploy(host, True, upload, total - upload, total, changed=names)
+
+def deploy_hosts(hosts, user="root", workers=16, transport=None, manifests=None, force=False, sudo="sudo",
+                 progress=print):
+    """
+    并发部署到多台主机，返回按主机顺序排列的结果
+    每台主机先查询架构，再部署该架构的清单；缺少对应架构的编译输出时该主机部署失败
+    """
+    transport = transport or make_transport('ssh', user=user)
+    manifests = manifests or ArchManifests()
+    lock = threading.Lock()
+
+    def report(message):
+        with lock:
+            progress(message)
+
+    def deploy(host):
+        try:
+            goarch = remote_goarch(transport, host)
+            manifest = manifests.get(goarch)
+            binary = next(item for item in manifest if item.remote.endswith("/" + BINARY_NAME))
+            report(f"[{host}] {goarch}: {binary.name} ({binary.sha256[:12]})")
+            return deploy_host(transport, host, manifest, force, sudo, progress=report)
+        except Exception as e:
+            return HostDeploy(host, False, error=str(e))
+
+    try:
+        with ThreadPoolExecutor(max_workers=max(1, min(workers, len(hosts)))) as executor:
+            return list(executor.map(deploy, hosts))
+    finally:
+        transport.close_all()
+
+def print_deploy_summary(results):
+    """输出部署耗时汇总表"""
+    print("\n=== 部署汇总 ===")
+    print(f"{'主机':<24}{'状态':<6}{'上传(s)':>10}{'安装(s)':>10}{'总计(s)':>10}  详情")
+    for item in results:
+        status = "=" if item.skipped else ("✓" if item.ok else "✗")
+        detail = item.error or ("未变化" if item.skipped else ', '.join(item.changed))
+        print(f"{item.host:<24}{status:<6}{item.upload:>10.2f}{item.install:>10.2f}{item.total:>10.2f}  {detail}")
+    failed = sum(1 for item in results if not item.ok)
+    skipped = sum(1 for item in results if item.skipped)
+    print(f"\n成功 {len(results) - failed}/{len(results)} 台 (其中 {skipped} 台已是最新)")
+
 def deploy_remote(host, user="root"):
     """远程部署"""
     print(f"开始远程部署到 {user}@{host}...")
     
-    if not os.path.exists("hygon-dcu-exporter"):
-        print("二进制文件不存在，请先编译")
+    result, = deploy_hosts([host], user, workers=1)
+    if not result.ok:
+        print(f"远程部署失败: {result.error}")
         return False
     
-    # 上传文件
-    run_command(f"scp hygon-dcu-exporter {user}@{host}:/tmp/")
-    run_command(f"scp hygon-dcu-exporter.service {user}@{host}:/tmp/")
-    
-    # 远程安装
-    remote_commands = [
-        "sudo mv /tmp/hygon-dcu-exporter /usr/local/bin/",
-        "sudo chmod +x /usr/local/bin/hygon-dcu-exporter",
-        "sudo mv /tmp/hygon-dcu-exporter.service /etc/systemd/system/",
-        "sudo systemctl daemon-reload",
-        "sudo systemctl enable hygon-dcu-exporter",
-        "sudo systemctl restart hygon-dcu-exporter"
-    ]
-    
-    for cmd in remote_commands:
-        run_command(f"ssh {user}@{host} '{cmd}'")
-    
     print(f"远程部署到 {host} 完成!")
     print(f"查看状态: ssh {user}@{host} 'sudo systemctl status hygon-dcu-exporter'")
     print(f"查看指标: curl http://{host}:9400/metrics")
@@ -99,14 +375,22 @@ def deploy_remote(host, user="root"):
 def main():
     parser = argparse.ArgumentParser(description="海光DCU Exporter 部署工具")
     parser.add_argument("--build", action="store_true", help="编译exporter")
+    parser.add_argument("--goarch", default="amd64", help="编译的目标架构，逗号分隔(如 amd64,arm64)")
+    parser.add_argument("--no-cache", action="store_true", help="忽略构建缓存强制重新编译")
     parser.add_argument("--deploy-local", action="store_true", help="本地部署")
     parser.add_argument("--deploy-remote", help="远程部署到指定主机")
     parser.add_argument("--user", default="root", help="远程部署用户名")
+    parser.add_argument("--hosts", help="并发部署到多台主机(逗号分隔)")
+    parser.add_argument("--hosts-file", help="并发部署的主机列表文件，每行一个")
+    parser.add_argument("--workers", type=int, default=16, help="并发部署的主机数")
+    parser.add_argument("--force", action="store_true", help="忽略远程哈希，强制重新传输和安装")
     
     args = parser.parse_args()
+    hosts = load_hosts(args.hosts, args.hosts_file)
     
     if args.build:
-        if not build_exporter():
+        goarches = [arch.strip() for arch in args.goarch.split(",") if arch.strip()]
+        if not build_exporter(goarches, use_cache=not args.no_cache):
             sys.exit(1)
     
     if args.deploy_local:
@@ -117,7 +401,14 @@ def main():
         if not deploy_remote(args.deploy_remote, args.user):
             sys.exit(1)
     
-    if not any([args.build, args.deploy_local, args.deploy_remote]):
+    if hosts:
+        print(f"开始并发部署到 {len(hosts)} 台主机 (并发 {args.workers})...")
+        results = deploy_hosts(hosts, args.user, args.workers, force=args.force)
+        print_deploy_summary(results)
+        if not all(item.ok for item in results):
+            sys.exit(1)
+    
+    if not any([args.build, args.deploy_local, args.deploy_remote, hosts]):
         parser.print_help()
 
 if __name__ == "__main__":
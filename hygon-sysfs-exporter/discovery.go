@@ -0,0 +1,164 @@
+package main
+
+import (
+	"os"
+	"path/filepath"
+	"sort"
+	"strconv"
+	"strings"
+	"time"
+
+	"github.com/prometheus/client_golang/prometheus"
+	"github.com/sirupsen/logrus"
+)
+
+// probeCard 读取card目录的设备信息；不是海光设备时返回false
+func (c *HygonSysfsCollector) probeCard(name, cardPath string) (HygonDevice, bool) {
+	// 检查是否是海光设备
+	if vendor := c.readSysfsFile(filepath.Join(cardPath, "vendor")); vendor != "0x1e83" {
+		return HygonDevice{}, false
+	}
+
+	cardID, _ := strconv.Atoi(strings.TrimPrefix(name, "card"))
+	device := HygonDevice{
+		CardID:       cardID,
+		SerialNumber: c.readSysfsFile(filepath.Join(cardPath, "serial_number")),
+		UniqueID:     c.readSysfsFile(filepath.Join(cardPath, "unique_id")),
+		ProductName:  c.readSysfsFile(filepath.Join(cardPath, "product_name")),
+		VBIOSVersion: c.readSysfsFile(filepath.Join(cardPath, "vbios_version")),
+		SysfsPath:    cardPath,
+	}
+
+	// 查找hwmon路径
+	hwmonDir := filepath.Join(cardPath, "hwmon")
+	if hwmonEntries, err := os.ReadDir(hwmonDir); err == nil && len(hwmonEntries) > 0 {
+		device.HwmonPath = filepath.Join(hwmonDir, hwmonEntries[0].Name())
+	}
+	return device, true
+}
+
+// discoverDevices 增量发现海光DCU设备
+// 只列目录并stat每个card的device目录；目录未变（同一inode）的已知设备和非海光设备不再读取属性，
+// 新出现或被重建（热插拔、设备复位）的card重新读取。消失的设备关闭文件并删除其全部序列
+func (c *HygonSysfsCollector) discoverDevices() {
+	drmPath := filepath.Join(c.sysfsPath, "class", "drm")
+	entries, err := os.ReadDir(drmPath)
+	if err != nil {
+		logrus.Errorf("Failed to read DRM directory: %v", err)
+		return
+	}
+
+	c.sampleMu.Lock()
+	defer c.sampleMu.Unlock()
+
+	gone := make(map[string]*deviceState, len(c.devices))
+	for _, d := range c.devices {
+		gone[d.name] = d
+	}
+	devices := make([]*deviceState, 0, len(c.devices))
+	ignored := make(map[string]os.FileInfo)
+	var added []*deviceState
+
+	for _, entry := range entries {
+		name := entry.Name()
+		if !strings.HasPrefix(name, "card") || strings.Contains(name, "-") {
+			continue
+		}
+
+		cardPath := filepath.Join(drmPath, name, "device")
+		identity, err := os.Stat(cardPath)
+		if err != nil {
+			continue
+		}
+		if d, ok := gone[name]; ok && os.SameFile(d.identity, identity) {
+			devices = append(devices, d)
+			delete(gone, name)
+			continue
+		}
+		if prev, ok := c.ignored[name]; ok && os.SameFile(prev, identity) {
+			ignored[name] = identity
+			continue
+		}
+
+		device, ok := c.probeCard(name, cardPath)
+		if !ok {
+			ignored[name] = identity // 不是海光设备
+			continue
+		}
+		// 先只记录设备信息，旧序列删除之后再创建子指标（复位后的设备标签可能与旧设备相同）
+		added = append(added, &deviceState{HygonDevice: device, name: name, identity: identity})
+	}
+	c.ignored = ignored
+
+	if len(gone) == 0 && len(added) == 0 {
+		return
+	}
+
+	// 写锁内删除消失设备的序列并清空快照，之后的抓取不会再把旧读数写回
+	c.snapshots.invalidate(func() {
+		for _, d := range gone {
+			c.deleteDeviceSeries(d)
+			d.close()
+			logrus.Infof("Hygon DCU removed: %s, serial=%s", d.name, d.SerialNumber)
+		}
+	})
+
+	for _, pending := range added {
+		d := c.newDeviceState(pending.HygonDevice)
+		d.name, d.identity = pending.name, pending.identity
+		devices = append(devices, d)
+		logrus.Infof("Discovered Hygon DCU: card%d, serial=%s", d.CardID, d.SerialNumber)
+	}
+	sort.Slice(devices, func(i, j int) bool { return devices[i].CardID < devices[j].CardID })
+	c.devices = devices
+
+	// 后台采样模式下立即补一份快照，不必等到下一个采样周期
+	if c.sampleInterval > 0 {
+		c.sampleLocked()
+	}
+}
+
+// deleteDeviceSeries 删除设备的全部序列
+func (c *HygonSysfsCollector) deleteDeviceSeries(d *deviceState) {
+	for _, vec := range []*prometheus.GaugeVec{
+		c.avgPower, c.powerCap, c.vramUsage, c.vramTotal, c.dcuUsage, c.memUsage, c.fanSpeed,
+	} {
+		vec.DeleteLabelValues(d.labels...)
+	}
+	for _, sensor := range tempSensorLabels {
+		c.temperature.DeleteLabelValues(d.labelsWith(sensor)...)
+	}
+	c.deviceInfo.DeleteLabelValues(d.labelsWith(d.VBIOSVersion)...)
+	for _, stat := range windowStats {
+		c.powerWindow.DeleteLabelValues(d.labelsWith(stat)...)
+		c.busyWindow.DeleteLabelValues(d.labelsWith(stat)...)
+	}
+}
+
+// currentDevices 当前设备列表；重新发现时整体替换切片，返回值可在锁外遍历
+func (c *HygonSysfsCollector) currentDevices() []*deviceState {
+	c.sampleMu.Lock()
+	defer c.sampleMu.Unlock()
+	return c.devices
+}
+
+// deviceCount 当前设备数
+func (c *HygonSysfsCollector) deviceCount() int {
+	return len(c.currentDevices())
+}
+
+// StartRediscovery 每interval增量重新发现一次设备；关闭stop结束
+func (c *HygonSysfsCollector) StartRediscovery(interval time.Duration, stop <-chan struct{}) {
+	go func() {
+		ticker := time.NewTicker(interval)
+		defer ticker.Stop()
+		for {
+			select {
+			case <-ticker.C:
+				c.discoverDevices()
+			case <-stop:
+				return
+			}
+		}
+	}()
+}
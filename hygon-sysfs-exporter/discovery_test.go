@@ -0,0 +1,137 @@
+package main
+
+import (
+	"bufio"
+	"net/http/httptest"
+	"os"
+	"path/filepath"
+	"reflect"
+	"regexp"
+	"sort"
+	"strings"
+	"testing"
+	"time"
+
+	"github.com/prometheus/client_golang/prometheus"
+	"github.com/prometheus/client_golang/prometheus/promhttp"
+)
+
+var serialLabelRE = regexp.MustCompile(`serial="([^"]*)"`)
+
+// exportedSerials 抓取一次/metrics，返回 指标名 -> 该指标出现的设备序列号（排序去重）
+func exportedSerials(t *testing.T, c *HygonSysfsCollector) map[string][]string {
+	t.Helper()
+	registry := prometheus.NewRegistry()
+	registry.MustRegister(c)
+	recorder := httptest.NewRecorder()
+	promhttp.HandlerFor(registry, promhttp.HandlerOpts{}).ServeHTTP(recorder, httptest.NewRequest("GET", "/metrics", nil))
+
+	seen := make(map[string]map[string]bool)
+	scanner := bufio.NewScanner(recorder.Body)
+	for scanner.Scan() {
+		line := scanner.Text()
+		match := serialLabelRE.FindStringSubmatch(line)
+		if strings.HasPrefix(line, "#") || match == nil {
+			continue
+		}
+		name := line[:strings.IndexAny(line, "{ ")]
+		if seen[name] == nil {
+			seen[name] = make(map[string]bool)
+		}
+		seen[name][match[1]] = true
+	}
+
+	result := make(map[string][]string, len(seen))
+	for name, serials := range seen {
+		for serial := range serials {
+			result[name] = append(result[name], serial)
+		}
+		sort.Strings(result[name])
+	}
+	return result
+}
+
+// TestRediscoverySeries 在合成sysfs树上增加、移除、替换card目录后重新发现，
+// 检查每个按设备导出的指标（含子采样窗口统计）恰好覆盖现存设备，消失设备的序列全部删除
+func TestRediscoverySeries(t *testing.T) {
+	tests := []struct {
+		name   string
+		change func(t *testing.T, root string)
+		want   []string
+	}{
+		{
+			name:   "unchanged",
+			change: func(t *testing.T, root string) {},
+			want:   []string{"HG0000000000", "HG0000000001", "HG0000000002"},
+		},
+		{
+			name: "add",
+			change: func(t *testing.T, root string) {
+				writeFakeCard(t, root, 3, "HG0000000003")
+			},
+			want: []string{"HG0000000000", "HG0000000001", "HG0000000002", "HG0000000003"},
+		},
+		{
+			name: "remove",
+			change: func(t *testing.T, root string) {
+				if err := os.RemoveAll(filepath.Join(root, "class", "drm", "card1")); err != nil {
+					t.Fatal(err)
+				}
+			},
+			want: []string{"HG0000000000", "HG0000000002"},
+		},
+		{
+			// 同名card目录被重建（复位或换卡）：新目录先在别处生成再换入，保证inode不同
+			name: "replace",
+			change: func(t *testing.T, root string) {
+				staging := t.TempDir()
+				writeFakeCard(t, staging, 1, "HG0000009999")
+				card := filepath.Join(root, "class", "drm", "card1")
+				if err := os.RemoveAll(card); err != nil {
+					t.Fatal(err)
+				}
+				if err := os.Rename(filepath.Join(staging, "class", "drm", "card1"), card); err != nil {
+					t.Fatal(err)
+				}
+			},
+			want: []string{"HG0000000000", "HG0000000002", "HG0000009999"},
+		},
+	}
+
+	for _, tt := range tests {
+		t.Run(tt.name, func(t *testing.T) {
+			root := writeFakeSysfs(t, 3)
+			c := NewHygonSysfsCollector(root)
+			c.enableSubsampling(time.Millisecond, time.Second)
+			c.subsampleDevices(c.currentDevices())
+			before := exportedSerials(t, c)
+			if len(before) == 0 {
+				t.Fatal("no per-device series exported")
+			}
+			kept := make(map[string]*deviceState)
+			for _, d := range c.currentDevices() {
+				kept[d.SerialNumber] = d
+			}
+
+			tt.change(t, root)
+			c.discoverDevices()
+			c.subsampleDevices(c.currentDevices())
+			after := exportedSerials(t, c)
+
+			if len(after) != len(before) {
+				t.Errorf("exported %d per-device metrics, want %d", len(after), len(before))
+			}
+			for name := range before {
+				if got := after[name]; !reflect.DeepEqual(got, tt.want) {
+					t.Errorf("%s: serials %v, want %v", name, got, tt.want)
+				}
+			}
+			// 目录未变的设备沿用原状态（不重新打开属性文件）
+			for _, d := range c.currentDevices() {
+				if previous, ok := kept[d.SerialNumber]; ok && previous != d {
+					t.Errorf("%s: unchanged device was re-created", d.SerialNumber)
+				}
+			}
+		})
+	}
+}
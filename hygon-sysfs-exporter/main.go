@@ -5,9 +5,9 @@ import (
 	"fmt"
 	"net/http"
 	"os"
-	"path/filepath"
 	"strconv"
 	"strings"
+	"sync"
 	"time"
 
 	"github.com/gorilla/mux"
@@ -36,7 +36,10 @@ type HygonDevice struct {
 
 // HygonSysfsCollector 基于sysfs的海光卡收集器
 type HygonSysfsCollector struct {
-	devices []HygonDevice
+	sysfsPath string
+	hostname  string
+	devices   []*deviceState         // 受sampleMu保护
+	ignored   map[string]os.FileInfo // 已确认不是海光设备的card目录，重新发现时跳过
 
 	// Prometheus指标
 	temperature *prometheus.GaugeVec
@@ -48,11 +51,33 @@ type HygonSysfsCollector struct {
 	memUsage    *prometheus.GaugeVec
 	fanSpeed    *prometheus.GaugeVec
 	deviceInfo  *prometheus.GaugeVec
+	powerWindow *prometheus.GaugeVec
+	busyWindow  *prometheus.GaugeVec
+
+	// 自监控指标
+	collectDuration   prometheus.Gauge
+	lastSample        prometheus.Gauge
+	subsampleDuration prometheus.Gauge
+
+	// 采样状态：sampleInterval为0时每次抓取同步采集；sampleMu同时保护设备列表
+	sampleInterval time.Duration
+	sampleMu       sync.Mutex
+	snapshots      snapshotBuffer
+
+	// 子采样窗口长度（读数个数），0表示未启用子采样
+	windowSize int
 }
 
-// NewHygonSysfsCollector 创建基于sysfs的海光卡收集器
-func NewHygonSysfsCollector() *HygonSysfsCollector {
+// NewHygonSysfsCollector 创建基于sysfs的海光卡收集器，sysfsPath为sysfs挂载点（通常为/sys）
+func NewHygonSysfsCollector(sysfsPath string) *HygonSysfsCollector {
+	hostname, _ := os.Hostname()
+	if hostname == "" {
+		hostname = "localhost"
+	}
+
 	collector := &HygonSysfsCollector{
+		sysfsPath: sysfsPath,
+		hostname:  hostname,
 		temperature: prometheus.NewGaugeVec(
 			prometheus.GaugeOpts{
 				Name: "hygon_temperature_celsius",
@@ -116,6 +141,38 @@ func NewHygonSysfsCollector() *HygonSysfsCollector {
 			},
 			[]string{"gpu", "uuid", "device", "serial", "hostname", "vbios_version"},
 		),
+		powerWindow: prometheus.NewGaugeVec(
+			prometheus.GaugeOpts{
+				Name: "hygon_power_watts_window",
+				Help: "Power consumption in Watts over the sub-sampling window (stat: min, max, mean, p95).",
+			},
+			[]string{"gpu", "uuid", "device", "serial", "hostname", "stat"},
+		),
+		busyWindow: prometheus.NewGaugeVec(
+			prometheus.GaugeOpts{
+				Name: "hygon_dcu_utilization_percent_window",
+				Help: "DCU utilization percentage over the sub-sampling window (stat: min, max, mean, p95).",
+			},
+			[]string{"gpu", "uuid", "device", "serial", "hostname", "stat"},
+		),
+		collectDuration: prometheus.NewGauge(
+			prometheus.GaugeOpts{
+				Name: "hygon_exporter_collect_duration_seconds",
+				Help: "Duration of the last sysfs collection in seconds.",
+			},
+		),
+		lastSample: prometheus.NewGauge(
+			prometheus.GaugeOpts{
+				Name: "hygon_exporter_last_sample_timestamp_seconds",
+				Help: "Unix time when the served device readings were taken.",
+			},
+		),
+		subsampleDuration: prometheus.NewGauge(
+			prometheus.GaugeOpts{
+				Name: "hygon_exporter_subsample_duration_seconds",
+				Help: "Duration of the last power/utilization sub-sampling pass in seconds.",
+			},
+		),
 	}
 
 	// 发现设备
@@ -123,52 +180,6 @@ func NewHygonSysfsCollector() *HygonSysfsCollector {
 	return collector
 }
 
-// discoverDevices 发现海光DCU设备
-func (c *HygonSysfsCollector) discoverDevices() {
-	drmPath := "/sys/class/drm"
-	entries, err := os.ReadDir(drmPath)
-	if err != nil {
-		logrus.Errorf("Failed to read DRM directory: %v", err)
-		return
-	}
-
-	for _, entry := range entries {
-		if !strings.HasPrefix(entry.Name(), "card") || strings.Contains(entry.Name(), "-") {
-			continue
-		}
-
-		cardPath := filepath.Join(drmPath, entry.Name(), "device")
-		if _, err := os.Stat(cardPath); os.IsNotExist(err) {
-			continue
-		}
-
-		// 检查是否是海光设备
-		vendorPath := filepath.Join(cardPath, "vendor")
-		if vendor := c.readSysfsFile(vendorPath); vendor != "0x1e83" {
-			continue // 不是海光设备
-		}
-
-		cardID, _ := strconv.Atoi(strings.TrimPrefix(entry.Name(), "card"))
-		device := HygonDevice{
-			CardID:       cardID,
-			SerialNumber: c.readSysfsFile(filepath.Join(cardPath, "serial_number")),
-			UniqueID:     c.readSysfsFile(filepath.Join(cardPath, "unique_id")),
-			ProductName:  c.readSysfsFile(filepath.Join(cardPath, "product_name")),
-			VBIOSVersion: c.readSysfsFile(filepath.Join(cardPath, "vbios_version")),
-			SysfsPath:    cardPath,
-		}
-
-		// 查找hwmon路径
-		hwmonDir := filepath.Join(cardPath, "hwmon")
-		if hwmonEntries, err := os.ReadDir(hwmonDir); err == nil && len(hwmonEntries) > 0 {
-			device.HwmonPath = filepath.Join(hwmonDir, hwmonEntries[0].Name())
-		}
-
-		c.devices = append(c.devices, device)
-		logrus.Infof("Discovered Hygon DCU: card%d, serial=%s", cardID, device.SerialNumber)
-	}
-}
-
 // readSysfsFile 读取sysfs文件内容
 func (c *HygonSysfsCollector) readSysfsFile(path string) string {
 	data, err := os.ReadFile(path)
@@ -204,88 +215,48 @@ func (c *HygonSysfsCollector) Describe(ch chan<- *prometheus.Desc) {
 	c.memUsage.Describe(ch)
 	c.fanSpeed.Describe(ch)
 	c.deviceInfo.Describe(ch)
+	c.powerWindow.Describe(ch)
+	c.busyWindow.Describe(ch)
+	c.collectDuration.Describe(ch)
+	c.lastSample.Describe(ch)
+	c.subsampleDuration.Describe(ch)
 }
 
 // Collect 实现prometheus.Collector接口
+// 后台采样模式下直接输出最近的快照，不做sysfs I/O
 func (c *HygonSysfsCollector) Collect(ch chan<- prometheus.Metric) {
-	hostname, _ := os.Hostname()
-	if hostname == "" {
-		hostname = "localhost"
-	}
-
-	for _, device := range c.devices {
-		labels := []string{
-			fmt.Sprintf("%d", device.CardID),
-			device.UniqueID,
-			fmt.Sprintf("hygon%d", device.CardID),
-			device.SerialNumber,
-			hostname,
-		}
-
-		// DCU使用率
-		dcuUsage := c.readSysfsFloat(filepath.Join(device.SysfsPath, "gpu_busy_percent"))
-		c.dcuUsage.WithLabelValues(labels...).Set(dcuUsage)
-
-		// 内存使用率
-		memUsage := c.readSysfsFloat(filepath.Join(device.SysfsPath, "mem_busy_percent"))
-		c.memUsage.WithLabelValues(labels...).Set(memUsage)
-
-		// VRAM信息
-		vramTotal := c.readSysfsFloat(filepath.Join(device.SysfsPath, "mem_info_vram_total"))
-		vramUsed := c.readSysfsFloat(filepath.Join(device.SysfsPath, "mem_info_vram_used"))
-		c.vramTotal.WithLabelValues(labels...).Set(vramTotal)
-		c.vramUsage.WithLabelValues(labels...).Set(vramUsed)
-
-		// 功耗信息（从chip_power_average，单位是mW）
-		chipPower := c.readSysfsFloat(filepath.Join(device.SysfsPath, "chip_power_average"))
-		c.avgPower.WithLabelValues(labels...).Set(chipPower / 1000) // 转换为W
-
-		// hwmon信息
-		if device.HwmonPath != "" {
-			// 温度信息
-			tempSensors := []string{"temp1_input", "temp2_input", "temp3_input"}
-			tempLabels := []string{"edge", "junction", "memory"}
-
-			for i, tempFile := range tempSensors {
-				tempPath := filepath.Join(device.HwmonPath, tempFile)
-				if temp := c.readSysfsFloat(tempPath); temp > 0 {
-					tempLabelsWithSensor := append(labels, tempLabels[i])
-					c.temperature.WithLabelValues(tempLabelsWithSensor...).Set(temp / 1000) // 转换为摄氏度
-				}
-			}
-
-			// 功耗上限（微瓦转瓦特）
-			powerCap := c.readSysfsFloat(filepath.Join(device.HwmonPath, "power1_cap"))
-			if powerCap > 0 {
-				c.powerCap.WithLabelValues(labels...).Set(powerCap / 1000000)
-			}
-
-			// 风扇转速
-			fanSpeed := c.readSysfsFloat(filepath.Join(device.HwmonPath, "fan1_input"))
-			c.fanSpeed.WithLabelValues(labels...).Set(fanSpeed)
-		}
-
-		// 设备信息
-		deviceInfoLabels := append(labels, device.VBIOSVersion)
-		c.deviceInfo.WithLabelValues(deviceInfoLabels...).Set(1.0)
+	if c.sampleInterval <= 0 {
+		c.sample()
 	}
 
 	// 收集所有指标
-	c.temperature.Collect(ch)
-	c.avgPower.Collect(ch)
-	c.powerCap.Collect(ch)
-	c.vramUsage.Collect(ch)
-	c.vramTotal.Collect(ch)
-	c.dcuUsage.Collect(ch)
-	c.memUsage.Collect(ch)
-	c.fanSpeed.Collect(ch)
-	c.deviceInfo.Collect(ch)
+	c.serve(func() {
+		c.temperature.Collect(ch)
+		c.avgPower.Collect(ch)
+		c.powerCap.Collect(ch)
+		c.vramUsage.Collect(ch)
+		c.vramTotal.Collect(ch)
+		c.dcuUsage.Collect(ch)
+		c.memUsage.Collect(ch)
+		c.fanSpeed.Collect(ch)
+		c.deviceInfo.Collect(ch)
+		c.powerWindow.Collect(ch)
+		c.busyWindow.Collect(ch)
+		c.collectDuration.Collect(ch)
+		c.lastSample.Collect(ch)
+		c.subsampleDuration.Collect(ch)
+	})
 }
 
 func main() {
 	var (
-		listenAddress = flag.String("web.listen-address", ":9400", "Address to listen on for web interface and telemetry.")
-		showVersion   = flag.Bool("version", false, "Show version information and exit.")
+		listenAddress  = flag.String("web.listen-address", ":9400", "Address to listen on for web interface and telemetry.")
+		showVersion    = flag.Bool("version", false, "Show version information and exit.")
+		sysfsPath      = flag.String("path.sysfs", "/sys", "Sysfs mount point (point at a fixture tree for testing without DCUs).")
+		sampleEvery    = flag.Duration("collector.sample-interval", 0, "Read devices in the background at this interval and serve the last complete snapshot (0 reads on every scrape).")
+		subsampleEvery = flag.Duration("collector.subsample-interval", 0, "Poll chip_power_average and gpu_busy_percent at this interval (e.g. 100ms) and export min/max/mean/p95 over -collector.subsample-window (0 disables).")
+		subsampleSpan  = flag.Duration("collector.subsample-window", 30*time.Second, "Time span summarized by the sub-sampling window; keep it at least as long as the scrape interval.")
+		rediscover     = flag.Duration("collector.rediscover-interval", 0, "Rescan /sys/class/drm at this interval (e.g. 30s) to pick up added, removed or reset devices and drop series of removed ones (0 discovers devices only at startup).")
 	)
 	flag.Parse()
 
@@ -299,7 +270,18 @@ func main() {
 	}
 
 	// 创建海光卡收集器
-	collector := NewHygonSysfsCollector()
+	collector := NewHygonSysfsCollector(*sysfsPath)
+	if *sampleEvery > 0 {
+		collector.StartSampler(*sampleEvery, make(chan struct{}))
+		logrus.Infof("Background sampling every %s", *sampleEvery)
+	}
+	if *subsampleEvery > 0 {
+		collector.StartSubsampler(*subsampleEvery, *subsampleSpan, make(chan struct{}))
+		logrus.Infof("Sub-sampling power and utilization every %s over %s", *subsampleEvery, *subsampleSpan)
+	}
+	if *rediscover > 0 {
+		collector.StartRediscovery(*rediscover, make(chan struct{}))
+	}
 
 	// 注册收集器
 	prometheus.MustRegister(collector)
@@ -314,7 +296,7 @@ func main() {
 <body>
 <h1>Hygon DCU Sysfs Exporter</h1>
 <p><a href="/metrics">Metrics</a></p>
-<p>Discovered devices: ` + fmt.Sprintf("%d", len(collector.devices)) + `</p>
+<p>Discovered devices: ` + fmt.Sprintf("%d", collector.deviceCount()) + `</p>
 <hr>
 <p>Version: ` + Version + `</p>
 <p>Build Time: ` + BuildTime + `</p>
@@ -325,7 +307,7 @@ func main() {
 
 	// 启动HTTP服务器
 	logrus.Infof("Starting Hygon DCU Sysfs Exporter on %s", *listenAddress)
-	logrus.Infof("Discovered %d Hygon DCU devices", len(collector.devices))
+	logrus.Infof("Discovered %d Hygon DCU devices", collector.deviceCount())
 
 	server := &http.Server{
 		Addr:         *listenAddress,
@@ -0,0 +1,395 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Prometheus文本格式流式解析器
+供test_exporter.py、debug_metrics_comparison.py等工具共用
+"""
+
+import argparse
+import re
+import sys
+import time
+from typing import Dict, Iterable, Iterator, List, NamedTuple, Optional, Tuple, Union
+
+# histogram/summary 样本名后缀，用于把样本归并到所属指标族
+FAMILY_SUFFIXES = ('_bucket', '_sum', '_count', '_total', '_created')
+
+# 标识设备的标签，按优先级排列（sysfs exporter用gpu，hy-smi采集器用device）
+DEVICE_LABELS = ('gpu', 'device_id', 'device')
+
+# MetricSnapshot 默认建立反向索引的标签
+INDEX_LABELS = ('gpu', 'device_id', 'device', 'serial', 'uuid')
+
+
+class Sample(NamedTuple):
+    """单个样本（元组实现，内存紧凑）"""
+    name: str
+    labels: Tuple[Tuple[str, str], ...]
+    value: float
+    timestamp: Optional[int] = None
+
+    def label(self, key, default=''):
+        """获取标签值"""
+        for name, value in self.labels:
+            if name == key:
+                return value
+        return default
+
+    def labels_dict(self):
+        """标签转换为字典"""
+        return dict(self.labels)
+
+    def series(self):
+        """格式化为 name{k="v",...} 形式"""
+        if not self.labels:
+            return self.name
+        pairs = ','.join(f'{k}="{escape_label_value(v)}"' for k, v in self.labels)
+        return f'{self.name}{{{pairs}}}'
+
+
+class MetricFamily(NamedTuple):
+    """指标族元数据（# TYPE / # HELP）"""
+    name: str
+    type: str = 'untyped'
+    help: str = ''
+
+
+def escape_label_value(value):
+    """按exposition格式转义标签值"""
+    return value.replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def family_name(sample_name, families):
+    """根据已知的指标族元数据，返回样本所属的指标族名"""
+    if sample_name in families:
+        return sample_name
+    for suffix in FAMILY_SUFFIXES:
+        if sample_name.endswith(suffix):
+            base = sample_name[:-len(suffix)]
+            if base in families:
+                return base
+    return sample_name
+
+
+_ESCAPES = {'n': '\n', '\\': '\\', '"': '"'}
+_ESCAPE_RE = re.compile(r'\\(.)')
+_HELP_ESCAPE_RE = re.compile(r'\\([n\\])')
+
+# 标签块缓存容量：分新旧两代，新一代写满一半时整体降为旧一代，
+# 旧一代中再次命中的条目提升回新一代，高基数抓取时常用的标签块不会被整体清掉
+LABEL_CACHE_SIZE = 65536
+
+# 样本行：名称、可选的标签块、值、可选的时间戳
+# 引号内外都用展开循环的写法（[^"\\]*(?:\\.[^"\\]*)*），避免逐字符走分支
+_SAMPLE_RE = re.compile(
+    r'([a-zA-Z_:][a-zA-Z0-9_:]*)\s*'
+    r'(?:\{([^"}]*(?:"[^"\\]*(?:\\.[^"\\]*)*"[^"}]*)*)\})?'
+    r'\s+(\S+)(?:\s+(-?\d+))?\s*$'
+)
+_LABEL_RE = re.compile(r'\s*([a-zA-Z_][a-zA-Z0-9_]*)\s*=\s*"([^"\\]*(?:\\.[^"\\]*)*)"\s*,?')
+_NAME_RE = re.compile(r'[a-zA-Z_:][a-zA-Z0-9_:]*')
+
+
+def _unescape(text, pattern=_ESCAPE_RE):
+    """反转义标签值（\\\\、\\n、\\\"）或HELP文本（\\\\、\\n）"""
+    if '\\' not in text:
+        return text
+    return pattern.sub(lambda m: _ESCAPES.get(m.group(1), m.group(0)), text)
+
+
+class ExpositionParser:
+    """
+    流式解析Prometheus文本格式
+    逐行处理，不保留原始文本；指标名和标签名经过intern，
+    相同的标签块（同一设备在各指标族中的标签）解析一次后复用同一元组
+    """
+
+    def __init__(self):
+        self.families: Dict[str, MetricFamily] = {}
+        self.errors = 0
+        self._labels_young: Dict[str, Tuple[Tuple[str, str], ...]] = {}
+        self._labels_old: Dict[str, Tuple[Tuple[str, str], ...]] = {}
+
+    def family_name(self, sample_name):
+        """返回样本所属的指标族名"""
+        return family_name(sample_name, self.families)
+
+    def parse(self, lines: Iterable[Union[str, bytes]]) -> Iterator[Sample]:
+        """解析行迭代器，逐个产出样本；格式错误的行计入errors并跳过"""
+        for line in lines:
+            if isinstance(line, bytes):
+                line = line.decode('utf-8', 'replace')
+            line = line.strip()
+            if not line:
+                continue
+            if line[0] == '#':
+                self._parse_comment(line)
+                continue
+            try:
+                yield self._parse_sample(line)
+            except (ValueError, IndexError):
+                self.errors += 1
+
+    def _parse_comment(self, line):
+        parts = line.split(None, 3)
+        if len(parts) < 3 or parts[1] not in ('TYPE', 'HELP'):
+            return
+        name = sys.intern(parts[2])
+        family = self.families.get(name) or MetricFamily(name)
+        text = parts[3] if len(parts) > 3 else ''
+        if parts[1] == 'TYPE':
+            family = family._replace(type=sys.intern(text.strip() or 'untyped'))
+        else:
+            family = family._replace(help=_unescape(text, _HELP_ESCAPE_RE))
+        self.families[name] = family
+
+    def _parse_sample(self, line):
+        if '{' not in line:
+            # 无标签的行直接按空白拆分，不走整行正则
+            parts = line.split()
+            if len(parts) not in (2, 3) or not _NAME_RE.fullmatch(parts[0]):
+                raise ValueError(line)
+            return Sample(sys.intern(parts[0]), (), float(parts[1]),
+                          int(parts[2]) if len(parts) == 3 else None)
+        match = _SAMPLE_RE.match(line)
+        if match is None:
+            raise ValueError(line)
+        name, label_block, value, timestamp = match.groups()
+        labels = self._labels(label_block) if label_block else ()
+        return Sample(sys.intern(name), labels, float(value),
+                      int(timestamp) if timestamp else None)
+
+    def _labels(self, block):
+        """解析标签块；相同的标签块复用同一元组"""
+        labels = self._labels_young.get(block)
+        if labels is not None:
+            return labels
+        labels = self._labels_old.pop(block, None)
+        if labels is None:
+            labels = tuple((sys.intern(key), _unescape(raw)) for key, raw in _LABEL_RE.findall(block))
+        if len(self._labels_young) >= LABEL_CACHE_SIZE // 2:
+            self._labels_old = self._labels_young
+            self._labels_young = {}
+        self._labels_young[block] = labels
+        return labels
+
+
+def parse_text(text):
+    """解析完整文本（兼容旧接口，返回样本列表）"""
+    return list(ExpositionParser().parse(text.splitlines()))
+
+
+def stream_samples(url, session=None, timeout=10, parser=None):
+    """
+    以流方式获取并解析/metrics，逐个产出样本
+    HTTP错误以requests异常形式抛出
+    """
+    import requests
+
+    http = session or requests
+    parser = parser or ExpositionParser()
+    with http.get(url, timeout=timeout, stream=True) as response:
+        response.raise_for_status()
+        yield from parser.parse(response.iter_lines(chunk_size=65536))
+
+
+def _device_sort_key(device_id):
+    return (0, int(device_id), '') if device_id.isdigit() else (1, 0, device_id)
+
+
+class MetricSnapshot:
+    """
+    一次抓取的指标快照
+    构建时按指标族、标签值和设备建立索引，检查逻辑只需字典查找
+    """
+
+    def __init__(self, samples, families=None, timestamp=None, latency=None,
+                 index_labels=INDEX_LABELS):
+        self.samples: List[Sample] = list(samples)
+        self.families: Dict[str, MetricFamily] = families or {}
+        self.timestamp = timestamp if timestamp is not None else time.time()
+        self.latency = latency
+
+        self.by_family: Dict[str, List[Sample]] = {}
+        self.by_label: Dict[str, Dict[str, List[Sample]]] = {key: {} for key in index_labels}
+        self.by_device: Dict[str, Dict[str, List[Sample]]] = {}
+
+        for sample in self.samples:
+            family = family_name(sample.name, self.families)
+            self.by_family.setdefault(family, []).append(sample)
+
+            for key, value in sample.labels:
+                index = self.by_label.get(key)
+                if index is not None:
+                    index.setdefault(value, []).append(sample)
+
+            device_id = None
+            for key in DEVICE_LABELS:
+                device_id = sample.label(key, None)
+                if device_id is not None:
+                    break
+            if device_id is not None:
+                self.by_device.setdefault(device_id, {}).setdefault(family, []).append(sample)
+
+    @classmethod
+    def from_lines(cls, lines, **kwargs):
+        """从行迭代器构建快照"""
+        parser = ExpositionParser()
+        samples = list(parser.parse(lines))
+        return cls(samples, families=parser.families, **kwargs)
+
+    @classmethod
+    def from_url(cls, url, session=None, timeout=10):
+        """抓取一次/metrics并构建快照，记录抓取耗时"""
+        parser = ExpositionParser()
+        timestamp = time.time()
+        start = time.perf_counter()
+        samples = list(stream_samples(url, session=session, timeout=timeout, parser=parser))
+        latency = time.perf_counter() - start
+        return cls(samples, families=parser.families, timestamp=timestamp, latency=latency)
+
+    def __len__(self):
+        return len(self.samples)
+
+    def has_family(self, name):
+        return name in self.by_family
+
+    def family(self, name):
+        """返回指标族的全部样本"""
+        return self.by_family.get(name, [])
+
+    def with_label(self, key, value):
+        """按已索引的标签值查找样本"""
+        return self.by_label.get(key, {}).get(value, [])
+
+    def device_ids(self):
+        """返回全部设备编号（数字优先按数值排序）"""
+        return sorted(self.by_device, key=_device_sort_key)
+
+    def device(self, device_id):
+        """返回单个设备的 {指标族: 样本列表}"""
+        return self.by_device.get(device_id, {})
+
+    def find(self, name, **labels):
+        """按指标族和标签过滤样本；优先使用标签索引缩小候选集"""
+        candidates = None
+        for key, value in labels.items():
+            if key in self.by_label:
+                candidates = self.by_label[key].get(value, [])
+                break
+        if candidates is None:
+            candidates = self.family(name)
+            return [s for s in candidates if all(s.label(k) == v for k, v in labels.items())]
+        return [s for s in candidates
+                if family_name(s.name, self.families) == name and all(s.label(k) == v for k, v in labels.items())]
+
+    def value(self, name, default=None, **labels):
+        """返回第一个匹配样本的值"""
+        matches = self.find(name, **labels)
+        return matches[0].value if matches else default
+
+
+def synthetic_exposition(series=100000, devices=8):
+    """生成合成的exposition行（用于基准测试）"""
+    families = [
+        ('hygon_temperature_celsius', 'DCU temperature in Celsius.'),
+        ('hygon_power_watts', 'Average power consumption in Watts.'),
+        ('hygon_dcu_utilization_percent', 'DCU utilization percentage.'),
+        ('hygon_vram_usage_bytes', 'VRAM usage in bytes.'),
+    ]
+    per_family = max(1, series // len(families))
+    for name, help_text in families:
+        yield f'# HELP {name} {help_text}'
+        yield f'# TYPE {name} gauge'
+        for i in range(per_family):
+            gpu = i % devices
+            yield (f'{name}{{gpu="{gpu}",uuid="uuid-{i}",device="hygon{gpu}",'
+                   f'serial="SN,{i:08d}",hostname="node-01",'
+                   f'sensor="edge \\"{i % 3}\\""}} {i * 0.5}')
+
+
+def _naive_parse(lines):
+    """旧实现：按逗号拆分标签（仅用于基准对比）"""
+    metrics = {}
+    for line in lines:
+        if line.startswith('#') or not line.strip():
+            continue
+        parts = line.split()
+        if len(parts) >= 2:
+            metric_part = parts[0]
+            labels = {}
+            if '{' in metric_part:
+                name = metric_part.split('{')[0]
+                for pair in metric_part.split('{')[1].split('}')[0].split(','):
+                    if '=' in pair:
+                        key, val = pair.split('=', 1)
+                        labels[key.strip()] = val.strip('"')
+            else:
+                name = metric_part
+            metrics.setdefault(name, []).append({'labels': labels, 'value': parts[1]})
+    return metrics
+
+
+def benchmark(series=100000, repeat=3):
+    """解析器微基准测试：耗时与峰值内存"""
+    import tracemalloc
+
+    lines = list(synthetic_exposition(series))
+    payload = sum(len(line) + 1 for line in lines)
+    print(f"合成数据: {series} 个序列, {len(lines)} 行, {payload / 1024 / 1024:.1f} MiB")
+
+    cases = (
+        ("流式解析器", lambda: sum(1 for _ in ExpositionParser().parse(lines))),
+        ("旧版split解析", lambda: _naive_parse(lines)),
+    )
+    results = []
+    for title, func in cases:
+        best = None
+        for _ in range(repeat):
+            start = time.perf_counter()
+            func()
+            elapsed = time.perf_counter() - start
+            best = elapsed if best is None else min(best, elapsed)
+
+        tracemalloc.start()
+        func()
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        results.append((best, peak))
+        print(f"  {title}: 最佳 {best * 1000:.1f} ms, {len(lines) / best:,.0f} 行/秒, "
+              f"峰值内存 {peak / 1024 / 1024:.1f} MiB")
+
+    # 耗时和内存一起报告：旧版按逗号拆分，遇到带逗号或转义引号的标签值会解析错，不是等价实现
+    (stream_time, stream_peak), (naive_time, naive_peak) = results
+    print(f"  流式解析器相对旧版: 耗时 {stream_time / naive_time:.2f}x, "
+          f"峰值内存 {stream_peak / naive_peak:.2f}x")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Prometheus文本格式解析器")
+    parser.add_argument("--bench", action="store_true", help="运行微基准测试")
+    parser.add_argument("--series", type=int, default=100000, help="合成序列数")
+    parser.add_argument("--repeat", type=int, default=3, help="重复次数")
+    parser.add_argument("--url", help="解析指定URL并输出指标族统计")
+
+    args = parser.parse_args()
+
+    if args.bench:
+        benchmark(args.series, args.repeat)
+    elif args.url:
+        counts = {}
+        exposition = ExpositionParser()
+        for sample in stream_samples(args.url, parser=exposition):
+            family = exposition.family_name(sample.name)
+            counts[family] = counts.get(family, 0) + 1
+        for family, count in sorted(counts.items()):
+            meta = exposition.families.get(family, MetricFamily(family))
+            print(f"{family} ({meta.type}): {count}")
+        if exposition.errors:
+            print(f"解析失败行数: {exposition.errors}")
+    else:
+        parser.print_help()
+
+
+if __name__ == "__main__":
+    main()
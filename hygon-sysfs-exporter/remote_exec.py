@@ -0,0 +1,207 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+远程命令执行
+通过OpenSSH ControlMaster为每台主机复用一条SSH连接；
+LocalTransport以本机子进程代替SSH，供测试和演练使用
+"""
+
+import os
+import shlex
+import shutil
+import subprocess
+import tempfile
+import threading
+import time
+from typing import List, NamedTuple, Union
+
+Command = Union[str, List[str]]
+
+
+class CommandResult(NamedTuple):
+    """命令执行结果"""
+    host: str
+    returncode: int
+    stdout: str
+    stderr: str
+    elapsed: float
+
+    @property
+    def ok(self):
+        return self.returncode == 0
+
+
+class RemoteCommandError(RuntimeError):
+    """远程命令返回非0"""
+
+    def __init__(self, result):
+        self.result = result
+        detail = result.stderr.strip() or result.stdout.strip()
+        super().__init__(f"{result.host}: 命令失败 (退出码 {result.returncode}): {detail}")
+
+
+def load_hosts(hosts=None, hosts_file=None):
+    """从逗号分隔列表和/或文件(每行一个，#为注释)加载主机，去重并保持顺序"""
+    raw = []
+    if hosts:
+        raw.extend(hosts.split(','))
+    if hosts_file:
+        with open(hosts_file, 'r', encoding='utf-8') as f:
+            for line in f:
+                raw.append(line.split('#', 1)[0])
+
+    seen = set()
+    result = []
+    for host in raw:
+        host = host.strip()
+        if host and host not in seen:
+            seen.add(host)
+            result.append(host)
+    return result
+
+
+def _as_shell(command):
+    return command if isinstance(command, str) else ' '.join(shlex.quote(arg) for arg in command)
+
+
+class SSHTransport:
+    """
+    SSH传输：同一主机的所有命令和文件传输共用一个ControlMaster连接，
+    首次使用时建立，ControlPersist到期或close()时关闭
+    未指定control_dir时在首次使用时创建临时目录，close_all()时删除
+    """
+
+    def __init__(self, user='root', control_dir=None, persist='120s', connect_timeout=10,
+                 options=None):
+        self.user = user
+        self._control_dir = control_dir
+        self._owns_control_dir = control_dir is None
+        self.persist = persist
+        self.connect_timeout = connect_timeout
+        self.options = list(options or [])
+        self._hosts = set()
+        self._lock = threading.Lock()
+
+    @property
+    def control_dir(self):
+        """ControlMaster套接字目录；多个部署线程同时首次访问时也只创建一个"""
+        with self._lock:
+            if self._control_dir is None:
+                self._control_dir = tempfile.mkdtemp(prefix='hygon-ssh-')
+            return self._control_dir
+
+    def destination(self, host):
+        return f"{self.user}@{host}" if self.user and '@' not in host else host
+
+    def _control_options(self):
+        return [
+            '-o', 'ControlMaster=auto',
+            '-o', f"ControlPath={os.path.join(self.control_dir, '%C')}",
+            '-o', f'ControlPersist={self.persist}',
+            '-o', f'ConnectTimeout={self.connect_timeout}',
+            '-o', 'BatchMode=yes',
+        ] + self.options
+
+    def run(self, host, command: Command, input=None, timeout=None):
+        """在远程主机执行命令（字符串按shell解释，列表逐个转义）"""
+        self._hosts.add(host)
+        argv = ['ssh'] + self._control_options() + [self.destination(host), _as_shell(command)]
+        return _run(host, argv, input, timeout)
+
+    def copy(self, host, local_paths, remote_dir, compress=False, timeout=None):
+        """通过复用的连接把本地文件复制到远程目录"""
+        self._hosts.add(host)
+        argv = ['scp', '-q'] + (['-C'] if compress else []) + self._control_options()
+        argv += [str(path) for path in local_paths]
+        argv.append(f"{self.destination(host)}:{remote_dir}")
+        return _run(host, argv, None, timeout)
+
+    def sync(self, host, local_paths, remote_dir, compress=True, timeout=None):
+        """
+        可续传的文件传输：rsync --partial 保留中断的部分文件，下次从断点继续；
+        本机或远程没有rsync时退回scp
+        """
+        if shutil.which('rsync'):
+            self._hosts.add(host)
+            ssh = ' '.join(shlex.quote(arg) for arg in ['ssh'] + self._control_options())
+            argv = ['rsync', '--partial', '--times', '-e', ssh] + (['-z'] if compress else [])
+            argv += [str(path) for path in local_paths]
+            argv.append(f"{self.destination(host)}:{remote_dir}")
+            result = _run(host, argv, None, timeout)
+            # 12/127: 远程缺少rsync
+            if result.returncode not in (12, 127):
+                return result
+        return self.copy(host, local_paths, remote_dir, compress=compress, timeout=timeout)
+
+    def close(self, host):
+        """关闭主机的ControlMaster连接"""
+        argv = ['ssh'] + self._control_options() + ['-O', 'exit', self.destination(host)]
+        subprocess.run(argv, capture_output=True, text=True)
+        self._hosts.discard(host)
+
+    def close_all(self):
+        for host in list(self._hosts):
+            self.close(host)
+        # 只删除自己创建的临时目录，调用方传入的目录保留
+        with self._lock:
+            if self._owns_control_dir and self._control_dir is not None:
+                shutil.rmtree(self._control_dir, ignore_errors=True)
+                self._control_dir = None
+
+
+class LocalTransport:
+    """
+    本机传输：命令在本机执行，REMOTE_HOST环境变量为目标主机名，
+    copy把文件复制到 root/<host>/<远程目录> 下，便于在无SSH环境中模拟多台主机
+    """
+
+    def __init__(self, root=None, env=None):
+        self.root = root
+        self.env = dict(env or {})
+
+    def _env(self, host):
+        env = os.environ.copy()
+        env.update(self.env)
+        env['REMOTE_HOST'] = host
+        if self.root:
+            env['REMOTE_ROOT'] = os.path.join(self.root, host)
+        return env
+
+    def run(self, host, command: Command, input=None, timeout=None):
+        argv = ['bash', '-c', _as_shell(command)]
+        return _run(host, argv, input, timeout, env=self._env(host))
+
+    def copy(self, host, local_paths, remote_dir, compress=False, timeout=None):
+        target = os.path.join(self.root or tempfile.gettempdir(), host, remote_dir.lstrip('/'))
+        os.makedirs(target, exist_ok=True)
+        argv = ['cp'] + [str(path) for path in local_paths] + [target]
+        return _run(host, argv, None, timeout)
+
+    def sync(self, host, local_paths, remote_dir, compress=True, timeout=None):
+        return self.copy(host, local_paths, remote_dir, compress=compress, timeout=timeout)
+
+    def close(self, host):
+        pass
+
+    def close_all(self):
+        pass
+
+
+def _run(host, argv, input, timeout, env=None):
+    start = time.perf_counter()
+    try:
+        proc = subprocess.run(argv, input=input, capture_output=True, text=True,
+                              timeout=timeout, env=env)
+        returncode, stdout, stderr = proc.returncode, proc.stdout, proc.stderr
+    except subprocess.TimeoutExpired as e:
+        returncode = 124
+        stdout = e.stdout if isinstance(e.stdout, str) else ''
+        stderr = f"超时 ({timeout}s)"
+    return CommandResult(host, returncode, stdout, stderr, time.perf_counter() - start)
+
+
+def make_transport(kind='ssh', user='root', **kwargs):
+    """按名称创建传输：ssh 或 local"""
+    if kind == 'local':
+        return LocalTransport(**kwargs)
+    return SSHTransport(user=user, **kwargs)
@@ -0,0 +1,95 @@
+package main
+
+import (
+	"sync"
+	"time"
+)
+
+// snapshot 一轮完整采集的结果
+type snapshot struct {
+	samples  []deviceSample
+	taken    time.Time
+	duration time.Duration
+}
+
+// snapshotBuffer 双缓冲快照：采样方写后台缓冲，写完后交换；
+// 读取方在读锁内使用前台缓冲，交换需要写锁，因此被换到后台的缓冲不会再有读取方
+type snapshotBuffer struct {
+	mu    sync.RWMutex
+	bufs  [2]snapshot
+	front int
+}
+
+// back 返回后台缓冲，只能由持有采样锁的一方写入
+func (b *snapshotBuffer) back() *snapshot {
+	return &b.bufs[1-b.front]
+}
+
+// swap 发布后台缓冲
+func (b *snapshotBuffer) swap() {
+	b.mu.Lock()
+	b.front = 1 - b.front
+	b.mu.Unlock()
+}
+
+// invalidate 在写锁内执行fn并清空两个缓冲，用于设备列表变化时丢弃引用旧设备的读数
+func (b *snapshotBuffer) invalidate(fn func()) {
+	b.mu.Lock()
+	defer b.mu.Unlock()
+	fn()
+	for i := range b.bufs {
+		b.bufs[i].samples = b.bufs[i].samples[:0]
+	}
+}
+
+// sample 读取所有设备并发布为新快照
+func (c *HygonSysfsCollector) sample() {
+	c.sampleMu.Lock()
+	defer c.sampleMu.Unlock()
+	c.sampleLocked()
+}
+
+// sampleLocked 同sample，调用方需持有sampleMu
+func (c *HygonSysfsCollector) sampleLocked() {
+	start := time.Now()
+	back := c.snapshots.back()
+	back.samples = c.readDevices(back.samples)
+	back.taken = time.Now()
+	back.duration = back.taken.Sub(start)
+	c.snapshots.swap()
+}
+
+// serve 把前台快照写入指标并输出
+func (c *HygonSysfsCollector) serve(collect func()) {
+	c.snapshots.mu.RLock()
+	defer c.snapshots.mu.RUnlock()
+
+	front := &c.snapshots.bufs[c.snapshots.front]
+	for i := range front.samples {
+		c.applySample(&front.samples[i])
+	}
+	c.collectDuration.Set(front.duration.Seconds())
+	if !front.taken.IsZero() {
+		c.lastSample.Set(float64(front.taken.UnixNano()) / 1e9)
+	}
+	collect()
+}
+
+// StartSampler 启动后台采样：立即采集一次，之后每interval采集一次，/metrics只输出最近的完整快照；
+// 关闭stop结束采样
+func (c *HygonSysfsCollector) StartSampler(interval time.Duration, stop <-chan struct{}) {
+	c.sampleInterval = interval
+	c.sample()
+	go func() {
+		ticker := time.NewTicker(interval)
+		defer ticker.Stop()
+		for {
+			select {
+			case <-ticker.C:
+				c.sample()
+			case <-stop:
+				return
+			}
+		}
+	}()
+}
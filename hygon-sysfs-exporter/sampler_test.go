@@ -0,0 +1,84 @@
+package main
+
+import (
+	"os"
+	"path/filepath"
+	"sync"
+	"testing"
+	"time"
+
+	"github.com/prometheus/client_golang/prometheus"
+)
+
+// TestConcurrentSampleCollectRediscover 后台采样、子采样、重新发现和抓取并发运行，期间反复移除、恢复一张卡；
+// 配合 go test -race 检查锁顺序 sampleMu → snapshots.mu → d.mu 下的快照交换和设备替换
+//
+//	go test -race -run Concurrent .
+func TestConcurrentSampleCollectRediscover(t *testing.T) {
+	const cards = 8
+	root := writeFakeSysfs(t, cards)
+	c := NewHygonSysfsCollector(root)
+	stop := make(chan struct{})
+	c.StartSampler(time.Millisecond, stop)
+	c.StartRediscovery(time.Millisecond, stop)
+	c.StartSubsampler(time.Millisecond, 50*time.Millisecond, stop)
+
+	card := filepath.Join(root, "class", "drm", "card3")
+	parked := filepath.Join(root, "class", "drm", "removed-card3") // 不以card开头，不会被当作设备
+	var wg sync.WaitGroup
+	wg.Add(1)
+	go func() {
+		defer wg.Done()
+		for i := 0; i < 50; i++ {
+			if err := os.Rename(card, parked); err != nil {
+				t.Error(err)
+				return
+			}
+			time.Sleep(2 * time.Millisecond)
+			if err := os.Rename(parked, card); err != nil {
+				t.Error(err)
+				return
+			}
+			time.Sleep(2 * time.Millisecond)
+		}
+	}()
+	for w := 0; w < 4; w++ {
+		wg.Add(1)
+		go func() {
+			defer wg.Done()
+			for i := 0; i < 100; i++ {
+				ch := make(chan prometheus.Metric, 4096)
+				c.Collect(ch)
+				close(ch)
+				for range ch {
+				}
+			}
+		}()
+	}
+	wg.Wait()
+	close(stop)
+
+	c.discoverDevices()
+	if n := c.deviceCount(); n != cards {
+		t.Fatalf("after rediscovery: %d devices, want %d", n, cards)
+	}
+}
+
+// TestReadClosedDevice 设备被移除关闭后，采样不会按路径重新打开属性文件
+func TestReadClosedDevice(t *testing.T) {
+	c := NewHygonSysfsCollector(writeFakeSysfs(t, 1))
+	d := c.devices[0]
+	d.close()
+
+	s := deviceSample{dcuUsage: 1}
+	d.read(&s)
+	if s.device != d || s.dcuUsage != 0 || s.power != 0 {
+		t.Errorf("closed device sample = %+v, want zero readings", s)
+	}
+	attrs := append([]*sysfsAttr{d.dcuBusy, d.memBusy, d.vramUsed, d.power, d.fan}, d.temps[:]...)
+	for _, attr := range attrs {
+		if attr != nil && attr.file != nil {
+			t.Errorf("%s reopened after the device was closed", attr.path)
+		}
+	}
+}
@@ -0,0 +1,165 @@
+package main
+
+import (
+	"math"
+	"sort"
+	"time"
+)
+
+// 子采样窗口输出的统计项，对应stat标签
+var windowStats = [...]string{"min", "max", "mean", "p95"}
+
+// maxWindowSize 每个窗口最多保留的读数个数
+const maxWindowSize = 3600
+
+// window 定长环形缓冲，保存最近len(values)次子采样读数
+// 统计值在有新读数后的第一次查询时才重新计算，多次抓取之间不重复排序
+type window struct {
+	values  []float64
+	next    int
+	count   int
+	dirty   bool
+	scratch []float64
+	stats   [len(windowStats)]float64
+}
+
+func newWindow(size int) *window {
+	return &window{values: make([]float64, size), scratch: make([]float64, 0, size)}
+}
+
+// add 写入一个读数，窗口满时覆盖最旧的读数
+func (w *window) add(v float64) {
+	w.values[w.next] = v
+	w.next = (w.next + 1) % len(w.values)
+	if w.count < len(w.values) {
+		w.count++
+	}
+	w.dirty = true
+}
+
+// summary 返回窗口内的min/max/mean/p95（p95取最近秩）；窗口为空时返回false
+func (w *window) summary() ([len(windowStats)]float64, bool) {
+	if w.count == 0 {
+		return w.stats, false
+	}
+	if w.dirty {
+		w.scratch = append(w.scratch[:0], w.values[:w.count]...)
+		sort.Float64s(w.scratch)
+		sum := 0.0
+		for _, v := range w.scratch {
+			sum += v
+		}
+		n := len(w.scratch)
+		w.stats = [len(windowStats)]float64{
+			w.scratch[0],
+			w.scratch[n-1],
+			sum / float64(n),
+			w.scratch[int(math.Ceil(0.95*float64(n)))-1],
+		}
+		w.dirty = false
+	}
+	return w.stats, true
+}
+
+// subsampleWindowSize 窗口时长对应的读数个数
+func subsampleWindowSize(interval, span time.Duration) int {
+	size := int(span / interval)
+	if size < 1 {
+		return 1
+	}
+	if size > maxWindowSize {
+		return maxWindowSize
+	}
+	return size
+}
+
+// attachWindows 为设备创建子采样窗口和统计子指标，调用方需持有d.mu
+func (c *HygonSysfsCollector) attachWindows(d *deviceState) {
+	d.powerWindow = newWindow(c.windowSize)
+	d.busyWindow = newWindow(c.windowSize)
+	for i, stat := range windowStats {
+		d.powerStats[i] = c.powerWindow.WithLabelValues(d.labelsWith(stat)...)
+		d.busyStats[i] = c.busyWindow.WithLabelValues(d.labelsWith(stat)...)
+	}
+}
+
+// subsample 读取设备的功耗和使用率写入窗口
+// 读取失败的读数直接丢弃：子采样频率高，逐次记录日志会刷屏，失败会在常规采样中报告
+func (d *deviceState) subsample() {
+	d.mu.Lock()
+	defer d.mu.Unlock()
+
+	if d.closed || d.powerWindow == nil {
+		return
+	}
+	if d.power != nil {
+		if val, err := d.power.read(); err == nil {
+			d.powerWindow.add(val / 1000) // mW转换为W
+		}
+	}
+	if d.dcuBusy != nil {
+		if val, err := d.dcuBusy.read(); err == nil {
+			d.busyWindow.add(val)
+		}
+	}
+}
+
+// applyWindows 把窗口统计写入设备的子指标
+func (c *HygonSysfsCollector) applyWindows(d *deviceState) {
+	d.mu.Lock()
+	defer d.mu.Unlock()
+
+	if d.powerWindow == nil {
+		return
+	}
+	if stats, ok := d.powerWindow.summary(); ok {
+		for i, val := range stats {
+			d.powerStats[i].Set(val)
+		}
+	}
+	if stats, ok := d.busyWindow.summary(); ok {
+		for i, val := range stats {
+			d.busyStats[i].Set(val)
+		}
+	}
+}
+
+// subsampleDevices 对所有设备做一次子采样，顺序读取：每台设备只有两次pread，开协程反而更贵
+func (c *HygonSysfsCollector) subsampleDevices(devices []*deviceState) {
+	start := time.Now()
+	for _, d := range devices {
+		d.subsample()
+	}
+	c.subsampleDuration.Set(time.Since(start).Seconds())
+}
+
+// enableSubsampling 为当前及之后发现的设备创建span时长的子采样窗口
+func (c *HygonSysfsCollector) enableSubsampling(interval, span time.Duration) {
+	c.sampleMu.Lock()
+	defer c.sampleMu.Unlock()
+
+	c.windowSize = subsampleWindowSize(interval, span)
+	for _, d := range c.devices {
+		d.mu.Lock()
+		c.attachWindows(d)
+		d.mu.Unlock()
+	}
+}
+
+// StartSubsampler 启动高频子采样：每interval读取一次各设备的chip_power_average和gpu_busy_percent，
+// 抓取时输出最近span内的min/max/mean/p95；关闭stop结束
+func (c *HygonSysfsCollector) StartSubsampler(interval, span time.Duration, stop <-chan struct{}) {
+	c.enableSubsampling(interval, span)
+	go func() {
+		ticker := time.NewTicker(interval)
+		defer ticker.Stop()
+		for {
+			select {
+			case <-ticker.C:
+				c.subsampleDevices(c.currentDevices())
+			case <-stop:
+				return
+			}
+		}
+	}()
+}
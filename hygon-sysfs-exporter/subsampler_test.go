@@ -0,0 +1,82 @@
+package main
+
+import (
+	"testing"
+	"time"
+)
+
+// TestWindowSummary 向4个读数的窗口依次写入已知读数，检查min/max/mean/p95，
+// 以及窗口写满后第5个读数恰好挤出最早的读数
+func TestWindowSummary(t *testing.T) {
+	w := newWindow(4)
+	if _, ok := w.summary(); ok {
+		t.Fatal("empty window reported a summary")
+	}
+
+	steps := []struct {
+		add  float64
+		want [len(windowStats)]float64 // min, max, mean, p95
+	}{
+		{add: 3, want: [...]float64{3, 3, 3, 3}},
+		{add: 1, want: [...]float64{1, 3, 2, 3}},
+		{add: 2, want: [...]float64{1, 3, 2, 3}},
+		{add: 6, want: [...]float64{1, 6, 3, 6}},       // 窗口已满，最早的3仍在窗口内
+		{add: 10, want: [...]float64{1, 10, 4.75, 10}}, // 3过期
+		{add: 0, want: [...]float64{0, 10, 4.5, 10}},   // 1过期
+		{add: 0, want: [...]float64{0, 10, 4, 10}},     // 2过期
+		{add: 0, want: [...]float64{0, 10, 2.5, 10}},   // 6过期
+		{add: 0, want: [...]float64{0, 0, 0, 0}},       // 10过期
+	}
+	for i, step := range steps {
+		w.add(step.add)
+		got, ok := w.summary()
+		if !ok || got != step.want {
+			t.Errorf("after sample %d (%g): summary = %v, want %v", i+1, step.add, got, step.want)
+		}
+		// 没有新读数时重复查询返回同一结果
+		if again, _ := w.summary(); again != got {
+			t.Errorf("after sample %d: repeated summary = %v, want %v", i+1, again, got)
+		}
+	}
+}
+
+// TestWindowP95 p95取最近秩：n个读数中第ceil(0.95n)小的值
+func TestWindowP95(t *testing.T) {
+	tests := []struct {
+		n    int
+		want float64
+	}{
+		{n: 1, want: 1},
+		{n: 19, want: 19},
+		{n: 20, want: 19},
+		{n: 21, want: 20},
+		{n: 100, want: 95},
+	}
+	for _, tt := range tests {
+		w := newWindow(tt.n)
+		// 倒序写入，检查统计不依赖写入顺序
+		for v := tt.n; v >= 1; v-- {
+			w.add(float64(v))
+		}
+		got, _ := w.summary()
+		if got[3] != tt.want {
+			t.Errorf("n=%d: p95 = %g, want %g", tt.n, got[3], tt.want)
+		}
+	}
+}
+
+func TestSubsampleWindowSize(t *testing.T) {
+	tests := []struct {
+		interval, span time.Duration
+		want           int
+	}{
+		{100 * time.Millisecond, 30 * time.Second, 300},
+		{time.Second, 500 * time.Millisecond, 1},
+		{time.Millisecond, time.Hour, maxWindowSize},
+	}
+	for _, tt := range tests {
+		if got := subsampleWindowSize(tt.interval, tt.span); got != tt.want {
+			t.Errorf("subsampleWindowSize(%s, %s) = %d, want %d", tt.interval, tt.span, got, tt.want)
+		}
+	}
+}
@@ -0,0 +1,389 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+sysfs回放夹具
+录制真实节点的 /sys/class/drm 设备树，或生成N张卡的合成设备树（数值可持续变化），
+exporter通过 -path.sysfs 指向该目录即可在无DCU的机器上运行；
+bench模式按卡数（如8/16/64）分别启动exporter并测量抓取延迟随卡数的增长
+"""
+
+import argparse
+import contextlib
+import json
+import os
+import random
+import shutil
+import signal
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+import requests
+
+from bench_exporter import ScrapeBenchmark
+from test_exporter import HygonExporterTester
+
+HYGON_VENDOR = '0x1e83'
+
+# 卡目录下的静态属性
+STATIC_DEVICE_FILES = ('vendor', 'device', 'serial_number', 'unique_id', 'product_name',
+                       'vbios_version', 'mem_info_vram_total')
+
+# 卡目录下随负载变化的属性
+DYNAMIC_DEVICE_FILES = ('gpu_busy_percent', 'mem_busy_percent', 'mem_info_vram_used', 'chip_power_average')
+
+# hwmon目录下的属性
+STATIC_HWMON_FILES = ('name', 'power1_cap')
+DYNAMIC_HWMON_FILES = ('temp1_input', 'temp2_input', 'temp3_input', 'fan1_input')
+
+# 动态值的取值范围（sysfs原始单位：功耗mW、温度m°C）
+VALUE_RANGES = {
+    'gpu_busy_percent': (0, 100),
+    'mem_busy_percent': (0, 100),
+    'chip_power_average': (30000, 300000),
+    'temp1_input': (30000, 95000),
+    'temp2_input': (30000, 105000),
+    'temp3_input': (30000, 95000),
+    'fan1_input': (0, 3000),
+}
+
+# 写入的值补齐到固定宽度：原地覆盖而不截断文件，读取方不会读到空文件
+VALUE_WIDTH = 24
+
+DEFAULT_EXPORTER = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'hygon-dcu-exporter')
+DEFAULT_SCENARIOS = '8,16,64'
+
+
+def drm_dir(root):
+    return os.path.join(root, 'class', 'drm')
+
+
+def _write_value(path, value):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write(str(value).ljust(VALUE_WIDTH) + '\n')
+
+
+def _read_value(path):
+    try:
+        with open(path, 'r', encoding='utf-8', errors='replace') as f:
+            return f.read().strip()
+    except OSError:
+        return None
+
+
+def iter_cards(root):
+    """设备树中的 (卡名, device目录)，按卡号排序"""
+    base = drm_dir(root)
+    try:
+        names = os.listdir(base)
+    except FileNotFoundError:
+        return []
+    cards = [name for name in names if name.startswith('card') and '-' not in name
+             and name[4:].isdigit() and os.path.isdir(os.path.join(base, name, 'device'))]
+    return [(name, os.path.join(base, name, 'device')) for name in sorted(cards, key=lambda n: int(n[4:]))]
+
+
+def hwmon_dir(device_dir):
+    hwmon = os.path.join(device_dir, 'hwmon')
+    try:
+        entries = sorted(os.listdir(hwmon))
+    except OSError:
+        return None
+    return os.path.join(hwmon, entries[0]) if entries else None
+
+
+def capture(dest, source='/sys'):
+    """录制source中所有海光卡的属性文件到dest，返回录制的卡数"""
+    count = 0
+    for name, device in iter_cards(source):
+        if _read_value(os.path.join(device, 'vendor')) != HYGON_VENDOR:
+            continue
+        target = os.path.join(drm_dir(dest), name, 'device')
+        for filename in STATIC_DEVICE_FILES + DYNAMIC_DEVICE_FILES:
+            value = _read_value(os.path.join(device, filename))
+            if value is not None:
+                _write_value(os.path.join(target, filename), value)
+        hwmon = hwmon_dir(device)
+        if hwmon:
+            hwmon_target = os.path.join(target, 'hwmon', os.path.basename(hwmon))
+            for filename in STATIC_HWMON_FILES + DYNAMIC_HWMON_FILES:
+                value = _read_value(os.path.join(hwmon, filename))
+                if value is not None:
+                    _write_value(os.path.join(hwmon_target, filename), value)
+        count += 1
+    return count
+
+
+def generate(dest, cards, seed=0, vram_gb=64, power_cap_w=300):
+    """生成cards张卡的合成设备树，另含连接器和renderD节点以贴近真实目录"""
+    rng = random.Random(seed)
+    base = drm_dir(dest)
+    for card in range(cards):
+        device = os.path.join(base, f'card{card}', 'device')
+        vram_total = vram_gb << 30
+        static = {
+            'vendor': HYGON_VENDOR,
+            'device': '0x54b7',
+            'serial_number': f'HG{seed:04d}{card:06d}',
+            'unique_id': f'{rng.getrandbits(64):016x}',
+            'product_name': 'Hygon DCU',
+            'vbios_version': '113-D1640200-100',
+            'mem_info_vram_total': vram_total,
+        }
+        for filename, value in static.items():
+            _write_value(os.path.join(device, filename), value)
+        for filename in DYNAMIC_DEVICE_FILES:
+            if filename == 'mem_info_vram_used':
+                value = rng.randint(0, vram_total)
+            else:
+                value = rng.randint(*VALUE_RANGES[filename])
+            _write_value(os.path.join(device, filename), value)
+
+        hwmon = os.path.join(device, 'hwmon', f'hwmon{card + 2}')
+        _write_value(os.path.join(hwmon, 'name'), 'amdgpu')
+        _write_value(os.path.join(hwmon, 'power1_cap'), power_cap_w * 1000000)
+        for filename in DYNAMIC_HWMON_FILES:
+            _write_value(os.path.join(hwmon, filename), rng.randint(*VALUE_RANGES[filename]))
+
+        os.makedirs(os.path.join(base, f'card{card}-DP-1'), exist_ok=True)
+        os.makedirs(os.path.join(base, f'renderD{128 + card}', 'device'), exist_ok=True)
+    return cards
+
+
+class Animator:
+    """按随机游走原地更新设备树中的动态值，偶尔产生突发，模拟负载变化"""
+
+    def __init__(self, root, seed=0, burst=0.05):
+        self.rng = random.Random(seed)
+        self.burst = burst
+        self.files = []
+        for _, device in iter_cards(root):
+            vram_total = _read_value(os.path.join(device, 'mem_info_vram_total'))
+            paths = [os.path.join(device, name) for name in DYNAMIC_DEVICE_FILES]
+            hwmon = hwmon_dir(device)
+            if hwmon:
+                paths += [os.path.join(hwmon, name) for name in DYNAMIC_HWMON_FILES]
+            for path in paths:
+                name = os.path.basename(path)
+                bounds = (0, int(vram_total or 0)) if name == 'mem_info_vram_used' else VALUE_RANGES.get(name)
+                value = _read_value(path)
+                if bounds and value is not None:
+                    fd = os.open(path, os.O_WRONLY)
+                    self.files.append([fd, bounds, float(value or 0)])
+        self.updates = 0
+
+    def step(self):
+        """更新所有动态值一次"""
+        for item in self.files:
+            fd, (low, high), value = item
+            if self.rng.random() < self.burst:
+                value = self.rng.uniform(low, high)
+            else:
+                value += self.rng.gauss(0, (high - low) * 0.05)
+            value = min(high, max(low, value))
+            item[2] = value
+            os.pwrite(fd, str(int(value)).ljust(VALUE_WIDTH).encode() + b'\n', 0)
+        self.updates += 1
+
+    def run(self, interval, stop):
+        while not stop.wait(interval):
+            self.step()
+
+    @contextlib.contextmanager
+    def running(self, interval):
+        """在后台线程中持续更新"""
+        stop = threading.Event()
+        thread = threading.Thread(target=self.run, args=(interval, stop), daemon=True)
+        thread.start()
+        try:
+            yield self
+        finally:
+            stop.set()
+            thread.join()
+
+    def close(self):
+        for fd, _, _ in self.files:
+            os.close(fd)
+        self.files = []
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+@contextlib.contextmanager
+def exporter_process(binary, sysfs_path, port=None, extra_args=(), ready_timeout=15, log_path=None):
+    """以sysfs_path为sysfs根启动exporter，/metrics可用后产出其URL，退出时停止进程"""
+    port = port or free_port()
+    url = f"http://127.0.0.1:{port}"
+    argv = [binary, f'-path.sysfs={sysfs_path}', f'-web.listen-address=127.0.0.1:{port}', *extra_args]
+    log = open(log_path or os.devnull, 'wb')
+    process = subprocess.Popen(argv, stdout=log, stderr=log)
+    try:
+        deadline = time.monotonic() + ready_timeout
+        while True:
+            if process.poll() is not None:
+                raise RuntimeError(f"exporter已退出 (退出码 {process.returncode})")
+            try:
+                if requests.get(f"{url}/metrics", timeout=1).status_code == 200:
+                    break
+            except requests.exceptions.RequestException:
+                pass
+            if time.monotonic() > deadline:
+                raise RuntimeError(f"exporter在 {ready_timeout}s 内未就绪")
+            time.sleep(0.05)
+        yield url
+    finally:
+        process.terminate()
+        try:
+            process.wait(timeout=5)
+        except subprocess.TimeoutExpired:
+            process.kill()
+            process.wait()
+        log.close()
+
+
+def run_scenario(binary, cards, concurrency=4, requests_total=200, warmup=5, animate=0.5,
+                 extra_args=(), seed=0):
+    """生成cards张卡的设备树并对exporter压测，返回bench_exporter格式的结果和发现的设备数"""
+    with tempfile.TemporaryDirectory(prefix=f'hygon-sysfs-{cards}-') as root:
+        generate(root, cards, seed)
+        animator = Animator(root, seed)
+        try:
+            with animator.running(animate) if animate else contextlib.nullcontext(), \
+                    exporter_process(binary, root, extra_args=extra_args,
+                                     log_path=os.path.join(root, 'exporter.log')) as url:
+                tester = HygonExporterTester(url)
+                devices, _ = tester.discover_devices(tester.fetch_metrics())
+                result = ScrapeBenchmark(url, concurrency, requests_total, warmup).run()
+        finally:
+            animator.close()
+    result.pop('_latencies', None)
+    result.update({'cards': cards, 'devices': devices, 'value_updates': animator.updates})
+    return result
+
+
+def _slope(points):
+    """最小二乘斜率"""
+    if len(points) < 2:
+        return None
+    n = len(points)
+    mean_x = sum(x for x, _ in points) / n
+    mean_y = sum(y for _, y in points) / n
+    var = sum((x - mean_x) ** 2 for x, _ in points)
+    return sum((x - mean_x) * (y - mean_y) for x, y in points) / var if var else None
+
+
+def print_scaling(results):
+    """输出各卡数下的抓取延迟，以及每增加一张卡的延迟增量"""
+    print("=== 抓取延迟随卡数变化 ===")
+    print(f"{'卡数':>6} {'发现':>6} {'序列数':>8} {'p50(ms)':>9} {'p95(ms)':>9} {'p99(ms)':>9} "
+          f"{'吞吐(req/s)':>12} {'p50/卡(µs)':>11}")
+    for item in results:
+        latency = item['latency']
+        print(f"{item['cards']:>6} {item['devices']:>6} {item['series']:>8} "
+              f"{latency['p50'] * 1000:>9.2f} {latency['p95'] * 1000:>9.2f} {latency['p99'] * 1000:>9.2f} "
+              f"{item['throughput_rps']:>12.1f} {latency['p50'] / item['cards'] * 1e6:>11.1f}")
+    slope = _slope([(item['cards'], item['latency']['p50']) for item in results])
+    if slope is not None:
+        print(f"\n每增加一张卡，p50延迟增加约 {slope * 1e6:.1f} µs")
+    missing = [item for item in results if item['devices'] != item['cards']]
+    for item in missing:
+        print(f"✗ {item['cards']} 张卡的场景只发现 {item['devices']} 个设备")
+    return not missing
+
+
+def main():
+    parser = argparse.ArgumentParser(description="海光DCU sysfs回放夹具")
+    parser.add_argument("command", choices=["generate", "capture", "animate", "serve", "bench"],
+                        help="generate: 生成合成设备树; capture: 录制本机设备树; animate: 持续更新设备树数值; "
+                             "serve: 在设备树上运行exporter; bench: 按卡数压测exporter")
+    parser.add_argument("dir", nargs="?", help="设备树目录 (generate/capture/animate必需，serve可选)")
+    parser.add_argument("--cards", default=None,
+                        help=f"卡数；bench模式为逗号分隔的场景列表 (默认 generate/serve: 16, bench: {DEFAULT_SCENARIOS})")
+    parser.add_argument("--source", default="/sys", help="capture: 录制的sysfs根")
+    parser.add_argument("--seed", type=int, default=0, help="合成数据随机种子")
+    parser.add_argument("--interval", type=float, default=0.5, help="数值更新间隔(秒)，0为不更新")
+    parser.add_argument("--exporter", default=DEFAULT_EXPORTER, help="exporter二进制路径")
+    parser.add_argument("--exporter-arg", action="append", default=[], help="传给exporter的额外参数 (可多次指定)")
+    parser.add_argument("--port", type=int, default=9400, help="serve: exporter监听端口")
+    parser.add_argument("--concurrency", type=int, default=4, help="bench: 并发抓取数")
+    parser.add_argument("--requests", type=int, default=200, help="bench: 每个场景的请求数")
+    parser.add_argument("--warmup", type=int, default=5, help="bench: 预热请求数")
+    parser.add_argument("--output", help="bench: 结果写入JSON文件")
+
+    args = parser.parse_args()
+
+    if args.command in ("generate", "capture", "animate") and not args.dir:
+        parser.error(f"{args.command} 需要设备树目录")
+
+    if args.command == "generate":
+        cards = generate(args.dir, int(args.cards or 16), args.seed)
+        print(f"✓ 已生成 {cards} 张卡的设备树: {args.dir}")
+        print(f"  运行: {args.exporter} -path.sysfs={args.dir}")
+    elif args.command == "capture":
+        cards = capture(args.dir, args.source)
+        if not cards:
+            print(f"✗ {drm_dir(args.source)} 下没有海光DCU")
+            sys.exit(1)
+        print(f"✓ 已录制 {cards} 张卡到 {args.dir}")
+    elif args.command == "animate":
+        animator = Animator(args.dir, args.seed)
+        print(f"更新 {len(animator.files)} 个文件，每 {args.interval}s 一次 (Ctrl+C 退出)")
+        try:
+            animator.run(args.interval, threading.Event())
+        except KeyboardInterrupt:
+            pass
+        finally:
+            animator.close()
+    elif args.command == "serve":
+        root = args.dir or tempfile.mkdtemp(prefix='hygon-sysfs-')
+        if not args.dir:
+            generate(root, int(args.cards or 16), args.seed)
+        animator = Animator(root, args.seed)
+        # SIGTERM同样走清理流程，避免留下exporter进程
+        signal.signal(signal.SIGTERM, lambda *_: sys.exit(0))
+        try:
+            with animator.running(args.interval) if args.interval else contextlib.nullcontext(), \
+                    exporter_process(args.exporter, root, args.port, args.exporter_arg) as url:
+                print(f"exporter运行于 {url}/metrics，设备树 {root} (Ctrl+C 退出)")
+                print(f"  测试: python3 test_exporter.py --url {url} --expect-devices {len(iter_cards(root))}")
+                while True:
+                    time.sleep(3600)
+        except KeyboardInterrupt:
+            pass
+        except RuntimeError as e:
+            print(f"✗ {e}")
+            sys.exit(1)
+        finally:
+            animator.close()
+            if not args.dir:
+                shutil.rmtree(root, ignore_errors=True)
+    else:
+        scenarios = [int(n) for n in (args.cards or DEFAULT_SCENARIOS).split(',') if n.strip()]
+        results = []
+        for cards in scenarios:
+            print(f"▶ {cards} 张卡...", flush=True)
+            try:
+                results.append(run_scenario(args.exporter, cards, args.concurrency, args.requests,
+                                            args.warmup, args.interval, args.exporter_arg, args.seed))
+            except (RuntimeError, OSError, requests.exceptions.RequestException) as e:
+                print(f"✗ {cards} 张卡的场景失败: {e}")
+                sys.exit(1)
+        print()
+        success = print_scaling(results)
+        if args.output:
+            with open(args.output, 'w', encoding='utf-8') as f:
+                json.dump(results, f, indent=2, ensure_ascii=False)
+            print(f"\n结果已写入 {args.output}")
+        sys.exit(0 if success else 1)
+
+
+if __name__ == "__main__":
+    main()
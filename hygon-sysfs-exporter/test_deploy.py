@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+"""
+deploy.py远程部署测试：LocalTransport模拟主机，systemctl由PATH中的假脚本代替
+运行: python3 -m pytest -q test_deploy.py
+"""
+
+import os
+import stat
+
+import pytest
+
+import deploy
+from remote_exec import CommandResult, LocalTransport
+
+HOST = "node1"
+
+
+class FlakyTransport(LocalTransport):
+    """前failures次sync只传输每个文件的前半部分并返回失败，模拟上传中断"""
+
+    def __init__(self, root, env, failures=1):
+        super().__init__(root, env)
+        self.failures = failures
+        self.syncs = 0
+
+    def sync(self, host, local_paths, remote_dir, compress=True, timeout=None):
+        self.syncs += 1
+        if self.syncs > self.failures:
+            return super().sync(host, local_paths, remote_dir, compress, timeout)
+        target = os.path.join(self.root, host, remote_dir)
+        for path in local_paths:
+            with open(path, 'rb') as src, open(os.path.join(target, os.path.basename(path)), 'wb') as dst:
+                data = src.read()
+                dst.write(data[:len(data) // 2])
+        return CommandResult(host, 255, '', 'connection reset', 0.1)
+
+
+@pytest.fixture
+def site(tmp_path):
+    """返回 (本地构建目录, 模拟主机根目录, 传输层环境)"""
+    build = tmp_path / "build"
+    build.mkdir()
+    (build / deploy.BINARY_NAME).write_bytes(b"\x7fELF" + os.urandom(4096))
+    (build / "hygon-dcu-exporter.service").write_text("[Service]\nExecStart=/usr/local/bin/hygon-dcu-exporter\n")
+
+    bin_dir = tmp_path / "bin"
+    bin_dir.mkdir()
+    systemctl = bin_dir / "systemctl"
+    systemctl.write_text('#!/bin/sh\necho "$@" >> "$REMOTE_ROOT/systemctl.log"\n')
+    systemctl.chmod(0o755)
+    env = {'PATH': f"{bin_dir}:{os.environ['PATH']}"}
+    return build, tmp_path / "hosts", env
+
+
+def manifest(build):
+    return deploy.build_manifest(str(build))
+
+
+def staged(root, items):
+    return root / HOST / deploy.staging_dir(items)
+
+
+def test_interrupted_upload_keeps_private_staging_dir(site):
+    build, root, env = site
+    items = manifest(build)
+    transport = FlakyTransport(str(root), env)
+
+    failed = deploy.deploy_host(transport, HOST, items, sudo="", progress=lambda message: None)
+
+    assert not failed.ok
+    assert "connection reset" in failed.error
+    staging = staged(root, items)
+    assert stat.S_IMODE(staging.stat().st_mode) == 0o700
+    partial = staging / deploy.BINARY_NAME
+    assert 0 < partial.stat().st_size < (build / deploy.BINARY_NAME).stat().st_size
+    assert not (root / HOST / "usr/local/bin/hygon-dcu-exporter").exists()
+
+    # 同一批文件再次部署时复用同一个暂存目录，安装校验通过后才删除
+    result = deploy.deploy_host(transport, HOST, items, sudo="", progress=lambda message: None)
+
+    assert result.ok, result.error
+    assert not staging.exists()
+    installed = root / HOST / "usr/local/bin/hygon-dcu-exporter"
+    assert installed.read_bytes() == (build / deploy.BINARY_NAME).read_bytes()
+    assert oct(stat.S_IMODE(installed.stat().st_mode)) == "0o755"
+    assert "restart hygon-dcu-exporter" in (root / HOST / "systemctl.log").read_text()
+
+
+def test_unchanged_host_is_skipped(site):
+    build, root, env = site
+    items = manifest(build)
+    transport = LocalTransport(str(root), env)
+
+    first = deploy.deploy_host(transport, HOST, items, sudo="", progress=lambda message: None)
+    second = deploy.deploy_host(transport, HOST, items, sudo="", progress=lambda message: None)
+
+    assert first.ok and not first.skipped
+    assert second.ok and second.skipped
+    assert (root / HOST / "systemctl.log").read_text().count("restart") == 1
+
+
+def test_checksum_mismatch_drops_staged_file_and_keeps_target(site):
+    build, root, env = site
+    items = manifest(build)
+    transport = LocalTransport(str(root), env)
+    staging = staged(root, items)
+    staging.mkdir(parents=True)
+    for item in items:
+        (staging / item.name).write_bytes(b"corrupt")
+
+    # 暂存文件已是完整大小时rsync不会重传，这里直接执行安装脚本
+    result = transport.run(HOST, deploy.install_script(items, deploy.staging_dir(items), sudo=""))
+
+    assert not result.ok
+    assert not (root / HOST / "usr/local/bin/hygon-dcu-exporter").exists()
+    assert not (root / HOST / ("usr/local/bin/hygon-dcu-exporter" + deploy.INSTALL_SUFFIX)).exists()
+    # 校验失败的文件被删除，下次部署重新传输；目录本身保留
+    assert staging.is_dir()
+    assert not (staging / items[0].name).exists()
+
+
+def test_staging_dir_keyed_by_content(site):
+    build, _, _ = site
+    binary, service = manifest(build)
+
+    assert deploy.staging_dir([binary]).endswith("/" + binary.sha256)
+    assert deploy.staging_dir([binary, service]) != deploy.staging_dir([binary])
+    assert deploy.staging_dir([binary, service]).startswith(deploy.REMOTE_STAGING_ROOT + "/")
@@ -4,22 +4,148 @@
 用于测试exporter的各项功能
 """
 
+import math
 import requests
 import time
 import sys
 import argparse
-from urllib.parse import urljoin
+from array import array
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from urllib.parse import urljoin, urlparse
+from requests.adapters import HTTPAdapter
+
+from cardinality import CardinalityAnalyzer, analyze_sources, print_report
+from metrics_parser import MetricSnapshot
+
+DEFAULT_PORT = 9400
+
+# 关键指标
+KEY_METRICS = [
+    'hygon_dcu_utilization_percent',
+    'hygon_memory_utilization_percent',
+    'hygon_power_watts',
+    'hygon_vram_total_bytes',
+    'hygon_vram_usage_bytes',
+    'hygon_temperature_celsius',
+    'hygon_device_info'
+]
+
+# 监控模式跟踪的指标
+MONITOR_METRICS = [
+    'hygon_dcu_utilization_percent',
+    'hygon_power_watts',
+    'hygon_temperature_celsius'
+]
+
+# 延迟直方图分桶上限(秒)
+LATENCY_BUCKETS = [0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10]
+
+def normalize_target(target, default_port=DEFAULT_PORT):
+    """规范化目标地址为 http://host:port"""
+    target = target.strip()
+    if '://' not in target:
+        target = f"http://{target}"
+    parsed = urlparse(target)
+    if parsed.port is None:
+        target = f"{parsed.scheme}://{parsed.hostname}:{default_port}{parsed.path}"
+    return target.rstrip('/')
+
+def load_targets(targets=None, targets_file=None):
+    """从逗号分隔列表和/或文件(每行一个，#为注释)加载目标，去重并保持顺序"""
+    raw = []
+    if targets:
+        raw.extend(targets.split(','))
+    if targets_file:
+        with open(targets_file, 'r', encoding='utf-8') as f:
+            for line in f:
+                line = line.split('#', 1)[0].strip()
+                if line:
+                    raw.append(line)
+    
+    seen = set()
+    result = []
+    for target in raw:
+        if not target.strip():
+            continue
+        target = normalize_target(target)
+        if target not in seen:
+            seen.add(target)
+            result.append(target)
+    return result
+
+def percentile(values, pct):
+    """最近秩法计算百分位"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    # 秩 = ceil(pct% * n)；先乘后除，避免 70/100*10 = 7.000000000000001 这类误差多进一位
+    index = max(0, min(len(ordered) - 1, math.ceil(pct * len(ordered) / 100) - 1))
+    return ordered[index]
+
+def format_latency_histogram(latencies, buckets=LATENCY_BUCKETS, width=40):
+    """生成延迟分布直方图文本行"""
+    counts = [0] * (len(buckets) + 1)
+    for latency in latencies:
+        for i, bound in enumerate(buckets):
+            if latency <= bound:
+                counts[i] += 1
+                break
+        else:
+            counts[-1] += 1
+    
+    peak = max(counts) or 1
+    lines = []
+    labels = [f"≤{bound}s" for bound in buckets] + [f">{buckets[-1]}s"]
+    for label, count in zip(labels, counts):
+        bar = '#' * (count * width // peak) if count else ''
+        lines.append(f"  {label:>7} |{bar} {count}")
+    return lines
+
+class SeriesWindow:
+    """单个序列的滑动窗口：预分配的环形缓冲区，内存与监控时长无关"""
+    
+    __slots__ = ('values', 'count', 'pos', 'last_value', 'last_time')
+    
+    def __init__(self, size):
+        self.values = array('d', [0.0]) * size
+        self.count = 0
+        self.pos = 0
+        self.last_value = None
+        self.last_time = None
+    
+    def add(self, value, timestamp):
+        """写入新样本，返回 (是否变化, 每秒变化率)"""
+        changed = self.last_value is None or value != self.last_value
+        rate = None
+        if self.last_value is not None and timestamp > self.last_time:
+            rate = (value - self.last_value) / (timestamp - self.last_time)
+        
+        self.values[self.pos] = value
+        self.pos = (self.pos + 1) % len(self.values)
+        self.count = min(self.count + 1, len(self.values))
+        self.last_value = value
+        self.last_time = timestamp
+        return changed, rate
+    
+    def stats(self):
+        """窗口内的 (min, max, avg)"""
+        values = self.values if self.count == len(self.values) else self.values[:self.count]
+        return min(values), max(values), sum(values) / self.count
 
 class HygonExporterTester:
-    def __init__(self, base_url="http://localhost:9400"):
+    def __init__(self, base_url="http://localhost:9400", session=None, timeout=10, expected_devices=None):
         self.base_url = base_url
         self.metrics_url = urljoin(base_url, "/metrics")
+        self.session = session or requests.Session()
+        self.timeout = timeout
+        self.expected_devices = expected_devices
+        self._snapshot = None
         
     def test_connection(self):
         """测试连接"""
         print(f"测试连接到 {self.base_url}...")
         try:
-            response = requests.get(self.base_url, timeout=5)
+            response = self.session.get(self.base_url, timeout=5)
             if response.status_code == 200:
                 print("✓ 连接成功")
                 return True
@@ -30,68 +156,36 @@ class HygonExporterTester:
             print(f"✗ 连接失败: {e}")
             return False
     
-    def get_metrics(self):
-        """获取指标"""
+    def fetch_metrics(self):
+        """抓取一次/metrics并构建快照；失败时抛出异常"""
+        self._snapshot = MetricSnapshot.from_url(self.metrics_url, session=self.session, timeout=self.timeout)
+        return self._snapshot
+    
+    def get_metrics(self, refresh=False):
+        """获取指标快照（同一次运行内缓存，refresh=True时重新抓取）"""
+        if self._snapshot is not None and not refresh:
+            return self._snapshot
         try:
-            response = requests.get(self.metrics_url, timeout=10)
-            if response.status_code == 200:
-                return response.text
-            else:
-                print(f"获取指标失败，状态码: {response.status_code}")
-                return None
+            return self.fetch_metrics()
+        except requests.exceptions.HTTPError as e:
+            print(f"获取指标失败，状态码: {e.response.status_code}")
+            return None
         except Exception as e:
             print(f"获取指标失败: {e}")
             return None
     
-    def parse_metrics(self, metrics_text):
-        """解析指标"""
-        metrics = {}
-        for line in metrics_text.split('\n'):
-            line = line.strip()
-            if line and not line.startswith('#'):
-                parts = line.split(' ')
-                if len(parts) >= 2:
-                    metric_name = parts[0]
-                    metric_value = parts[1]
-                    metrics[metric_name] = metric_value
-        return metrics
-    
     def test_metrics(self):
         """测试指标"""
         print("测试指标获取...")
-        metrics_text = self.get_metrics()
-        if not metrics_text:
+        snapshot = self.get_metrics()
+        if not snapshot:
             return False
         
-        metrics = self.parse_metrics(metrics_text)
-        
-        # 检查关键指标
-        key_metrics = [
-            'hygon_dcu_utilization_percent',
-            'hygon_memory_utilization_percent', 
-            'hygon_power_watts',
-            'hygon_vram_total_bytes',
-            'hygon_vram_usage_bytes',
-            'hygon_temperature_celsius',
-            'hygon_device_info'
-        ]
-        
-        found_metrics = []
-        missing_metrics = []
-        
-        for key_metric in key_metrics:
-            found = False
-            for metric_name in metrics.keys():
-                if metric_name.startswith(key_metric):
-                    found_metrics.append(metric_name)
-                    found = True
-                    break
-            if not found:
-                missing_metrics.append(key_metric)
+        found_metrics, missing_metrics = self.check_key_metrics(snapshot)
         
         print(f"✓ 找到 {len(found_metrics)} 个关键指标")
-        for metric in found_metrics[:5]:  # 显示前5个
-            print(f"  - {metric}: {metrics.get(metric, 'N/A')}")
+        for sample in found_metrics[:5]:  # 显示前5个
+            print(f"  - {sample.series()}: {sample.value}")
         
         if missing_metrics:
             print(f"✗ 缺失 {len(missing_metrics)} 个关键指标:")
@@ -100,62 +194,137 @@ class HygonExporterTester:
         
         return len(missing_metrics) == 0
     
+    def check_key_metrics(self, snapshot):
+        """检查关键指标，返回 (每个指标的首个样本, 缺失的指标)"""
+        found_metrics = []
+        missing_metrics = []
+        
+        for key_metric in KEY_METRICS:
+            samples = snapshot.family(key_metric)
+            if samples:
+                found_metrics.append(samples[0])
+            else:
+                missing_metrics.append(key_metric)
+        
+        return found_metrics, missing_metrics
+    
+    def discover_devices(self, snapshot):
+        """从hygon_device_info统计设备，返回 (设备数, 序列号集合)"""
+        info = snapshot.family('hygon_device_info')
+        device_serials = {sample.label('serial') for sample in info} - {''}
+        return len(info), device_serials
+    
     def test_device_discovery(self):
         """测试设备发现"""
         print("测试设备发现...")
-        metrics_text = self.get_metrics()
-        if not metrics_text:
+        snapshot = self.get_metrics()
+        if not snapshot:
             return False
         
-        device_count = 0
-        device_serials = set()
-        
-        for line in metrics_text.split('\n'):
-            if 'hygon_device_info' in line and not line.startswith('#'):
-                device_count += 1
-                # 提取序列号
-                if 'serial=' in line:
-                    start = line.find('serial="') + 8
-                    end = line.find('"', start)
-                    if end > start:
-                        serial = line[start:end]
-                        device_serials.add(serial)
+        device_count, device_serials = self.discover_devices(snapshot)
         
         print(f"✓ 发现 {device_count} 个DCU设备")
-        for i, serial in enumerate(device_serials):
+        for i, serial in enumerate(sorted(device_serials)):
             print(f"  设备{i+1}: {serial}")
         
+        if self.expected_devices is not None and device_count != self.expected_devices:
+            print(f"✗ 期望 {self.expected_devices} 个设备")
+            return False
         return device_count > 0
     
-    def monitor_metrics(self, duration=60, interval=5):
-        """监控指标变化"""
-        print(f"开始监控指标变化 (持续{duration}秒，间隔{interval}秒)...")
+    def test_cardinality(self, nodes=None):
+        """基数分析：流式统计每个指标族的序列数和标签取值数"""
+        print("分析指标基数...")
+        analyzer = CardinalityAnalyzer()
+        try:
+            analyzer.add_url(self.metrics_url, session=self.session, timeout=self.timeout)
+        except Exception as e:
+            print(f"✗ 获取指标失败: {e}")
+            return False
+        print_report(analyzer, nodes)
+        return analyzer.series > 0
+    
+    def monitor_metrics(self, duration=60, interval=5, window=60):
+        """监控指标变化：固定节拍采样，只输出变化的序列及其变化率"""
+        print(f"开始监控指标变化 (持续{duration}秒，间隔{interval}秒，窗口{window}个样本)...")
         
-        start_time = time.time()
+        windows = {}
+        start_time = time.monotonic()
+        next_tick = start_time
         iteration = 0
         
-        while time.time() - start_time < duration:
+        while time.monotonic() - start_time < duration:
             iteration += 1
-            print(f"\n--- 第{iteration}次采样 ---")
+            tick_time = time.monotonic()
+            snapshot = self.get_metrics(refresh=True)
+            if snapshot:
+                self._report_changes(snapshot, windows, window, iteration, tick_time - start_time)
             
-            metrics_text = self.get_metrics()
-            if metrics_text:
-                metrics = self.parse_metrics(metrics_text)
-                
-                # 显示关键指标
-                key_patterns = [
-                    'hygon_dcu_utilization_percent',
-                    'hygon_power_watts',
-                    'hygon_temperature_celsius'
-                ]
-                
-                for pattern in key_patterns:
-                    for metric_name, value in metrics.items():
-                        if pattern in metric_name:
-                            print(f"{metric_name}: {value}")
-                            break
-            
-            time.sleep(interval)
+            # 按绝对节拍调度，采样耗时不会累积成漂移；超时则跳过错过的节拍
+            next_tick += interval
+            now = time.monotonic()
+            if next_tick <= now:
+                missed = int((now - next_tick) // interval) + 1
+                print(f"⚠️  采样耗时超过间隔，跳过 {missed} 个节拍")
+                next_tick += missed * interval
+            time.sleep(max(0.0, min(next_tick, start_time + duration) - now))
+        
+        self._print_window_summary(windows)
+    
+    def _report_changes(self, snapshot, windows, window, iteration, elapsed):
+        """更新每个序列的窗口，输出变化的值"""
+        latency = f", 抓取{snapshot.latency:.3f}s" if snapshot.latency is not None else ""
+        print(f"\n--- 第{iteration}次采样 (+{elapsed:.1f}s{latency}) ---")
+        
+        seen = set()
+        unchanged = 0
+        for device_id in snapshot.device_ids():
+            families = snapshot.device(device_id)
+            for metric in MONITOR_METRICS:
+                for sample in families.get(metric, []):
+                    key = (device_id, metric, sample.label('sensor'))
+                    seen.add(key)
+                    series = windows.get(key)
+                    if series is None:
+                        series = windows[key] = SeriesWindow(window)
+                    previous = series.last_value
+                    changed, rate = series.add(sample.value, elapsed)
+                    if not changed:
+                        unchanged += 1
+                        continue
+                    
+                    low, high, avg = series.stats()
+                    # 同一时刻的两个样本（重复序列、零间隔）算不出速率，只输出前后值
+                    if previous is None:
+                        delta = f"{sample.value:g}"
+                    elif rate is None:
+                        delta = f"{previous:g} → {sample.value:g}"
+                    else:
+                        delta = f"{previous:g} → {sample.value:g} ({rate:+.2f}/s)"
+                    print(f"DCU {device_id:>3} {self._series_title(key)}: {delta}  "
+                          f"min={low:g} max={high:g} avg={avg:.2f}")
+        
+        # 已消失的设备/传感器不再保留窗口
+        for key in list(windows):
+            if key not in seen:
+                del windows[key]
+        
+        if unchanged:
+            print(f"({unchanged} 个序列无变化)")
+    
+    def _series_title(self, key):
+        _, metric, sensor = key
+        return f"{metric}[{sensor}]" if sensor else metric
+    
+    def _print_window_summary(self, windows):
+        """输出每个序列窗口内的统计"""
+        if not windows:
+            return
+        print("\n=== 窗口统计 ===")
+        for key in sorted(windows, key=lambda k: (len(k[0]), k)):
+            low, high, avg = windows[key].stats()
+            print(f"DCU {key[0]:>3} {self._series_title(key)}: "
+                  f"min={low:g} max={high:g} avg={avg:.2f} (样本数 {windows[key].count})")
     
     def run_all_tests(self):
         """运行所有测试"""
@@ -181,17 +350,131 @@ class HygonExporterTester:
         print(f"\n=== 测试结果: {passed}/{total} 通过 ===")
         return passed == total
 
+class FleetTester:
+    """并发检查多个exporter，每个目标每次运行只抓取一次/metrics"""
+    
+    def __init__(self, targets, workers=32, timeout=10):
+        self.targets = targets
+        self.workers = max(1, min(workers, len(targets) or 1))
+        self.timeout = timeout
+        
+        # 共享连接池：每个目标保持一个keep-alive连接
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=max(len(targets), 1), pool_maxsize=2)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+    
+    def check_target(self, target):
+        """检查单个目标，返回结果字典"""
+        tester = HygonExporterTester(target, session=self.session, timeout=self.timeout)
+        result = {
+            'target': target,
+            'passed': False,
+            'latency': None,
+            'series': 0,
+            'devices': 0,
+            'missing': [],
+            'error': ''
+        }
+        
+        try:
+            snapshot = tester.fetch_metrics()
+        except requests.exceptions.HTTPError as e:
+            result['error'] = f"HTTP {e.response.status_code}"
+            return result
+        except requests.exceptions.Timeout:
+            result['error'] = f"抓取超时 (>{self.timeout}s)"
+            return result
+        except requests.exceptions.ConnectionError:
+            result['error'] = "连接失败"
+            return result
+        except Exception as e:
+            result['error'] = str(e)
+            return result
+        
+        # 后续检查均复用同一次抓取的结果
+        _, missing = tester.check_key_metrics(snapshot)
+        device_count, _ = tester.discover_devices(snapshot)
+        
+        result['latency'] = snapshot.latency
+        result['series'] = len(snapshot)
+        result['devices'] = device_count
+        result['missing'] = missing
+        result['passed'] = not missing and device_count > 0
+        if device_count == 0 and not missing:
+            result['error'] = "未发现DCU设备"
+        return result
+    
+    def run(self):
+        """并发检查所有目标，结果按目标顺序返回"""
+        results = {}
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            futures = {executor.submit(self.check_target, target): target for target in self.targets}
+            for future in as_completed(futures):
+                results[futures[future]] = future.result()
+        return [results[target] for target in self.targets]
+    
+    def print_report(self, results):
+        """输出每个节点的结果和延迟分布"""
+        print(f"=== 集群检查结果 ({len(results)} 个节点) ===\n")
+        for result in results:
+            if result['passed']:
+                print(f"✓ {result['target']}  {result['latency']:.3f}s  "
+                      f"{result['devices']}个DCU  {result['series']}个序列")
+            elif result['missing']:
+                print(f"✗ {result['target']}  缺失指标: {', '.join(result['missing'])}")
+            else:
+                print(f"✗ {result['target']}  {result['error']}")
+        
+        latencies = [r['latency'] for r in results if r['latency'] is not None]
+        if latencies:
+            print("\n--- 抓取延迟分布 ---")
+            for line in format_latency_histogram(latencies):
+                print(line)
+            print(f"  p50={percentile(latencies, 50):.3f}s  p95={percentile(latencies, 95):.3f}s  "
+                  f"max={max(latencies):.3f}s")
+        
+        passed = sum(1 for r in results if r['passed'])
+        print(f"\n=== 测试结果: {passed}/{len(results)} 节点通过 ===")
+        return passed == len(results)
+
 def main():
     parser = argparse.ArgumentParser(description="海光DCU Exporter 测试工具")
     parser.add_argument("--url", default="http://localhost:9400", help="Exporter URL")
-    parser.add_argument("--test", choices=["all", "connection", "metrics", "devices", "monitor"], 
+    parser.add_argument("--test", choices=["all", "connection", "metrics", "devices", "monitor", "fleet", "cardinality"], 
                        default="all", help="测试类型")
     parser.add_argument("--duration", type=int, default=60, help="监控持续时间(秒)")
-    parser.add_argument("--interval", type=int, default=5, help="监控间隔(秒)")
+    parser.add_argument("--interval", type=float, default=5, help="监控间隔(秒)")
+    parser.add_argument("--window", type=int, default=60, help="监控统计窗口(样本数)")
+    parser.add_argument("--targets", help="集群模式: 逗号分隔的目标列表 (host[:port])")
+    parser.add_argument("--targets-file", help="集群模式: 目标列表文件，每行一个")
+    parser.add_argument("--workers", type=int, default=32, help="集群模式并发数")
+    parser.add_argument("--timeout", type=float, default=10, help="抓取超时(秒)")
+    parser.add_argument("--nodes", type=int, help="基数分析: 推算该节点数下的总序列数")
+    parser.add_argument("--expect-devices", type=int, help="设备发现: 期望的设备数 (配合sysfs_fixture.py的合成设备树)")
     
     args = parser.parse_args()
     
-    tester = HygonExporterTester(args.url)
+    if args.test == "cardinality" and (args.targets or args.targets_file):
+        targets = load_targets(args.targets, args.targets_file)
+        urls = [urljoin(target, "/metrics") for target in targets]
+        try:
+            analyzer = analyze_sources(urls, workers=args.workers, timeout=args.timeout)
+        except Exception as e:
+            print(f"✗ 基数分析失败: {e}")
+            sys.exit(1)
+        print_report(analyzer, args.nodes or len(targets))
+        sys.exit(0)
+    
+    if args.test == "fleet" or args.targets or args.targets_file:
+        targets = load_targets(args.targets, args.targets_file)
+        if not targets:
+            parser.error("集群模式需要 --targets 或 --targets-file")
+        fleet = FleetTester(targets, workers=args.workers, timeout=args.timeout)
+        success = fleet.print_report(fleet.run())
+        sys.exit(0 if success else 1)
+    
+    tester = HygonExporterTester(args.url, timeout=args.timeout, expected_devices=args.expect_devices)
     
     if args.test == "all":
         success = tester.run_all_tests()
@@ -203,8 +486,10 @@ def main():
     elif args.test == "devices":
         success = tester.test_device_discovery()
     elif args.test == "monitor":
-        tester.monitor_metrics(args.duration, args.interval)
+        tester.monitor_metrics(args.duration, args.interval, args.window)
         success = True
+    elif args.test == "cardinality":
+        success = tester.test_cardinality(args.nodes)
     
     sys.exit(0 if success else 1)
 
@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+"""
+FleetTester测试：用bench_exporter.FixtureServer代替exporter
+运行: python3 -m pytest -q test_fleet.py
+"""
+
+import socket
+
+import pytest
+
+from bench_exporter import FixtureServer
+from test_exporter import KEY_METRICS, FleetTester, percentile
+
+
+def exposition(devices, skip=()):
+    """生成devices张卡的exposition文本，skip中的指标不输出"""
+    lines = []
+    for i in range(devices):
+        labels = f'gpu="{i}",uuid="{i + 1:016x}",device="hygon{i}",serial="HG{i:010d}",hostname="node"'
+        for metric in KEY_METRICS:
+            if metric in skip:
+                continue
+            if metric == 'hygon_device_info':
+                lines.append(f'{metric}{{{labels},vbios_version="113"}} 1')
+            elif metric == 'hygon_temperature_celsius':
+                lines.append(f'{metric}{{{labels},sensor="edge"}} 61')
+            else:
+                lines.append(f'{metric}{{{labels}}} 42')
+    return ('\n'.join(lines) + '\n').encode()
+
+
+def closed_port():
+    """一个当前没有监听的本地端口"""
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+@pytest.fixture
+def start_server():
+    servers = []
+
+    def start(payload, delay=0.0):
+        server = FixtureServer([payload], delay=delay).start()
+        servers.append(server)
+        return server
+
+    yield start
+    for server in servers:
+        server.stop()
+
+
+def test_results_follow_target_order(start_server):
+    healthy = start_server(exposition(2))
+    missing = start_server(exposition(1, skip={'hygon_power_watts'}))
+    empty = start_server(exposition(0))
+    down = f"http://127.0.0.1:{closed_port()}"
+    targets = [down, missing.url, healthy.url, empty.url]
+
+    results = FleetTester(targets, workers=4, timeout=5).run()
+
+    assert [result['target'] for result in results] == targets
+    by_target = {result['target']: result for result in results}
+
+    assert by_target[healthy.url]['passed']
+    assert by_target[healthy.url]['devices'] == 2
+    assert by_target[healthy.url]['series'] == 2 * len(KEY_METRICS)
+    assert by_target[healthy.url]['latency'] is not None
+
+    assert not by_target[missing.url]['passed']
+    assert by_target[missing.url]['missing'] == ['hygon_power_watts']
+
+    assert not by_target[empty.url]['passed']
+    assert by_target[empty.url]['devices'] == 0
+
+    assert not by_target[down]['passed']
+    assert by_target[down]['error'] == "连接失败"
+    assert by_target[down]['latency'] is None
+
+
+def test_slow_target_times_out_without_blocking_others(start_server):
+    slow = start_server(exposition(1), delay=1.0)
+    fast = start_server(exposition(1))
+
+    results = FleetTester([slow.url, fast.url], workers=2, timeout=0.2).run()
+
+    assert results[0]['error'].startswith("抓取超时")
+    assert results[1]['passed']
+
+
+def test_each_target_scraped_once(start_server):
+    servers = [start_server(exposition(1)) for _ in range(3)]
+
+    FleetTester([server.url for server in servers], workers=8).run()
+
+    # FixtureServer每返回一次/metrics推进一次下标
+    assert [server._index for server in servers] == [1, 1, 1]
+
+
+def test_worker_pool_bounded_by_target_count():
+    assert FleetTester(["http://a:9400", "http://b:9400"], workers=32).workers == 2
+    assert FleetTester([], workers=32).workers == 1
+
+
+@pytest.mark.parametrize("pct, n, rank", [
+    (50, 10, 5),    # pct*n/100为奇数：旧实现多取一位
+    (50, 4, 2),     # 偶数
+    (70, 10, 7),    # 70/100*10 有浮点误差
+    (95, 20, 19),
+    (99, 10, 10),   # 非整数秩向上取整
+    (50, 1, 1),
+    (0, 5, 1),      # 下界
+    (100, 5, 5),    # 上界
+])
+def test_percentile_nearest_rank(pct, n, rank):
+    values = list(range(n, 0, -1))  # 逆序输入，值即排序后的秩
+    assert percentile(values, pct) == rank
+
+
+def test_percentile_empty():
+    assert percentile([], 95) == 0.0
@@ -0,0 +1,185 @@
+#!/usr/bin/env python3
+"""
+debug_metrics_comparison.py集群审计测试：
+hy-smi由LocalTransport执行的假脚本代替，exporter由bench_exporter.FixtureServer代替
+运行: python3 -m pytest -q test_metrics_comparison.py
+"""
+
+import argparse
+import json
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+import debug_metrics_comparison as dmc
+from bench_exporter import FixtureServer
+from remote_exec import LocalTransport, RemoteCommandError
+
+HEADER = "DCU     Temp     AvgPwr     Perf     PwrCap     VRAM%      DCU%      Mode\n"
+
+# 按 $REMOTE_HOST 输出对应主机的录制表格，没有录制的主机返回非0
+FAKE_HY_SMI = """#!/bin/bash
+table="$(dirname "$0")/tables/$REMOTE_HOST.txt"
+[ -f "$table" ] || { echo "hy-smi: no DCU found" >&2; exit 2; }
+echo "$*" >> "$(dirname "$0")/calls.log"
+cat "$table"
+"""
+
+
+def hy_smi_table(devices):
+    """devices为 [(温度, 功耗, VRAM%, DCU%)]"""
+    rows = [f"{i}       {temp}C    {power}W     auto     400.0W     {vram}%        {dcu}%     Normal\n"
+            for i, (temp, power, vram, dcu) in enumerate(devices)]
+    return HEADER + "".join(rows) + "End of SMI Log\n"
+
+
+def exposition(devices):
+    """与hy_smi_table相同格式的sysfs exporter指标"""
+    lines = []
+    for i, (temp, power, vram, dcu) in enumerate(devices):
+        lines += [
+            f'hygon_temperature_celsius{{gpu="{i}",sensor="edge"}} {temp}',
+            f'hygon_power_watts{{gpu="{i}"}} {power}',
+            f'hygon_dcu_utilization_percent{{gpu="{i}"}} {dcu}',
+            f'hygon_vram_usage_bytes{{gpu="{i}"}} {vram * 1024}',
+            f'hygon_vram_total_bytes{{gpu="{i}"}} {100 * 1024}',
+        ]
+    return ('\n'.join(lines) + '\n').encode()
+
+
+@pytest.fixture
+def fleet(tmp_path):
+    """返回 add(hy-smi读数, exporter读数) -> host，主机名即FixtureServer的 127.0.0.1:端口"""
+    hy_smi = tmp_path / "hy-smi"
+    hy_smi.write_text(FAKE_HY_SMI)
+    hy_smi.chmod(0o755)
+    (tmp_path / "tables").mkdir()
+    servers = []
+
+    def add(hy_smi_devices, exporter_devices):
+        server = FixtureServer([exposition(exporter_devices)]).start()
+        servers.append(server)
+        host = server.url.split("//", 1)[1]
+        if hy_smi_devices is not None:
+            (tmp_path / "tables" / f"{host}.txt").write_text(hy_smi_table(hy_smi_devices))
+        return host
+
+    add.hy_smi_path = str(hy_smi)
+    add.calls = tmp_path / "calls.log"
+    yield add
+    for server in servers:
+        server.stop()
+
+
+def audit_args(hy_smi_path, report_json=None):
+    return argparse.Namespace(
+        transport="local", ssh_user="root", hy_smi_path=hy_smi_path, hy_smi_fixtures=None,
+        url_template="http://{host}/metrics", samples=1, sample_interval=0.1, max_skew=None,
+        workers=4, show_all=False, report_json=report_json)
+
+
+def test_remote_runner_runs_hy_smi_through_transport(fleet):
+    host = fleet([(58.0, 259.0, 97, 34.2)], [])
+    runner = dmc.RemoteRunner(LocalTransport(), host, fleet.hy_smi_path)
+
+    devices = dmc.parse_hy_smi_table(runner(["--showuse"]))
+
+    assert devices["0"].power == 259.0
+    assert fleet.calls.read_text() == "--showuse\n"
+    with pytest.raises(RemoteCommandError, match="no DCU found"):
+        dmc.RemoteRunner(LocalTransport(), "missing-host", fleet.hy_smi_path)([])
+
+
+def test_audit_host_flags_drifted_metric(fleet):
+    readings = [(58.0, 259.0, 40, 34.2), (61.0, 300.0, 50, 80.0)]
+    drifted = [(58.0, 259.0, 40, 34.2), (61.0, 250.0, 50, 80.0)]
+    host = fleet(readings, drifted)
+
+    result = dmc.audit_host(host, LocalTransport(), dmc.requests.Session(), "http://{host}/metrics",
+                            fleet.hy_smi_path, None, 1, 0.1, dmc.DEFAULT_TOLERANCES, 1.0)
+
+    assert result["error"] == ""
+    failed = [(row["dcu"], row["metric"]) for row in result["rows"] if not row["passed"]]
+    assert failed == [("1", "power")]
+    power = next(row for row in result["rows"] if (row["dcu"], row["metric"]) == ("1", "power"))
+    assert power["bias"] == pytest.approx(-50.0)
+    assert len(result["rows"]) == 2 * len(dmc.DEFAULT_TOLERANCES)
+
+
+def test_audit_host_reports_device_count_mismatch(fleet):
+    host = fleet([(58.0, 259.0, 40, 34.2)] * 2, [(58.0, 259.0, 40, 34.2)])
+
+    result = dmc.audit_host(host, LocalTransport(), dmc.requests.Session(), "http://{host}/metrics",
+                            fleet.hy_smi_path, None, 1, 0.1, dmc.DEFAULT_TOLERANCES, 1.0)
+
+    assert result["error"] == "设备数量不一致: hy-smi=2, exporter=1"
+
+
+def test_audit_fleet_sorts_mismatches_by_relative_error(fleet, tmp_path, capsys):
+    healthy = fleet([(58.0, 259.0, 40, 34.2)], [(58.0, 259.0, 40, 34.2)])
+    hot = fleet([(58.0, 259.0, 40, 34.2)], [(70.0, 259.0, 40, 34.2)])   # 温度误差12，容差3
+    power = fleet([(58.0, 259.0, 40, 34.2)], [(58.0, 300.0, 40, 34.2)])  # 功耗误差41，容差15
+    broken = fleet(None, [(58.0, 259.0, 40, 34.2)])
+    report = tmp_path / "report.json"
+
+    ok = dmc.audit_fleet([healthy, hot, power, broken], audit_args(fleet.hy_smi_path, str(report)),
+                         dmc.DEFAULT_TOLERANCES)
+
+    assert not ok
+    data = json.loads(report.read_text(encoding="utf-8"))
+    assert [result["host"] for result in data["hosts"]] == [healthy, hot, power, broken]
+    assert [(row["host"], row["metric"]) for row in data["mismatches"]] == [
+        (hot, "temperature"), (power, "power")]
+    errors = {result["host"]: result["error"] for result in data["hosts"]}
+    assert errors[healthy] == errors[hot] == errors[power] == ""
+    assert "no DCU found" in errors[broken]
+    assert "1 台主机异常" in capsys.readouterr().out
+
+
+def test_audit_fleet_passes_when_all_hosts_match(fleet, capsys):
+    hosts = [fleet([(58.0, 259.0, 40, 34.2)], [(59.0, 262.0, 41, 36.0)]) for _ in range(3)]
+
+    assert dmc.audit_fleet(hosts, audit_args(fleet.hy_smi_path), dmc.DEFAULT_TOLERANCES)
+    assert "0 项超出容差, 0 台主机异常" in capsys.readouterr().out
+
+
+def test_audit_host_prefers_per_host_fixtures(fleet, tmp_path):
+    host = fleet(None, [(58.0, 259.0, 40, 34.2)])
+    fixtures = tmp_path / "fixtures"
+    (fixtures / host).mkdir(parents=True)
+    (fixtures / "default.txt").write_text(hy_smi_table([(58.0, 259.0, 40, 34.2)] * 2))
+    (fixtures / host / "default.txt").write_text(hy_smi_table([(58.0, 259.0, 40, 34.2)]))
+
+    result = dmc.audit_host(host, None, dmc.requests.Session(), "http://{host}/metrics",
+                            fleet.hy_smi_path, str(fixtures), 1, 0.1, dmc.DEFAULT_TOLERANCES, 1.0)
+
+    assert result["error"] == ""
+    assert all(row["passed"] for row in result["rows"])
+    assert not fleet.calls.exists()
+
+
+def test_align_readings_pairs_each_reading_once():
+    hy = [(0.0, 'hy0'), (1.0, 'hy1'), (2.0, 'hy2'), (10.0, 'hy10')]
+    exporter = [(0.6, 'ex0'), (1.9, 'ex1'), (10.6, 'ex10')]
+
+    pairs = dmc.align_readings(hy, exporter, max_skew=1.0)
+
+    # ex0离hy0和hy1都在容差内，只配给时间差更小的hy1，hy0不再重复使用ex0
+    assert [(hy_sample, snapshot) for _, hy_sample, snapshot in pairs] == \
+        [('hy1', 'ex0'), ('hy2', 'ex1'), ('hy10', 'ex10')]
+    assert [round(skew, 3) for skew, _, _ in pairs] == [0.4, 0.1, 0.6]
+
+    pairs = dmc.align_readings(hy, exporter, max_skew=0.5)
+
+    assert [(hy_sample, snapshot) for _, hy_sample, snapshot in pairs] == [('hy1', 'ex0'), ('hy2', 'ex1')]
+
+
+def test_align_readings_skips_readings_beyond_tolerance():
+    hy = [(0.0, 'hy0'), (0.1, 'hy1'), (0.2, 'hy2')]
+
+    # 单个exporter读数不会与多个hy-smi读数重复配对
+    assert [hy_sample for _, hy_sample, _ in dmc.align_readings(hy, [(0.15, 'ex')], max_skew=1.0)] == ['hy1']
+    assert dmc.align_readings(hy, [(5.0, 'ex')], max_skew=1.0) == []
+    assert dmc.align_readings(hy, [], max_skew=1.0) == []
@@ -0,0 +1,226 @@
+#!/usr/bin/env python3
+"""
+metrics_parser.py测试：exposition文本解析、指标族归并、标签块缓存和快照索引
+运行: python3 -m pytest -q test_metrics_parser.py
+"""
+
+import math
+
+import pytest
+
+import metrics_parser
+from bench_exporter import FixtureServer
+from metrics_parser import (ExpositionParser, MetricSnapshot, Sample, escape_label_value,
+                            family_name, parse_text, stream_samples)
+
+
+def parse_one(line):
+    parser = ExpositionParser()
+    samples = list(parser.parse([line]))
+    assert parser.errors == 0, line
+    assert len(samples) == 1
+    return samples[0]
+
+
+@pytest.mark.parametrize("block, expected", [
+    (r'path="C:\\dcu\\0"', 'C:\\dcu\\0'),
+    (r'msg="line1\nline2"', 'line1\nline2'),
+    (r'msg="say \"hi\""', 'say "hi"'),
+    (r'msg="a\\nb"', 'a\\nb'),          # 转义的反斜杠后跟n，不是换行
+    (r'msg="\\\""', '\\"'),
+    ('msg="a,b=c"', 'a,b=c'),
+    ('msg="{x}"', '{x}'),
+    ('msg="}"', '}'),
+    ('msg=""', ''),
+])
+def test_label_value_escapes(block, expected):
+    sample = parse_one(f'hygon_info{{{block},gpu="0"}} 1')
+
+    assert sample.label('msg', sample.label('path')) == expected
+    assert sample.label('gpu') == '0'
+
+
+def test_escape_round_trip():
+    value = 'a\\b\n"c"},'
+    sample = Sample('m', (('v', value),), 1.0)
+
+    assert parse_one(f"{sample.series()} 1").labels == (('v', value),)
+    assert escape_label_value(value) == 'a\\\\b\\n\\"c\\"},'
+
+
+@pytest.mark.parametrize("line", [
+    'hygon_power_watts{gpu="0",serial="HG1",} 250',
+    'hygon_power_watts{ gpu = "0" , serial = "HG1" } 250',
+    'hygon_power_watts {gpu="0",serial="HG1"} 250',
+])
+def test_label_block_spacing_and_trailing_comma(line):
+    sample = parse_one(line)
+
+    assert sample.name == 'hygon_power_watts'
+    assert sample.labels == (('gpu', '0'), ('serial', 'HG1'))
+    assert sample.value == 250.0
+
+
+@pytest.mark.parametrize("line, value, timestamp", [
+    ('up 1', 1.0, None),
+    ('up 1 1700000000000', 1.0, 1700000000000),
+    ('up{job="x"} 0.5 -1000', 0.5, -1000),
+    ('hygon_temp{gpu="0"} 6.1e1', 61.0, None),
+    ('hygon_temp{gpu="0"} +Inf 1700000000000', math.inf, 1700000000000),
+    ('hygon_temp -Inf', -math.inf, None),
+])
+def test_values_and_optional_timestamps(line, value, timestamp):
+    sample = parse_one(line)
+
+    assert sample.value == value
+    assert sample.timestamp == timestamp
+
+
+def test_nan_value():
+    assert math.isnan(parse_one('hygon_power_watts{gpu="0"} NaN').value)
+    assert math.isnan(parse_one('hygon_power_watts NaN 1').value)
+
+
+def test_malformed_lines_counted_and_skipped():
+    parser = ExpositionParser()
+    lines = [
+        'hygon_power_watts{gpu="0"} 250',
+        'hygon_power_watts{gpu="1"}',          # 缺少值
+        'hygon_power_watts{gpu="2} 250',       # 引号未闭合
+        '0bad_name 1',
+        'hygon_power_watts 1 2 3',
+        'hygon_power_watts{gpu="3"} abc',
+        '',
+        '   ',
+        'hygon_power_watts{gpu="4"} 260',
+    ]
+
+    samples = list(parser.parse(lines))
+
+    assert [sample.label('gpu') for sample in samples] == ['0', '4']
+    assert parser.errors == 5
+
+
+def test_help_and_type_comments():
+    parser = ExpositionParser()
+    samples = list(parser.parse([
+        '# HELP hygon_power_watts Average power (W)\\nper device, C:\\\\ path',
+        '# TYPE hygon_power_watts gauge',
+        '# TYPE hygon_scrape_seconds histogram',
+        '# HELP hygon_scrape_seconds',
+        '# some free-form comment',
+        '# EOF',
+        b'hygon_power_watts{gpu="0"} 250',
+    ]))
+
+    power = parser.families['hygon_power_watts']
+    assert (power.type, power.help) == ('gauge', 'Average power (W)\nper device, C:\\ path')
+    assert parser.families['hygon_scrape_seconds'].type == 'histogram'
+    assert parser.families['hygon_scrape_seconds'].help == ''
+    assert set(parser.families) == {'hygon_power_watts', 'hygon_scrape_seconds'}
+    assert len(samples) == 1
+
+
+@pytest.mark.parametrize("sample_name, family", [
+    ('http_requests_total', 'http_requests'),
+    ('scrape_seconds_bucket', 'scrape_seconds'),
+    ('scrape_seconds_sum', 'scrape_seconds'),
+    ('scrape_seconds_count', 'scrape_seconds'),
+    ('scrape_seconds_created', 'scrape_seconds'),
+    ('scrape_seconds', 'scrape_seconds'),
+    # 本身以后缀结尾但已声明的指标族不被截断
+    ('hygon_fan_count', 'hygon_fan_count'),
+    # 未声明的基名不归并
+    ('unknown_total', 'unknown_total'),
+])
+def test_family_name_suffixes(sample_name, family):
+    families = {name: None for name in ('http_requests', 'scrape_seconds', 'hygon_fan_count', 'hygon_fan')}
+
+    assert family_name(sample_name, families) == family
+
+
+def test_snapshot_groups_histogram_samples_into_family():
+    snapshot = MetricSnapshot.from_lines([
+        '# TYPE scrape_seconds histogram',
+        'scrape_seconds_bucket{le="0.1"} 3',
+        'scrape_seconds_bucket{le="+Inf"} 4',
+        'scrape_seconds_sum 0.7',
+        'scrape_seconds_count 4',
+    ])
+
+    assert len(snapshot.family('scrape_seconds')) == 4
+    assert snapshot.value('scrape_seconds', le='+Inf') == 4.0
+
+
+def test_label_cache_reuses_tuples_across_generations(monkeypatch):
+    monkeypatch.setattr(metrics_parser, 'LABEL_CACHE_SIZE', 4)  # 每代2个标签块
+    parser = ExpositionParser()
+
+    def labels(gpu):
+        return parser._labels(f'gpu="{gpu}"')
+
+    first = labels(0)
+    assert labels(0) is first                      # 新一代命中
+    second = labels(1)
+    labels(2)                                      # 新一代写满：{0, 1} 降为旧一代
+    assert set(parser._labels_old) == {'gpu="0"', 'gpu="1"'}
+    assert labels(1) is second                     # 旧一代命中，提升回新一代
+    assert 'gpu="1"' not in parser._labels_old
+    labels(3)                                      # 新一代 {2, 1} 写满，降为旧一代，丢弃gpu=0
+    assert 'gpu="0"' not in parser._labels_old and 'gpu="0"' not in parser._labels_young
+    assert labels(1) is second                     # 被提升的条目经过一次换代仍然保留
+    assert labels(0) is not first and labels(0) == first
+
+
+def test_same_label_block_shared_between_families():
+    samples = parse_text('a{gpu="0",serial="HG1"} 1\nb{gpu="0",serial="HG1"} 2\n')
+
+    assert samples[0].labels is samples[1].labels
+
+
+def test_snapshot_indexes_devices_and_labels():
+    snapshot = MetricSnapshot.from_lines([
+        '# TYPE hygon_temperature_celsius gauge',
+        'hygon_temperature_celsius{gpu="1",sensor="edge"} 60',
+        'hygon_temperature_celsius{gpu="1",sensor="junction"} 70',
+        'hygon_temperature_celsius{gpu="0",sensor="edge"} 55',
+        'hygon_temperature_celsius{gpu="10",sensor="edge"} 58',
+        'dcgm_temp{device="nvidia0"} 40',
+        'up 1',
+    ])
+
+    assert snapshot.device_ids() == ['0', '1', '10', 'nvidia0']
+    assert len(snapshot.device('1')['hygon_temperature_celsius']) == 2
+    assert snapshot.value('hygon_temperature_celsius', gpu='1', sensor='junction') == 70.0
+    assert snapshot.value('hygon_temperature_celsius', sensor='memory') is None
+    assert snapshot.with_label('sensor', 'edge') == []  # sensor不在INDEX_LABELS中，不建索引
+    assert len(snapshot.with_label('gpu', '1')) == 2
+    assert snapshot.has_family('up') and len(snapshot) == 6
+
+
+def test_stream_samples_and_snapshot_from_url():
+    payload = (b'# TYPE hygon_power_watts gauge\n'
+               + b''.join(f'hygon_power_watts{{gpu="{i}"}} {250 + i}\n'.encode() for i in range(1000)))
+    server = FixtureServer([payload]).start()
+    try:
+        parser = ExpositionParser()
+        samples = list(stream_samples(server.url + "/metrics", parser=parser))
+        snapshot = MetricSnapshot.from_url(server.url + "/metrics")
+    finally:
+        server.stop()
+
+    assert len(samples) == 1000 and samples[-1].value == 1249.0
+    assert parser.families['hygon_power_watts'].type == 'gauge'
+    assert snapshot.latency is not None
+    assert snapshot.device('999')['hygon_power_watts'][0].value == 1249.0
+
+
+def test_stream_samples_raises_on_http_error():
+    import requests
+
+    server = FixtureServer([b'']).start()
+    try:
+        with pytest.raises(requests.exceptions.HTTPError):
+            list(stream_samples(server.url + "/missing"))
+    finally:
+        server.stop()
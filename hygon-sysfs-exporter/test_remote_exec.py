@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+"""
+remote_exec.py测试
+运行: python3 -m pytest -q test_remote_exec.py
+"""
+
+import os
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import remote_exec
+from remote_exec import LocalTransport, SSHTransport, load_hosts
+
+
+def test_control_dir_created_once_under_concurrent_first_use(monkeypatch, tmp_path):
+    created = []
+    mkdtemp = tempfile.mkdtemp
+
+    def slow_mkdtemp(**kwargs):
+        # 放大首次创建的竞争窗口
+        time.sleep(0.05)
+        path = mkdtemp(dir=tmp_path, **kwargs)
+        created.append(path)
+        return path
+
+    monkeypatch.setattr(remote_exec.tempfile, 'mkdtemp', slow_mkdtemp)
+    transport = SSHTransport()
+
+    with ThreadPoolExecutor(max_workers=16) as executor:
+        dirs = set(executor.map(lambda _: transport.control_dir, range(16)))
+
+    assert len(created) == 1
+    assert dirs == set(created)
+
+    transport.close_all()
+    assert not os.path.exists(created[0])
+
+
+def test_close_all_keeps_caller_control_dir(tmp_path):
+    transport = SSHTransport(control_dir=str(tmp_path))
+
+    transport.close_all()
+
+    assert transport.control_dir == str(tmp_path)
+    assert tmp_path.is_dir()
+
+
+def test_load_hosts_dedupes_and_strips_comments(tmp_path):
+    hosts_file = tmp_path / "nodes.txt"
+    hosts_file.write_text("node2  # 机柜A\n\n# 注释\nnode3\nnode1\n", encoding="utf-8")
+
+    assert load_hosts("node1, node2,,", str(hosts_file)) == ["node1", "node2", "node3"]
+
+
+def test_local_transport_runs_with_host_environment(tmp_path):
+    transport = LocalTransport(root=str(tmp_path))
+
+    result = transport.run("node1", 'echo "$REMOTE_HOST $REMOTE_ROOT"; exit 3')
+
+    assert result.returncode == 3
+    assert not result.ok
+    assert result.stdout.strip() == f"node1 {tmp_path / 'node1'}"
@@ -0,0 +1,231 @@
+#!/usr/bin/env python3
+"""
+restart_exporter.py滚动重启测试：
+重启命令经LocalTransport在本机执行，通知本地假exporter停机一段时间后恢复
+运行: python3 -m pytest -q test_rolling_restart.py
+"""
+
+import json
+import math
+import subprocess
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+import pytest
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(REPO_ROOT))
+import restart_exporter as rex
+from remote_exec import LocalTransport
+
+URL_TEMPLATE = "http://{host}/metrics"
+
+# 重启命令：请求 $REMOTE_HOST 上假exporter的/restart，非200时以非0退出
+RESTART_COMMAND = (
+    f"{sys.executable} -c \"import os, urllib.request; "
+    f"urllib.request.urlopen('http://' + os.environ['REMOTE_HOST'] + '/restart', timeout=5)\""
+)
+
+
+class FakeExporter:
+    """
+    假exporter：/restart 使/metrics在downtime秒内返回503（recover=False时不再恢复），
+    fail_restart=True时/restart返回500；记录每次重启的停机区间
+    """
+
+    def __init__(self, downtime=0.3, recover=True, fail_restart=False):
+        self.downtime = downtime
+        self.recover = recover
+        self.fail_restart = fail_restart
+        self.down_until = 0.0
+        self.outages = []  # [(停机开始, 恢复时刻)]，time.monotonic()
+
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_GET(self):
+                if self.path == '/restart':
+                    self.reply(*fake.restart())
+                elif self.path == '/metrics' and time.monotonic() >= fake.down_until:
+                    self.reply(200, b'hygon_power_watts{gpu="0"} 250\n')
+                else:
+                    self.reply(503, b'restarting\n')
+
+            def reply(self, status, body):
+                self.send_response(status)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.httpd.daemon_threads = True
+        self.host = f"127.0.0.1:{self.httpd.server_address[1]}"
+        threading.Thread(target=self.httpd.serve_forever, args=(0.05,), daemon=True).start()
+
+    def restart(self):
+        if self.fail_restart:
+            return 500, b'unit hygon-dcu-exporter.service not found\n'
+        now = time.monotonic()
+        self.down_until = now + self.downtime if self.recover else math.inf
+        self.outages.append((now, self.down_until))
+        return 200, b'ok\n'
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+@pytest.fixture
+def exporters():
+    started = []
+
+    def start(count=1, **kwargs):
+        fakes = [FakeExporter(**kwargs) for _ in range(count)]
+        started.extend(fakes)
+        return fakes
+
+    yield start
+    for fake in started:
+        fake.stop()
+
+
+def rolling(fakes, **kwargs):
+    kwargs.setdefault('deadline', 5)
+    return rex.RollingRestart(LocalTransport(), [fake.host for fake in fakes], RESTART_COMMAND,
+                              URL_TEMPLATE, verbose=False, **kwargs)
+
+
+def max_overlap(fakes):
+    """所有主机停机区间的最大重叠数"""
+    events = sorted((at, delta) for fake in fakes for start, end in fake.outages
+                    for at, delta in ((start, 1), (end, -1)))
+    current = peak = 0
+    for _, delta in events:
+        current += delta
+        peak = max(peak, current)
+    return peak
+
+
+def test_poll_backoff_is_capped():
+    calls = []
+
+    def predicate():
+        calls.append(time.monotonic())
+        return len(calls) == 8
+
+    result, attempts = rex.poll(predicate, time.monotonic() + 5, initial=0.01, max_interval=0.05)
+
+    assert (result, attempts) == (True, 8)
+    gaps = [b - a for a, b in zip(calls, calls[1:])]
+    assert gaps[0] < gaps[2]
+    assert max(gaps) < 0.05 + 0.03
+
+
+def test_poll_stops_at_deadline():
+    start = time.monotonic()
+    result, attempts = rex.poll(lambda: False, start + 0.3, initial=0.05)
+
+    assert result is None
+    assert attempts > 1
+    assert 0.3 <= time.monotonic() - start < 0.5
+
+
+def test_sequential_restart_records_downtime(exporters):
+    fakes = exporters(3, downtime=0.3)
+    orchestrator = rolling(fakes, window=1)
+
+    results = orchestrator.run()
+
+    assert [item.host for item in results] == [fake.host for fake in fakes]
+    assert [item.status for item in results] == ['ok'] * 3
+    assert not orchestrator.aborted
+    assert max_overlap(fakes) == 1
+    for item in results:
+        # 停机时间不短于真实停机，多出的部分不超过轮询间隔上限加命令和请求开销
+        assert 0.3 <= item.downtime < 0.3 + rex.READY_POLL_MAX_INTERVAL + 0.4
+        assert item.ready_elapsed <= item.downtime
+        assert item.command_elapsed > 0
+
+
+def test_window_bounds_concurrent_restarts(exporters):
+    fakes = exporters(6, downtime=0.3)
+
+    results = rolling(fakes, window=2).run()
+
+    assert all(item.status == 'ok' for item in results)
+    # 始终有两台在重启中，但不会超过窗口
+    assert max_overlap(fakes) == 2
+
+
+def test_aborts_after_failure_threshold(exporters):
+    fakes = exporters(2, fail_restart=True) + exporters(3)
+    orchestrator = rolling(fakes, window=1, max_failure_rate=0.2)
+
+    results = orchestrator.run()
+
+    assert orchestrator.max_failures == 1
+    assert orchestrator.aborted
+    assert [item.status for item in results] == ['failed', 'failed', 'skipped', 'skipped', 'skipped']
+    assert "退出码 1" in results[0].error
+    assert "HTTP Error 500" in results[0].error
+    # 中止后不再派发任何主机
+    assert all(not fake.outages for fake in fakes[2:])
+
+
+def test_failures_within_threshold_do_not_abort(exporters):
+    fakes = exporters(1, fail_restart=True) + exporters(4, downtime=0.1)
+    orchestrator = rolling(fakes, window=2, max_failure_rate=0.2)
+
+    results = orchestrator.run()
+
+    assert not orchestrator.aborted
+    assert [item.status for item in results] == ['failed', 'ok', 'ok', 'ok', 'ok']
+
+
+def test_node_that_never_recovers_fails_after_deadline(exporters):
+    fakes = exporters(1, recover=False)
+
+    start = time.monotonic()
+    result, = rolling(fakes, deadline=0.5).run()
+
+    assert result.status == 'failed'
+    assert result.error == "0.5s内未恢复"
+    assert result.downtime is None
+    assert time.monotonic() - start < 2
+
+
+def test_downtime_counted_from_command_when_node_already_down(exporters):
+    fake, = exporters(1, downtime=0.3)
+    fake.down_until = math.inf  # 重启命令执行前一直不可用
+
+    result, = rolling([fake]).run()
+
+    assert result.status == 'ok'
+    # 重启前抓取失败：停机时间与就绪耗时同为命令开始到恢复
+    assert result.downtime == pytest.approx(result.ready_elapsed)
+
+
+def test_command_line_report(exporters, tmp_path):
+    fakes = exporters(2, downtime=0.1)
+    report = tmp_path / "report.json"
+
+    proc = subprocess.run(
+        [sys.executable, str(REPO_ROOT / "restart_exporter.py"), "--transport", "local",
+         "--hosts", ",".join(fake.host for fake in fakes), "--url-template", URL_TEMPLATE,
+         "--restart-command", RESTART_COMMAND, "--window", "2", "--deadline", "5",
+         "--report-json", str(report)],
+        capture_output=True, text=True, timeout=60)
+
+    assert proc.returncode == 0, proc.stdout + proc.stderr
+    data = json.loads(report.read_text(encoding="utf-8"))
+    assert data['aborted'] is False
+    assert [node['host'] for node in data['nodes']] == [fake.host for fake in fakes]
+    assert all(node['status'] == 'ok' and node['downtime'] >= 0.1 for node in data['nodes'])
@@ -4,42 +4,171 @@
 海光DCU Exporter重启工具
 """
 
+import argparse
+import json
+import os
+import socket
 import subprocess
+import threading
 import time
 import requests
 import sys
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from pathlib import Path
+from typing import NamedTuple, Optional
 
-def kill_exporter():
-    """停止exporter进程"""
+# 远程执行位于 hygon-sysfs-exporter/ 目录
+sys.path.insert(0, str(Path(__file__).resolve().parent / "hygon-sysfs-exporter"))
+from remote_exec import load_hosts, make_transport
+
+DEFAULT_INSTALL_DIR = '/opt/hygon-dcu-exporter'
+DEFAULT_PORT = 9400
+PROCESS_PATTERN = 'hygon-dcu-exporter'
+DEFAULT_RESTART_COMMAND = 'systemctl restart hygon-dcu-exporter'
+DEFAULT_URL_TEMPLATE = 'http://{host}:9400/metrics'
+
+# 等待恢复时轮询间隔的上限：恢复时刻的测量误差不超过这个值
+READY_POLL_MAX_INTERVAL = 0.2
+
+def poll(predicate, deadline, initial=0.05, factor=2.0, max_interval=1.0):
+    """
+    指数退避轮询，直到predicate返回真值或到达deadline(time.monotonic()时刻)
+    返回 (结果, 尝试次数)；超时返回 (None, 尝试次数)
+    """
+    interval = initial
+    attempts = 0
+    while True:
+        attempts += 1
+        result = predicate()
+        if result:
+            return result, attempts
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            return None, attempts
+        time.sleep(min(interval, remaining))
+        interval = min(interval * factor, max_interval)
+
+def exporter_running():
+    """是否存在exporter进程"""
+    result = subprocess.run(['pgrep', '-f', PROCESS_PATTERN], capture_output=True, text=True)
+    return result.returncode == 0
+
+def port_open(port, host='127.0.0.1'):
+    """端口是否有进程在监听"""
     try:
-        # 查找并杀死exporter进程
-        result = subprocess.run(['pkill', '-f', 'hygon-dcu-exporter'], 
-                              capture_output=True, text=True)
-        print("已停止现有exporter进程")
-        time.sleep(2)
+        with socket.create_connection((host, port), timeout=0.5):
+            return True
+    except OSError:
+        return False
+
+def kill_exporter(port=DEFAULT_PORT, timeout=10):
+    """停止exporter进程：先SIGTERM，等待进程退出和端口释放，超时后SIGKILL"""
+    start = time.monotonic()
+    try:
+        subprocess.run(['pkill', '-f', PROCESS_PATTERN], capture_output=True, text=True)
     except Exception as e:
         print(f"停止exporter进程时出错: {e}")
+        return False
+
+    stopped, _ = poll(lambda: not exporter_running() and not port_open(port), start + timeout)
+    if not stopped:
+        print(f"⚠️  {timeout}s内未退出，发送SIGKILL")
+        subprocess.run(['pkill', '-9', '-f', PROCESS_PATTERN], capture_output=True, text=True)
+        stopped, _ = poll(lambda: not exporter_running() and not port_open(port), time.monotonic() + 5)
+    if not stopped:
+        print(f"❌ exporter进程未退出或端口 {port} 仍被占用")
+        return False
+    print(f"已停止现有exporter进程 ({time.monotonic() - start:.2f}s)")
+    return True
 
-def start_exporter():
-    """启动exporter"""
+def start_exporter(install_dir=DEFAULT_INSTALL_DIR, port=DEFAULT_PORT):
+    """启动exporter，返回进程对象；失败返回None"""
     try:
-        # 切换到exporter目录并启动
-        cmd = [
-            'bash', '-c', 
-            'cd /opt/hygon-dcu-exporter && ./hygon-dcu-exporter --web.listen-address=:9400 > exporter.log 2>&1 &'
-        ]
-        subprocess.run(cmd, check=True)
-        print("已启动exporter服务")
-        time.sleep(3)
+        log = open(os.path.join(install_dir, 'exporter.log'), 'ab')
+        process = subprocess.Popen(
+            ['./hygon-dcu-exporter', f'--web.listen-address=:{port}'],
+            cwd=install_dir, stdout=log, stderr=subprocess.STDOUT,
+            stdin=subprocess.DEVNULL, start_new_session=True)
+        log.close()
+        print(f"已启动exporter服务 (PID {process.pid})")
+        return process
     except Exception as e:
         print(f"启动exporter时出错: {e}")
-        return False
-    return True
+        return None
+
+def wait_ready(process, port=DEFAULT_PORT, deadline=30, warmup_scrapes=5):
+    """
+    等待exporter就绪：端口监听 -> 首次成功抓取，进程提前退出时立即失败
+    返回启动耗时统计字典；未就绪返回None
+    """
+    url = f'http://localhost:{port}/metrics'
+    session = requests.Session()
+    start = time.monotonic()
+    end = start + deadline
+    profile = {'port_open': None, 'first_scrape': None, 'attempts': 0, 'warmup': []}
+
+    def exited():
+        return process is not None and process.poll() is not None
 
-def check_exporter():
+    listening, _ = poll(lambda: exited() or port_open(port), end)
+    if exited():
+        print(f"❌ exporter进程已退出 (退出码 {process.returncode})")
+        return None
+    if not listening:
+        print(f"❌ {deadline}s内端口 {port} 未开始监听")
+        return None
+    profile['port_open'] = time.monotonic() - start
+
+    first_success = []
+
+    def scrape():
+        if exited():
+            return True
+        sent = time.monotonic()
+        try:
+            ok = session.get(url, timeout=max(0.1, end - time.monotonic())).status_code == 200
+        except requests.exceptions.RequestException:
+            return False
+        if ok:
+            first_success.append(sent)
+        return ok
+
+    scraped, profile['attempts'] = poll(scrape, end, max_interval=READY_POLL_MAX_INTERVAL)
+    if exited():
+        print(f"❌ exporter进程已退出 (退出码 {process.returncode})")
+        return None
+    if not scraped:
+        print(f"❌ {deadline}s内未能成功抓取 {url}")
+        return None
+    # 以首次成功抓取发出的时刻计，不含请求本身和轮询返回的时间
+    profile['first_scrape'] = first_success[0] - start
+
+    # 预热阶段延迟：连续抓取N次，观察设备发现和缓存预热的冷启动成本
+    for _ in range(warmup_scrapes):
+        scrape_start = time.perf_counter()
+        try:
+            session.get(url, timeout=10).content
+        except requests.exceptions.RequestException:
+            continue
+        profile['warmup'].append(time.perf_counter() - scrape_start)
+    return profile
+
+def print_profile(profile):
+    """输出启动耗时"""
+    print(f"   - 端口监听: {profile['port_open']:.2f}s")
+    print(f"   - 首次成功抓取: {profile['first_scrape']:.2f}s (尝试 {profile['attempts']} 次)")
+    warmup = profile['warmup']
+    if warmup:
+        latencies = ", ".join(f"{value * 1000:.0f}ms" for value in warmup)
+        print(f"   - 前{len(warmup)}次抓取延迟: {latencies}")
+        if len(warmup) > 1:
+            steady = sorted(warmup[1:])[len(warmup[1:]) // 2]
+            print(f"   - 首次/稳定(中位数): {warmup[0] * 1000:.0f}ms / {steady * 1000:.0f}ms")
+
+def check_exporter(port=DEFAULT_PORT):
     """检查exporter是否正常工作"""
     try:
-        response = requests.get('http://localhost:9400/metrics', timeout=5)
+        response = requests.get(f'http://localhost:{port}/metrics', timeout=5)
         if response.status_code == 200:
             lines = response.text.split('\n')
             hygon_metrics = [line for line in lines if 'hygon' in line.lower() and not line.startswith('#')]
@@ -67,30 +196,216 @@ def check_exporter():
         print(f"❌ 检查exporter时出错: {e}")
         return False
 
+class NodeRestart(NamedTuple):
+    """单个节点的滚动重启结果"""
+    host: str
+    status: str                      # ok / failed / skipped
+    downtime: Optional[float] = None # 重启前最后一次成功抓取返回到重启后首次成功抓取发出的间隔
+    command_elapsed: Optional[float] = None
+    ready_elapsed: Optional[float] = None
+    error: str = ''
+
+class RollingRestart:
+    """
+    滚动重启多台主机上的exporter
+    同时最多window台主机处于重启中；每台主机重启后轮询/metrics直到恢复，
+    失败主机数超过 max_failure_rate * 主机总数 时停止派发剩余主机
+    """
+
+    def __init__(self, transport, hosts, restart_command=DEFAULT_RESTART_COMMAND,
+                 url_template=DEFAULT_URL_TEMPLATE, window=1, max_failure_rate=0.1,
+                 deadline=60, command_timeout=60, verbose=True):
+        self.transport = transport
+        self.hosts = list(hosts)
+        self.restart_command = restart_command
+        self.url_template = url_template
+        self.window = max(1, window)
+        self.max_failures = int(max_failure_rate * len(self.hosts))
+        self.deadline = deadline
+        self.command_timeout = command_timeout
+        self.verbose = verbose
+        self.aborted = False
+        self._lock = threading.Lock()
+
+    def _log(self, message):
+        if self.verbose:
+            with self._lock:
+                print(message, flush=True)
+
+    def _healthy(self, session, url):
+        try:
+            return session.get(url, timeout=5).status_code == 200
+        except requests.exceptions.RequestException:
+            return False
+
+    def restart_host(self, host):
+        url = self.url_template.format(host=host)
+        session = requests.Session()
+        before = time.monotonic() if self._healthy(session, url) else None
+        if before is None:
+            self._log(f"⚠️  {host}: 重启前抓取失败，停机时间从执行命令开始计算")
+
+        start = time.monotonic()
+        result = self.transport.run(host, self.restart_command, timeout=self.command_timeout)
+        command_elapsed = time.monotonic() - start
+        if not result.ok:
+            detail = result.stderr.strip() or result.stdout.strip()
+            return NodeRestart(host, 'failed', command_elapsed=command_elapsed,
+                               error=f"重启命令失败 (退出码 {result.returncode}): {detail}")
+
+        # 恢复时刻取首次成功抓取发出的时间，而不是轮询返回的时间；轮询间隔封顶，误差不超过一个间隔
+        recovered = []
+
+        def probe():
+            sent = time.monotonic()
+            if self._healthy(session, url):
+                recovered.append(sent)
+                return True
+            return False
+
+        ready, _ = poll(probe, time.monotonic() + self.deadline, max_interval=READY_POLL_MAX_INTERVAL)
+        if not ready:
+            return NodeRestart(host, 'failed', command_elapsed=command_elapsed,
+                               error=f"{self.deadline:g}s内未恢复")
+        return NodeRestart(host, 'ok', downtime=recovered[0] - (before or start),
+                           command_elapsed=command_elapsed, ready_elapsed=recovered[0] - start)
+
+    def _restart_safely(self, host):
+        try:
+            return self.restart_host(host)
+        except Exception as e:
+            return NodeRestart(host, 'failed', error=str(e))
+
+    def run(self):
+        """执行滚动重启，结果顺序与主机列表一致"""
+        results = {}
+        failures = 0
+        pending = iter(self.hosts)
+        with ThreadPoolExecutor(max_workers=self.window) as executor:
+            running = {}
+            for host in pending:
+                running[executor.submit(self._restart_safely, host)] = host
+                if len(running) >= self.window:
+                    break
+
+            while running:
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    host = running.pop(future)
+                    result = results[host] = future.result()
+                    if result.status == 'ok':
+                        self._log(f"✅ {host}: 已恢复，停机 {result.downtime:.2f}s")
+                    else:
+                        failures += 1
+                        self._log(f"❌ {host}: {result.error}")
+
+                if failures > self.max_failures and not self.aborted:
+                    self.aborted = True
+                    self._log(f"❌ 失败 {failures} 台，超过阈值 {self.max_failures}，停止滚动重启")
+                if self.aborted:
+                    continue
+                for host in pending:
+                    running[executor.submit(self._restart_safely, host)] = host
+                    if len(running) >= self.window:
+                        break
+
+        return [results.get(host) or NodeRestart(host, 'skipped') for host in self.hosts]
+
+def print_rolling_summary(results, aborted=False):
+    """输出滚动重启汇总"""
+    print("\n=== 滚动重启汇总 ===")
+    print(f"{'主机':<24}{'状态':<10}{'停机(s)':>10}{'命令(s)':>10}{'就绪(s)':>10}")
+    for item in results:
+        cells = [f"{value:>10.2f}" if value is not None else f"{'-':>10}"
+                 for value in (item.downtime, item.command_elapsed, item.ready_elapsed)]
+        print(f"{item.host:<24}{item.status:<10}{''.join(cells)}")
+
+    downtimes = sorted(item.downtime for item in results if item.downtime is not None)
+    counts = {status: sum(1 for item in results if item.status == status)
+              for status in ('ok', 'failed', 'skipped')}
+    print(f"\n成功 {counts['ok']}, 失败 {counts['failed']}, 跳过 {counts['skipped']}")
+    if downtimes:
+        print(f"停机时间: 中位数 {downtimes[len(downtimes) // 2]:.2f}s, 最大 {downtimes[-1]:.2f}s")
+    if aborted:
+        print("❌ 因失败率超过阈值而中止")
+
+def rolling_main(args, hosts):
+    """集群滚动重启"""
+    transport = make_transport(args.transport, user=args.ssh_user)
+    print(f"滚动重启 {len(hosts)} 台主机 (窗口 {args.window}, 失败率阈值 {args.max_failure_rate:.0%})")
+    orchestrator = RollingRestart(transport, hosts, args.restart_command, args.url_template,
+                                  args.window, args.max_failure_rate, args.deadline)
+    try:
+        results = orchestrator.run()
+    finally:
+        transport.close_all()
+
+    print_rolling_summary(results, orchestrator.aborted)
+    if args.report_json:
+        with open(args.report_json, 'w', encoding='utf-8') as f:
+            json.dump({'aborted': orchestrator.aborted, 'nodes': [item._asdict() for item in results]},
+                      f, indent=2, ensure_ascii=False)
+        print(f"报告已写入 {args.report_json}")
+    success = not orchestrator.aborted and all(item.status == 'ok' for item in results)
+    sys.exit(0 if success else 1)
+
 def main():
     """主函数"""
+    parser = argparse.ArgumentParser(description="海光DCU Exporter重启工具")
+    parser.add_argument("--install-dir", default=DEFAULT_INSTALL_DIR, help="exporter安装目录")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT, help="监听端口")
+    parser.add_argument("--deadline", type=float, default=30, help="等待就绪的总时限(秒)")
+    parser.add_argument("--kill-timeout", type=float, default=10, help="等待旧进程退出的时限(秒)")
+    parser.add_argument("--warmup-scrapes", type=int, default=5, help="就绪后记录延迟的抓取次数")
+    parser.add_argument("--hosts", help="滚动重启: 逗号分隔的主机列表")
+    parser.add_argument("--hosts-file", help="滚动重启: 主机列表文件，每行一个")
+    parser.add_argument("--window", type=int, default=1, help="滚动重启: 同时重启的主机数")
+    parser.add_argument("--max-failure-rate", type=float, default=0.1,
+                        help="滚动重启: 失败主机比例超过该值时中止")
+    parser.add_argument("--restart-command", default=DEFAULT_RESTART_COMMAND, help="滚动重启: 远程重启命令")
+    parser.add_argument("--url-template", default=DEFAULT_URL_TEMPLATE,
+                        help="滚动重启: 健康检查地址模板，{host}为主机名")
+    parser.add_argument("--transport", choices=["ssh", "local"], default="ssh",
+                        help="滚动重启: 远程执行方式(local在本机执行，用于演练)")
+    parser.add_argument("--ssh-user", default="root", help="滚动重启: SSH用户")
+    parser.add_argument("--report-json", help="滚动重启: 结果写入JSON文件")
+    args = parser.parse_args()
+
+    hosts = load_hosts(args.hosts, args.hosts_file)
+    if hosts:
+        rolling_main(args, hosts)
+        return
+
     print("=" * 50)
     print("海光DCU Exporter重启工具")
     print("=" * 50)
     
     print("\n1. 停止现有exporter进程...")
-    kill_exporter()
+    if not kill_exporter(args.port, args.kill_timeout):
+        sys.exit(1)
     
     print("\n2. 启动新的exporter进程...")
-    if not start_exporter():
+    process = start_exporter(args.install_dir, args.port)
+    if not process:
         print("启动失败，退出")
         sys.exit(1)
     
-    print("\n3. 检查exporter状态...")
-    if check_exporter():
+    print("\n3. 等待exporter就绪...")
+    profile = wait_ready(process, args.port, args.deadline, args.warmup_scrapes)
+    if profile:
+        print_profile(profile)
+    
+    print("\n4. 检查exporter状态...")
+    if profile and check_exporter(args.port):
         print("\n✅ Exporter重启成功！")
         print("\n可以使用以下命令进行测试:")
-        print("   curl http://localhost:9400/metrics | grep hygon")
+        print(f"   curl http://localhost:{args.port}/metrics | grep hygon")
         print("   python3 debug_metrics_comparison.py")
     else:
         print("\n❌ Exporter重启失败")
         print("\n请检查日志:")
-        print("   tail -20 /opt/hygon-dcu-exporter/exporter.log")
+        print(f"   tail -20 {os.path.join(args.install_dir, 'exporter.log')}")
+        sys.exit(1)
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,286 @@
+#!/usr/bin/env python3
+"""
+check_prometheus_config.py健康检查引擎测试：用本地假Prometheus代替真实服务
+运行: python3 -m pytest -q test_health_checks.py
+"""
+
+import json
+import subprocess
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from urllib.parse import parse_qs, urlsplit
+
+import pytest
+
+import check_prometheus_config as cpc
+
+REPO_ROOT = Path(__file__).resolve().parent
+
+
+class FakePrometheus:
+    """
+    假Prometheus HTTP API：
+    instant[expr] 为 /api/v1/query 的结果，ranges[expr] 为 /api/v1/query_range 的结果，
+    未配置的表达式返回 status=error；记录每个请求的路径和客户端端口
+    """
+
+    def __init__(self, targets=(), instant=None, ranges=None, delay=0.0):
+        self.targets = list(targets)
+        self.instant = dict(instant or {})
+        self.ranges = dict(ranges or {})
+        self.delay = delay
+        self.requests = []
+        self.client_ports = set()
+        self._lock = threading.Lock()
+
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_GET(self):
+                url = urlsplit(self.path)
+                params = {key: values[0] for key, values in parse_qs(url.query).items()}
+                with fake._lock:
+                    fake.requests.append((url.path, params))
+                    fake.client_ports.add(self.client_address[1])
+                if fake.delay:
+                    time.sleep(fake.delay)
+                self.reply(fake.handle(url.path, params))
+
+            def reply(self, payload):
+                body = json.dumps(payload).encode()
+                self.send_response(200 if payload['status'] == 'success' else 400)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.httpd.daemon_threads = True
+        self.url = f"http://127.0.0.1:{self.httpd.server_address[1]}"
+        threading.Thread(target=self.httpd.serve_forever, daemon=True).start()
+
+    def handle(self, path, params):
+        if path == '/api/v1/targets':
+            return {'status': 'success', 'data': {'activeTargets': self.targets}}
+        table = {'/api/v1/query': self.instant, '/api/v1/query_range': self.ranges}.get(path, {})
+        if params.get('query') not in table:
+            return {'status': 'error', 'error': f"unknown query {params.get('query')}"}
+        result = table[params['query']]
+        if callable(result):
+            result = result(params)
+        return {'status': 'success', 'data': {'result': result}}
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def paths(self):
+        return [path for path, _ in self.requests]
+
+
+@pytest.fixture
+def prometheus():
+    servers = []
+
+    def start(**kwargs):
+        server = FakePrometheus(**kwargs)
+        servers.append(server)
+        return server
+
+    yield start
+    for server in servers:
+        server.stop()
+
+
+def vector(*values, **labels):
+    return [{'metric': dict(labels, gpu=str(i)), 'value': [time.time(), str(value)]}
+            for i, value in enumerate(values)]
+
+
+def last_sample_at(ages):
+    """query_range结果：第i个gpu最后一个timestamp()样本在ages[i]秒之前"""
+    def result(params):
+        end = float(params['end'])
+        return [{'metric': {'instance': 'node1:9400', 'gpu': str(i)},
+                 'values': [[end - 30, str(end - age - 30)], [end, str(end - age)]]}
+                for i, age in enumerate(ages)]
+    return result
+
+
+def test_shipped_checks_load():
+    checks = cpc.HealthCheckEngine.load_checks(cpc.DEFAULT_CHECKS_FILE)
+
+    assert {check['group'] for check in checks} == {'system', 'hygon'}
+    assert any(check.get('type') == 'staleness' for check in checks)
+
+
+def test_load_checks_rejects_incomplete_definition(tmp_path):
+    path = tmp_path / "checks.yml"
+    path.write_text("checks:\n  - name: 无查询\n", encoding="utf-8")
+
+    with pytest.raises(ValueError, match="缺少name或query"):
+        cpc.HealthCheckEngine.load_checks(path)
+
+
+def test_instant_checks_ok_warn_error_in_definition_order(prometheus):
+    server = prometheus(instant={
+        'node_load1': vector(0.5),
+        'hygon_power_watts': vector(250, 260, 270),
+        'hygon_temperature_celsius': [],
+    })
+    checks = [
+        {'name': '功耗', 'group': 'hygon', 'query': 'hygon_power_watts', 'min_results': 2},
+        {'name': '温度', 'group': 'hygon', 'query': 'hygon_temperature_celsius'},
+        {'name': '语法错误', 'query': 'rate(('},
+        {'name': '负载', 'group': 'system', 'query': 'node_load1'},
+    ]
+
+    results = cpc.HealthCheckEngine(cpc.PrometheusClient(server.url), checks, workers=4).run()
+
+    assert [result['name'] for result in results] == ['功耗', '温度', '语法错误', '负载']
+    assert [result['status'] for result in results] == ['ok', 'warn', 'error', 'ok']
+    assert results[0]['results'] == 3
+    assert results[0]['sample'] == {'labels': {'gpu': '0'}, 'value': '250'}
+    assert '400' in results[2]['detail']
+    assert results[2]['group'] == 'default'
+
+
+def test_checks_run_concurrently_over_pooled_connections(prometheus):
+    server = prometheus(instant={f'metric_{i}': vector(i) for i in range(16)}, delay=0.2)
+    checks = [{'name': f'check{i}', 'query': f'metric_{i}'} for i in range(16)]
+    engine = cpc.HealthCheckEngine(cpc.PrometheusClient(server.url, pool_size=4), checks, workers=4)
+
+    start = time.perf_counter()
+    results = engine.run()
+    elapsed = time.perf_counter() - start
+
+    assert all(result['status'] == 'ok' for result in results)
+    # 16个0.2s的查询由4个并发执行，串行需要3.2s
+    assert elapsed < 2.0
+    # keep-alive连接在请求之间复用：连接数不超过并发数
+    assert len(server.client_ports) <= 4
+
+
+def test_staleness_reports_ages_per_series(prometheus):
+    server = prometheus(ranges={'timestamp(hygon_dcu_utilization_percent)': last_sample_at([5, 300, 20])})
+    check = {'name': '新鲜度', 'type': 'staleness', 'query': 'hygon_dcu_utilization_percent',
+             'range': '10m', 'step': '30s', 'max_age': '60s', 'by': ['instance', 'gpu']}
+
+    result = cpc.HealthCheckEngine(cpc.PrometheusClient(server.url), [check]).run()[0]
+
+    assert result['status'] == 'fail'
+    assert result['stale'] == ['instance=node1:9400,gpu=1']
+    assert result['ages']['instance=node1:9400,gpu=0'] == pytest.approx(5, abs=1)
+    assert result['results'] == 3
+    _, params = server.requests[0]
+    assert float(params['end']) - float(params['start']) == pytest.approx(600)
+    assert params['step'] == '30.0'
+
+
+def test_staleness_without_data_warns(prometheus):
+    server = prometheus(ranges={'timestamp(up)': []})
+    check = {'name': '新鲜度', 'type': 'staleness', 'query': 'up', 'range': '5m'}
+
+    result = cpc.HealthCheckEngine(cpc.PrometheusClient(server.url), [check]).run()[0]
+
+    assert result['status'] == 'warn'
+    assert result['detail'] == "最近5m内无数据"
+
+
+@pytest.mark.parametrize("value, seconds", [
+    ('15s', 15.0),
+    ('1m30s', 90.0),
+    ('1h5m', 3900.0),
+    ('2d', 172800.0),
+    ('1s500ms', 1.5),
+    ('1.5s', 1.5),
+    ('30', 30.0),
+    (10, 10.0),
+])
+def test_parse_duration(value, seconds):
+    assert cpc.parse_duration(value) == pytest.approx(seconds)
+
+
+@pytest.mark.parametrize("value", ['', '1m30', 'm', '5x'])
+def test_parse_duration_rejects_malformed(value):
+    with pytest.raises(ValueError):
+        cpc.parse_duration(value)
+
+
+def scrape_target(instance, duration, job='hygon-dcu', timeout='10s', interval='15s'):
+    return {'labels': {'job': job, 'instance': instance}, 'health': 'up', 'lastError': '',
+            'lastScrapeDuration': duration, 'scrapeInterval': interval, 'scrapeTimeout': timeout}
+
+
+def test_scrape_cost_ranks_targets_and_flags_near_timeout(prometheus):
+    selector = f'{{job=~"(?i).*({cpc.DEFAULT_COST_JOBS}).*"}}'
+    server = prometheus(
+        targets=[scrape_target('node1:9400', 0.5), scrape_target('node2:9400', 9.0),
+                 scrape_target('node1:9100', 3.0, job='node')],
+        instant={
+            f'scrape_samples_scraped{selector}': [
+                {'metric': {'job': 'hygon-dcu', 'instance': 'node1:9400'}, 'value': [0, '1500']},
+                {'metric': {'job': 'hygon-dcu', 'instance': 'node2:9400'}, 'value': [0, '3000']}],
+            f'scrape_series_added{selector}': [
+                {'metric': {'job': 'hygon-dcu', 'instance': 'node2:9400'}, 'value': [0, '12']}],
+        })
+    client = cpc.PrometheusClient(server.url)
+
+    cost = cpc.analyze_scrape_cost(client, targets=client.targets())
+
+    assert [row['instance'] for row in cost['targets']] == ['node2:9400', 'node1:9400']
+    assert cost['near_timeout'] == ['node2:9400']
+    assert cost['total_samples'] == 4500
+    assert cost['ingestion_rate'] == pytest.approx(300)
+    assert cost['series_added'] == 12
+    assert server.paths().count('/api/v1/targets') == 1
+
+
+def test_scrape_cost_with_compound_interval(prometheus):
+    selector = f'{{job=~"(?i).*({cpc.DEFAULT_COST_JOBS}).*"}}'
+    server = prometheus(
+        targets=[scrape_target('node1:9400', 0.5, timeout='1m', interval='1m30s')],
+        instant={f'scrape_samples_scraped{selector}': [
+            {'metric': {'job': 'hygon-dcu', 'instance': 'node1:9400'}, 'value': [0, '900']}],
+            f'scrape_series_added{selector}': []})
+    client = cpc.PrometheusClient(server.url)
+
+    row, = cpc.analyze_scrape_cost(client, targets=client.targets())['targets']
+
+    assert (row['interval'], row['timeout']) == (90.0, 60.0)
+    assert row['samples_per_second'] == pytest.approx(10)
+
+
+def test_json_report_from_command_line(prometheus, tmp_path):
+    server = prometheus(
+        targets=[scrape_target('node1:9400', 0.5)],
+        instant={'hygon_power_watts': vector(250)},
+        ranges={'timestamp(hygon_power_watts)': last_sample_at([5])})
+    checks = tmp_path / "checks.yml"
+    checks.write_text(
+        "checks:\n"
+        "  - {name: 功耗, group: hygon, query: hygon_power_watts}\n"
+        "  - {name: 新鲜度, group: hygon, type: staleness, query: hygon_power_watts}\n",
+        encoding="utf-8")
+
+    proc = subprocess.run(
+        [sys.executable, str(REPO_ROOT / "check_prometheus_config.py"), "--prometheus-url", server.url,
+         "--checks", str(checks), "--skip-local", "--json"],
+        capture_output=True, text=True, timeout=60)
+
+    report = json.loads(proc.stdout)
+    # 抓取成本查询未配置，返回错误，但不影响指标检查
+    assert 'error' in report['scrape_cost']
+    assert report['targets'] == [{'job': 'hygon-dcu', 'instance': 'node1:9400', 'health': 'up', 'last_error': ''}]
+    assert [check['status'] for check in report['checks']] == ['ok', 'ok']
+    assert report['healthy'] is True
+    assert proc.returncode == 0
+    assert server.paths().count('/api/v1/targets') == 1